@@ -1,9 +1,22 @@
+import time
+script_started = time.perf_counter()
+
+import threading
+import warnings
+from contextlib import contextmanager
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
-import numpy as np
+from storage import data_version, read_workbook, ensure_store, open_dataset, read_partitions
+from result_cache import stats as result_cache_stats, cache_usage
+import loaders
+from views import FILTER_KEYS, read_views, save_view, refresh_view, delete_view, clean_spec, spec_from_query, spec_to_query, compute_results, matching_view, monthly_results
+
+# Modules only needed by specific tabs or modes are imported where they are used
+imports_done = time.perf_counter()
 
 # Set page config
 st.set_page_config(
@@ -13,28 +26,161 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load data
+# Load data. The whole-version aggregates in loaders.py are also kept on
+# disk in .cache/results, so a restarted server, or one warmed up by
+# warmup.py, starts warm.
+
+# Partitioned copy of the cleaned data, rebuilt only when the workbook or the
+# daily logs change; every loader reads its rows from here. Running
+# warmup.py before the server starts builds it ahead of the first user.
 @st.cache_data
-def load_data():
-    # Read the Excel file
-    df = pd.read_excel("intern data.xlsx", sheet_name="Sheet1")
-    
-    # Clean column names (remove extra spaces)
-    df.columns = df.columns.str.strip()
-    
-    # Convert date column to datetime
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    # Extract year and month for easier filtering
-    df['Year'] = df['Date'].dt.year
-    df['Month'] = df['Date'].dt.month_name()
-    
-    # Clean up YearPlanted column
-    df['YearPlanted'] = df['YearPlanted'].astype(str)
-    
-    return df
+def load_manifest(version):
+    return ensure_store(version, read_workbook)
+
+# Dense (field x month) matrices of the whole dataset, built once per data version
+@st.cache_data
+def load_matrices(version):
+    return loaders.load_matrices(version)
+
+# Lagged input/yield statistics for all fields, cached per data version and lag range
+@st.cache_data
+def load_lag_analysis(version, lags, deseasonalize):
+    return loaders.load_lag_analysis(version, lags, deseasonalize)
+
+# Palm age cohort x month totals, precomputed once per data version
+@st.cache_data
+def load_cohorts(version):
+    return loaders.load_cohorts(version)
+
+# Estate/division/field monthly roll-ups, rebuilt when the data or hierarchy.csv changes
+@st.cache_data
+def load_rollups(version, hierarchy_key):
+    return loaders.load_rollups(version, hierarchy_key)
+
+# Monte Carlo yield paths for the filtered fields, cached per filter spec and
+# settings; the frame itself is not hashed, the spec identifies it
+@st.cache_data
+def load_monte_carlo(version, spec_key, horizon, paths, _df):
+    from matrices import build_field_month_matrices
+    from montecarlo import simulate
+    started = time.perf_counter()
+    matrices = build_field_month_matrices(_df, columns=['MT'])
+    # Months a field has no record for carry its neighbouring value
+    mt = pd.DataFrame(matrices['MT']).ffill(axis=1).bfill(axis=1).to_numpy()
+    result = simulate(mt, matrices['months'], horizon, paths)
+    result['fields'] = matrices['fields']
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+# Per-field fertilizer response for the what-if planner, once per data version
+@st.cache_data
+def load_fertilizer_model(version):
+    return loaders.load_fertilizer_model(version)
+
+# Labor per operation x field x month with the yield it is measured against, once per data version
+@st.cache_data
+def load_labor(version):
+    return loaders.load_labor(version)
+
+# Field boundaries simplified for every map detail level, once per GeoJSON file
+@st.cache_data
+def load_map_tiles(geo_key):
+    return loaders.load_map_tiles(geo_key)
+
+# GeoJSON features of one detail level by field, assembled from the compact
+# tile arrays. Shared read-only rather than copied out on every rerun.
+@st.cache_resource
+def map_features(geo_key, level):
+    from geo import tile_geojson
+    return {f['properties']['Field']: f for f in tile_geojson(load_map_tiles(geo_key)['levels'][level])['features']}
+
+# Anomaly scores kept across reruns in this process, per data version and
+# window. A new version starts from the scores last created for the window,
+# so months appended by the daily logs are scored incrementally;
+# update_scores recomputes whatever no longer matches. Only a few states are
+# kept: an evicted one is re-seeded from the latest scores of its window, and
+# the seeds hold one state per window, so old versions are not retained.
+@st.cache_resource
+def anomaly_seeds():
+    return {}
+
+@st.cache_resource(max_entries=4)
+def anomaly_state(version, window):
+    seeds = anomaly_seeds()
+    state = dict(seeds.get(window, {}))
+    seeds[window] = state
+    return state, threading.Lock()
+
+# Management report jobs of this process, shared by all sessions so a
+# finished report is there for whoever asks next
+@st.cache_resource
+def report_jobs():
+    return {}
+
+# One memory-mapped view of the dataset per server process, shared by all sessions
+@st.cache_resource
+def open_shared_dataset(version):
+    return open_dataset(version)
+
+# Rows of the selected years and months, read from the matching partitions
+# only and converted once per process: every session and rerun with the same
+# selection shares the frame, so it must not be modified in place
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_period(version, years, months):
+    return read_partitions(load_manifest(version), years, months, open_shared_dataset(version))
+
+# Fast mode's stratified sample of a period selection, drawn once per process
+# and shared like the period itself; the field and fertilizer filters are
+# applied to the sample, not redrawn
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_sample(version, years, months, fraction):
+    from sampling import SAMPLE_COLUMNS, stratified_sample
+    return stratified_sample(load_period(version, years, months), fraction, columns=SAMPLE_COLUMNS)
+
+# Lines appended to the daily harvest logs since the last look, at most every
+# half minute per process; new rows change the data version below
+@st.cache_data(ttl=30, show_spinner=False)
+def refresh_daily_logs():
+    from ingest import ingest_logs
+    return ingest_logs()
+
+# Recorded data versions in the order they became current; the list only
+# changes when the current version does
+@st.cache_data
+def load_version_history(timeline_key):
+    from versions import list_versions
+    return list_versions()
+
+# Cell-level changes between two recorded versions
+@st.cache_data
+def load_version_diff(old_id, new_id):
+    from versions import diff_versions
+    return diff_versions(old_id, new_id)
+
+daily_state = refresh_daily_logs()
+version = latest_version = data_version()
+manifest = load_manifest(version)
+
+# Viewing the dashboard as of a past date swaps in the version current then;
+# its id keys every cache below exactly as the latest version's does. The
+# sidebar control is drawn with the filters.
+from versions import mark_current, timeline_stamp
+# Data that is current again, e.g. after an edit is undone, goes back on the timeline
+mark_current(latest_version)
+version_history = load_version_history(timeline_stamp())
+as_of_version = None
+if st.session_state.get('as_of_on') and st.session_state.get('as_of_date'):
+    from versions import version_as_of
+    as_of_version = version_as_of(version_history, st.session_state['as_of_date'])
+    if as_of_version and as_of_version['id'] != latest_version:
+        version = as_of_version['id']
+        manifest = load_manifest(version)
+data_ready = time.perf_counter()
 
-df = load_data()
+# Timings of the first run in this server process, i.e. the cold start
+@st.cache_resource
+def startup_timings():
+    return {}
 
 # Sidebar filters
 st.sidebar.markdown(
@@ -92,11 +238,45 @@ st.sidebar.markdown(
 # Sidebar filters
 st.sidebar.header("Filter Data")
 
+if version_history:
+    as_of_on = st.sidebar.checkbox(
+        "🕰️ View as of a past date",
+        key='as_of_on',
+        help="Show the data as it stood on an earlier date, before later corrections"
+    )
+    if as_of_on:
+        first_recorded = pd.Timestamp(version_history[0]['created']).date()
+        st.sidebar.date_input(
+            "As of",
+            value=pd.Timestamp.now().date(),
+            min_value=first_recorded,
+            max_value=pd.Timestamp.now().date(),
+            key='as_of_date'
+        )
+        if as_of_version is None:
+            st.sidebar.caption("No version was recorded by then; showing the latest data.")
+        else:
+            st.sidebar.caption(f"Showing version `{as_of_version['id']}`, recorded {as_of_version['created'][:16]}.")
+
 # Initialize all filter variables first
-fields = df['Field'].unique()
-years = df['Year'].unique()
-months = df['Month'].unique()
-fertilizer_types = df['TypeOfFetilizer'].unique()
+fields = manifest['fields']
+years = manifest['years']
+months = manifest['months']
+fertilizer_types = manifest['fertilizer_types']
+filter_options = {'fields': fields, 'years': years, 'months': months, 'fertilizer': fertilizer_types}
+
+# On a session's first run the filters come from a shared link (?view=name or
+# the filter params themselves), else from the defaults
+if 'filter_fields' not in st.session_state:
+    start_spec = {'fields': fields[:2], 'years': years, 'months': months, 'fertilizer': fertilizer_types}
+    shared_view = st.query_params.get('view')
+    saved_views = read_views()
+    if shared_view in saved_views:
+        start_spec = clean_spec(saved_views[shared_view]['spec'], filter_options)
+    else:
+        start_spec = spec_from_query(st.query_params, filter_options) or start_spec
+    for key in FILTER_KEYS:
+        st.session_state[f'filter_{key}'] = start_spec[key]
 
 # Field selection with individual reset
 col1_field, col2_field = st.sidebar.columns([4, 1])
@@ -104,7 +284,7 @@ with col1_field:
     selected_fields = st.multiselect(
         "Select Fields",
         options=fields,
-        default=fields[:2]
+        key='filter_fields'
     )
 
 # Year selection with individual reset
@@ -113,7 +293,7 @@ with col1_year:
     selected_years = st.multiselect(
         "Select Years",
         options=years,
-        default=years
+        key='filter_years'
     )
 
 # Month selection with individual reset
@@ -122,7 +302,7 @@ with col1_month:
     selected_months = st.multiselect(
         "Select Months",
         options=months,
-        default=months
+        key='filter_months'
     )
 
 # Fertilizer Type Filter with individual reset
@@ -131,27 +311,323 @@ with col1_fert:
     selected_fertilizer = st.multiselect(
         "Type of Fertilizer",
         options=fertilizer_types,
-        default=fertilizer_types,
+        key='filter_fertilizer',
         help="Filter by fertilizer type"
     )
 
-# Filter data based on selections
-filtered_df = df[
-    (df['Field'].isin(selected_fields)) &
-    (df['Year'].isin(selected_years)) &
-    (df['Month'].isin(selected_months)) &
-    (df['TypeOfFetilizer'].isin(selected_fertilizer))
+# Opt-in fast mode for exploring very large selections
+fast_mode = st.sidebar.checkbox(
+    "⚡ Fast approximate mode",
+    value=False,
+    help="Draw headline charts from a stratified sample first on large selections, then refine to exact values"
+)
+sample_fraction = 0.1
+if fast_mode:
+    from sampling import SAMPLE_MIN_ROWS, estimate_monthly_sums, estimate_total
+    sample_fraction = st.sidebar.slider(
+        "Sample size",
+        min_value=0.02,
+        max_value=0.5,
+        value=0.1,
+        step=0.02,
+        format="%.2f",
+        help="Fraction of rows drawn from each month"
+    )
+
+# Opt-in compact chart payloads for slow connections: rounded float32 typed
+# arrays and only the template defaults each chart uses
+compact_charts = st.sidebar.checkbox(
+    "📦 Compact chart payloads",
+    value=False,
+    help="Send chart data rounded to display precision in a compact binary form, for slow connections"
+)
+if compact_charts:
+    from transport import compact_figure, payload_size
+
+# Filter data based on selections; Year/Month prune partitions before any row is read
+period_df = load_period(version, tuple(sorted(selected_years)), tuple(sorted(selected_months)))
+filtered_df = period_df[
+    (period_df['Field'].isin(selected_fields)) &
+    (period_df['TypeOfFetilizer'].isin(selected_fertilizer))
 ]
 
+# Saved views: named filter specs stored with their KPI and monthly results.
+# A selection matching a view reuses its results while the data version is
+# unchanged; results saved on older data are recomputed once and stored again.
+current_spec = clean_spec({
+    'fields': selected_fields,
+    'years': selected_years,
+    'months': selected_months,
+    'fertilizer': selected_fertilizer,
+}, filter_options)
+saved_views = read_views()
+active_view = matching_view(saved_views, current_spec)
+view_results = None
+# Stored results belong to the latest data, so past versions compute their own
+if active_view and version == latest_version:
+    view_results = saved_views[active_view]['results']
+    if saved_views[active_view].get('version') != version:
+        view_results = compute_results(filtered_df)
+        refresh_view(active_view, version, view_results)
+
+def load_view(name):
+    spec = clean_spec(read_views()[name]['spec'], filter_options)
+    for key in FILTER_KEYS:
+        st.session_state[f'filter_{key}'] = spec[key]
+
+def store_view(spec, df):
+    name = st.session_state['new_view_name'].strip()
+    if name:
+        save_view(name, spec, version, compute_results(df))
+        st.session_state['new_view_name'] = ""
+
+with st.sidebar.expander("⭐ Saved views", expanded=bool(active_view)):
+    if saved_views:
+        view_names = list(saved_views)
+        chosen_view = st.selectbox(
+            "View",
+            options=view_names,
+            index=view_names.index(active_view) if active_view else 0
+        )
+        col1_view, col2_view = st.columns(2)
+        col1_view.button("Load", on_click=load_view, args=(chosen_view,), use_container_width=True)
+        col2_view.button("Delete", on_click=delete_view, args=(chosen_view,), use_container_width=True)
+    st.text_input("Name", key='new_view_name', placeholder="e.g. My fields this year")
+    st.button("💾 Save current filters", on_click=store_view, args=(current_spec, filtered_df), use_container_width=True)
+    st.caption("The page address always holds the current filters, so it can be bookmarked or shared.")
+
+# Keep the address bar in step with the filters
+shared_params = spec_to_query(current_spec, filter_options)
+if active_view:
+    shared_params['view'] = active_view
+st.query_params.from_dict(shared_params)
+
+# In fast mode the headline aggregates are estimated from a stratified sample,
+# and the exact values are filled in once the rest of the page has rendered.
+# A saved view's stored totals are already exact.
+approx_mode = fast_mode and not view_results and len(filtered_df) >= SAMPLE_MIN_ROWS
+pending_refinements = []
+if approx_mode:
+    sample_df, strata_sizes = load_sample(version, tuple(sorted(selected_years)), tuple(sorted(selected_months)), sample_fraction)
+    in_selection = sample_df['Field'].isin(selected_fields) & sample_df['TypeOfFetilizer'].isin(selected_fertilizer)
+    approx_yield = estimate_monthly_sums(sample_df, strata_sizes, 'MT', in_selection)
+    approx_bunches = estimate_monthly_sums(sample_df, strata_sizes, 'Bunches', in_selection)
+elif fast_mode:
+    st.sidebar.caption(f"Selection is below {SAMPLE_MIN_ROWS:,} rows, showing exact values.")
+
+# Whole-dataset field x month matrices behind the heatmap and alert tabs
+field_matrices = load_matrices(version)
+
+# Cell styles for a labor statistics table: centered text, highest totals in
+# green and lowest in red (lowest wins on ties, as with highlight_max/min).
+# Computed in one vectorized pass and cached per table content, then applied
+# to the table in a single Styler.apply.
+LABOR_TOTALS = ['Total Workers', 'Total Mandays']
+
+@st.cache_data
+def labor_table_styles(labor_stats):
+    values = labor_stats[LABOR_TOTALS].to_numpy(dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        is_max = values == np.nanmax(values, axis=0)
+        is_min = values == np.nanmin(values, axis=0)
+    styles = pd.DataFrame('text-align: center', index=labor_stats.index, columns=labor_stats.columns)
+    styles[LABOR_TOTALS] = np.where(
+        is_min, 'text-align: center; background-color: #ffcccb',
+        np.where(is_max, 'text-align: center; background-color: lightgreen', 'text-align: center')
+    )
+    return styles
+
+def show_labor_table(labor_stats):
+    styles = labor_table_styles(labor_stats)
+    st.dataframe(
+        labor_stats.style.apply(lambda _: styles, axis=None),
+        column_config={
+            'Avg Workers': st.column_config.NumberColumn(format="%.1f"),
+            'Avg Mandays': st.column_config.NumberColumn(format="%.1f"),
+        },
+        use_container_width=True
+    )
+
+# Performance summary cards for the monthly yield and bunches series
+def show_yield_summary(monthly_total, monthly_bunches):
+    # Calculate key metrics
+    max_mt = monthly_total['MT'].max()
+    min_mt = monthly_total['MT'].min()
+    avg_mt = monthly_total['MT'].mean()
+    growth = (monthly_total['MT'].iloc[-1] - monthly_total['MT'].iloc[0]) / monthly_total['MT'].iloc[0] * 100 \
+            if monthly_total['MT'].iloc[0] != 0 else 0
+
+    max_bunches = monthly_bunches['Bunches'].max()
+    min_bunches = monthly_bunches['Bunches'].min()
+    avg_bunches = monthly_bunches['Bunches'].mean()
+    growth_bunches = (monthly_bunches['Bunches'].iloc[-1] - monthly_bunches['Bunches'].iloc[0]) / monthly_bunches['Bunches'].iloc[0] * 100 \
+            if monthly_bunches['Bunches'].iloc[0] != 0 else 0
+
+    # Metrics Cards
+    st.markdown("##### 🏆 Yield (MT) Performance")
+    col_mt1, col_mt2, col_mt3, col_mt4 = st.columns(4)
+    with col_mt1:
+        st.metric("Peak Yield", f"{max_mt:,.1f} MT", 
+                 help="Highest monthly yield achieved")
+    with col_mt2:
+        st.metric("Lowest Yield", f"{min_mt:,.1f} MT", 
+                 help="Lowest monthly yield recorded")
+    with col_mt3:
+        st.metric("Average Yield", f"{avg_mt:,.1f} MT", 
+                 help="Mean monthly production")
+    with col_mt4:
+        st.metric("Growth Trend", f"{growth:.1f}%", 
+                 delta_color="inverse" if growth < 0 else "normal",
+                 help="Percentage change from first to last month")
+
+    st.markdown("##### 🍌 Bunches Performance")
+    col_bun1, col_bun2, col_bun3, col_bun4 = st.columns(4)
+    with col_bun1:
+        st.metric("Peak Bunches", f"{max_bunches:,.0f}", 
+                 help="Highest monthly count")
+    with col_bun2:
+        st.metric("Lowest Bunches", f"{min_bunches:,.0f}", 
+                 help="Lowest monthly count")
+    with col_bun3:
+        st.metric("Average Bunches", f"{avg_bunches:,.0f}", 
+                 help="Mean monthly count")
+    with col_bun4:
+        st.metric("Growth Trend", f"{growth_bunches:.1f}%",
+                 delta_color="inverse" if growth_bunches < 0 else "normal",
+                 help="Percentage change in bunches")
+
 # Main dashboard
 st.title("🌴 Oil Palm Plantation Performance Dashboard")
 st.markdown("### Interactive analysis of plantation mt and productivity")
+if version != latest_version:
+    st.info(f"🕰️ Viewing the data as recorded {as_of_version['created'][:16]} (version `{version}`). "
+            "Untick *View as of a past date* in the sidebar to return to the latest data.")
+
+# Wall time of each dashboard section in this run (checked against budgets by snapshots.py)
+st.session_state['section_timings'] = {}
+
+@contextmanager
+def timed_section(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        st.session_state['section_timings'][name] = time.perf_counter() - started
+
+# Bytes sent per chart in compact mode, before and after compaction
+chart_payloads = []
+
+def show_chart(fig, target=st, **kwargs):
+    if compact_charts:
+        before = payload_size(fig)
+        compact_figure(fig)
+        title = fig.layout.title.text or f"Chart {len(chart_payloads) + 1}"
+        chart_payloads.append({'Chart': title, 'Before (KB)': before / 1024, 'After (KB)': payload_size(fig) / 1024})
+    return target.plotly_chart(fig, use_container_width=True, **kwargs)
+
+# Figures are built on a small thread pool shared by all sessions. Building a
+# figure is pandas work and Plotly validation only; Streamlit calls stay on
+# the script thread.
+@st.cache_resource
+def figure_pool():
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='figures')
+
+def build_figures(builders):
+    # Start every builder on the pool; returns a future per name
+    pool = figure_pool()
+    return {name: pool.submit(build) for name, build in builders.items()}
 
 # Function to display no data message
 def show_no_data_message():
     st.warning("⚠️ No data available for the selected filters. Please adjust your filter criteria.")
     st.info("ℹ️ Try selecting different fields, years, or months to view data.")
 
+# Monthly totals of a column over the filtered data
+def monthly_sum(column):
+    if view_results:
+        return monthly_results(view_results, column, filtered_df[column].dtype)
+    return filtered_df.groupby(pd.Grouper(key='Date', freq='MS'))[column].sum().reset_index()
+
+# Shade the 95% error band of a sampled estimate behind its line
+def add_error_band(fig, estimate, color):
+    fig.add_trace(go.Scatter(
+        x=estimate['Date'], y=estimate['upper'],
+        mode='lines', line=dict(width=0),
+        showlegend=False, hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=estimate['Date'], y=estimate['lower'],
+        mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor=color,
+        name='95% bounds', hoverinfo='skip'
+    ))
+    return fig
+
+# With percent set the series are changes in % (the year over year window),
+# so the average line is labelled as an average change
+def monthly_yield_figure(monthly_total, percent=False):
+    fig_total = px.line(
+        monthly_total,
+        x='Date',
+        y='MT',
+        title='<b>Monthly Fresh Fruit Bunch Yield (MT)</b>',
+        labels={'MT': 'Yield (MT)'},
+        markers=True,
+        line_shape='spline',
+        color_discrete_sequence=['#1f77b4']
+    ).update_layout(
+        hovermode="x unified",
+        plot_bgcolor='rgba(0,0,0,0)',
+        height=450,
+        xaxis_title="Month",
+        yaxis_title="Yield (Metric Tons)"
+    )
+    if 'lower' in monthly_total:
+        add_error_band(fig_total, monthly_total, 'rgba(31,119,180,0.2)')
+    
+    avg_yield = monthly_total['MT'].mean()
+    fig_total.add_hline(
+        y=avg_yield,
+        line_dash="dot",
+        annotation_text=f'Average change: {avg_yield:+,.1f}%' if percent else f'Average: {avg_yield:,.1f} MT',
+        annotation_position="bottom right",
+        line_color="orange"
+    )
+    return fig_total
+
+def monthly_bunches_figure(monthly_bunches, percent=False):
+    fig_bunches = px.line(
+        monthly_bunches,
+        x='Date',
+        y='Bunches',
+        title='<b>Monthly Fresh Fruit Bunches Count</b>',
+        labels={'Bunches': 'Bunches Count'},
+        markers=True,
+        line_shape='spline',
+        color_discrete_sequence=['#ff7f0e']
+    ).update_layout(
+        hovermode="x unified",
+        plot_bgcolor='rgba(0,0,0,0)',
+        height=450,
+        xaxis_title="Month",
+        yaxis_title="Number of Bunches"
+    )
+    if 'lower' in monthly_bunches:
+        add_error_band(fig_bunches, monthly_bunches, 'rgba(255,127,14,0.2)')
+    
+    avg_bunches = monthly_bunches['Bunches'].mean()
+    fig_bunches.add_hline(
+        y=avg_bunches,
+        line_dash="dot",
+        annotation_text=f'Average change: {avg_bunches:+,.1f}%' if percent else f'Average: {avg_bunches:,.0f}',
+        annotation_position="bottom right",
+        line_color="green"
+    )
+    return fig_bunches
+
 # Check if filtered data is empty
 if filtered_df.empty:
     show_no_data_message()
@@ -159,7 +635,7 @@ else:
 # KPI cards with equal sizing
  col1, col2, col3, col4 = st.columns(4)
  with col1:
-    field_count = filtered_df['Field'].nunique()
+    field_count = view_results['field_count'] if view_results else filtered_df['Field'].nunique()
     st.metric(
         label="🌿 Total Fields", 
         value=f"{field_count:,}",
@@ -167,25 +643,53 @@ else:
         help="Number of unique plantation fields"
     )
 with col2:
-    total_yield = round(filtered_df['MT'].sum())
-    yield_per_field = round(total_yield/max(1, field_count)) if field_count > 0 else 0
-    st.metric(
-        label="📈 Total Yield", 
-        value=f"{total_yield:,} MT",
-        delta=f"~{yield_per_field:,} MT/field" if field_count > 0 else "",
-        help="Total production"
-    )
+    yield_kpi_slot = st.empty()
+    def show_total_yield():
+        total_yield = round(view_results['MT'] if view_results else filtered_df['MT'].sum())
+        yield_per_field = round(total_yield/max(1, field_count)) if field_count > 0 else 0
+        yield_kpi_slot.metric(
+            label="📈 Total Yield", 
+            value=f"{total_yield:,} MT",
+            delta=f"~{yield_per_field:,} MT/field" if field_count > 0 else "",
+            help="Total production"
+        )
+    if approx_mode:
+        est_yield, yield_margin = estimate_total(approx_yield, 'MT')
+        yield_kpi_slot.metric(
+            label="📈 Total Yield",
+            value=f"≈{round(est_yield):,} MT",
+            delta=f"±{round(yield_margin):,} MT (95%)",
+            delta_color="off",
+            help="Estimated from a stratified sample, refining to the exact total"
+        )
+        pending_refinements.append(show_total_yield)
+    else:
+        show_total_yield()
 with col3:
-    total_bunches = int(filtered_df['Bunches'].sum())
-    bunches_per_field = round(total_bunches/max(1, field_count)) if field_count > 0 else 0
-    st.metric(
-        label="🌴 Total Bunches", 
-        value=f"{total_bunches:,}",
-        delta=f"~{bunches_per_field:,}/field" if field_count > 0 else "",
-        help="Total bunches"
-    )
+    bunches_kpi_slot = st.empty()
+    def show_total_bunches():
+        total_bunches = int(view_results['Bunches'] if view_results else filtered_df['Bunches'].sum())
+        bunches_per_field = round(total_bunches/max(1, field_count)) if field_count > 0 else 0
+        bunches_kpi_slot.metric(
+            label="🌴 Total Bunches", 
+            value=f"{total_bunches:,}",
+            delta=f"~{bunches_per_field:,}/field" if field_count > 0 else "",
+            help="Total bunches"
+        )
+    if approx_mode:
+        est_bunches, bunches_margin = estimate_total(approx_bunches, 'Bunches')
+        bunches_kpi_slot.metric(
+            label="🌴 Total Bunches",
+            value=f"≈{round(est_bunches):,}",
+            delta=f"±{round(bunches_margin):,} (95%)",
+            delta_color="off",
+            help="Estimated from a stratified sample, refining to the exact total"
+        )
+        pending_refinements.append(show_total_bunches)
+    else:
+        show_total_bunches()
 with col4:
-    total_fert = round(filtered_df['Usage of fertilizer'].sum())
+    total_fert = round(view_results['Usage of fertilizer'] if view_results else filtered_df['Usage of fertilizer'].sum())
     fert_per_field = round(total_fert/max(1, field_count)) if field_count > 0 else 0
     st.metric(
         label="🧴 Total Fertilizer", 
@@ -227,179 +731,288 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Add to your existing tabs definition
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["Yield Analysis", "Fertilizer Impact", "WeedControl Analysis", "Pest&Disease", "Raw Data", "Yield Forecast"])
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9, tab10, tab11, tab12, tab13 = st.tabs(["Yield Analysis", "Fertilizer Impact", "WeedControl Analysis", "Pest&Disease", "Raw Data", "Yield Forecast", "Field Heatmap", "Anomaly Alerts", "Lagged Impact", "Age Cohorts", "Estate Roll-up", "Labor Productivity", "Field Map"])
+
+with tab1, timed_section("Yield Analysis"):
+    from matrices import WINDOWS, select, windowed, windowed_ratio
 
-with tab1:
     st.header("🌴 Yield Analysis Dashboard")
+
+    yield_window = st.selectbox(
+        "Time window",
+        list(WINDOWS),
+        key='yield_window',
+        help="Applies to the yield, bunches and efficiency charts below"
+    )
+    window_on = WINDOWS[yield_window] is not None
+    percent_window = WINDOWS[yield_window] == 'yoy'
+    if window_on:
+        st.caption("Windowed charts count every fertilizer type; the field, year and month filters apply. Summary figures and cards stay monthly.")
+
+    # Windowed series come from the cached field x month matrices: each window
+    # runs over the whole history with cumulative sums, so any window costs
+    # the same, and then only the selected months are kept
+    def field_rows(column, by_field):
+        values, fields, months = select(field_matrices, field_matrices[column], fields=selected_fields)
+        if not by_field:
+            recorded = ~np.isnan(values).all(axis=0)
+            values = np.where(recorded, np.nansum(values, axis=0), np.nan)[None, :]
+            fields = ['All']
+        return values, fields, months
+
+    def window_table(series, fields, months, by_field):
+        keep = np.isin(months.year, selected_years) & np.isin(months.month_name(), selected_months)
+        table = pd.DataFrame({
+            'Date': np.tile(months[keep], len(fields)),
+            'Field': np.repeat(fields, keep.sum()),
+            **{name: values[:, keep].ravel() for name, values in series.items()}
+        })
+        return table if by_field else table.drop(columns='Field')
+
+    def window_frame(column, by_field=False):
+        values, fields, months = field_rows(column, by_field)
+        return window_table({column: windowed(values, months, WINDOWS[yield_window])}, fields, months, by_field)
+
+    def window_efficiency(by_field=False):
+        mt, fields, months = field_rows('MT', by_field)
+        bunches = field_rows('Bunches', by_field)[0]
+        window = WINDOWS[yield_window]
+        return window_table({
+            'Bunches_per_MT': windowed_ratio(bunches, mt, months, window),
+            'KG_per_Bunch': windowed_ratio(mt, bunches, months, window, scale=1000),
+        }, fields, months, by_field)
+
+    def window_title(fig):
+        if window_on:
+            fig.update_layout(title_text=fig.layout.title.text.replace('</b>', f' · {yield_window}</b>'))
+            if percent_window:
+                fig.update_layout(yaxis_title="Change vs same month last year (%)")
+        return fig
+    
+    # Monthly series, estimated from the sample in fast mode
+    if approx_mode:
+        monthly_total, monthly_bunches = approx_yield, approx_bunches
+    else:
+        monthly_total = monthly_sum('MT')
+        monthly_bunches = monthly_sum('Bunches')
+    yield_series = window_frame('MT') if window_on else monthly_total
+    bunches_series = window_frame('Bunches') if window_on else monthly_bunches
+
+    # Calculate efficiency metrics
+    efficiency_df = filtered_df.copy()
+    efficiency_df['Bunches_per_MT'] = efficiency_df['Bunches'] / efficiency_df['MT']
+    efficiency_df['KG_per_Bunch'] = (efficiency_df['MT'] * 1000) / efficiency_df['Bunches']
     
-    # Overview Tabs
-    overview_tab1, overview_tab2 = st.tabs(["📈 Monthly Yield (MT)", "🍌 Monthly Bunches Count"])
-    
-    with overview_tab1:
-        # Yield (MT) chart
-        monthly_total = filtered_df.groupby(pd.Grouper(key='Date', freq='MS'))['MT'].sum().reset_index()
-        
-        fig_total = px.line(
-            monthly_total,
+    monthly_efficiency = efficiency_df.groupby(pd.Grouper(key='Date', freq='MS')).agg({
+        'Bunches_per_MT': 'mean',
+        'KG_per_Bunch': 'mean'
+    }).reset_index()
+    # Windowed efficiency is a ratio of windowed sums; the cards below stay monthly
+    efficiency_series = window_efficiency() if window_on else monthly_efficiency
+    efficiency_by_field = window_efficiency(by_field=True) if window_on else efficiency_df
+    avg_bunches_mt = monthly_efficiency['Bunches_per_MT'].mean()
+    avg_kg_bunch = monthly_efficiency['KG_per_Bunch'].mean()
+
+    def fields_mt_figure():
+        return window_title(px.line(
+            window_frame('MT', by_field=True) if window_on else filtered_df,
             x='Date',
             y='MT',
-            title='<b>Monthly Fresh Fruit Bunch Yield (MT)</b>',
+            color='Field',
+            title='<b>Monthly Yield (MT) by Field</b>',
             labels={'MT': 'Yield (MT)'},
             markers=True,
-            line_shape='spline',
-            color_discrete_sequence=['#1f77b4']
+            line_shape='spline'
         ).update_layout(
+            height=500, 
             hovermode="x unified",
             plot_bgcolor='rgba(0,0,0,0)',
-            height=450,
-            xaxis_title="Month",
-            yaxis_title="Yield (Metric Tons)"
-        )
-        
-        avg_yield = monthly_total['MT'].mean()
-        fig_total.add_hline(
-            y=avg_yield,
-            line_dash="dot",
-            annotation_text=f'Average: {avg_yield:,.1f} MT',
-            annotation_position="bottom right",
-            line_color="orange"
-        )
-        
-        st.plotly_chart(fig_total, use_container_width=True)
+            legend_title="Field Code"
+        ))
 
-    with overview_tab2:
-        # Bunches chart
-        monthly_bunches = filtered_df.groupby(pd.Grouper(key='Date', freq='MS'))['Bunches'].sum().reset_index()
-        
-        fig_bunches = px.line(
-            monthly_bunches,
+    def fields_bunches_figure():
+        return window_title(px.line(
+            window_frame('Bunches', by_field=True) if window_on else filtered_df,
             x='Date',
             y='Bunches',
-            title='<b>Monthly Fresh Fruit Bunches Count</b>',
+            color='Field',
+            title='<b>Monthly Bunches Count by Field</b>',
             labels={'Bunches': 'Bunches Count'},
             markers=True,
+            line_shape='spline'
+        ).update_layout(
+            height=500, 
+            hovermode="x unified",
+            plot_bgcolor='rgba(0,0,0,0)',
+            legend_title="Field Code"
+        ))
+
+    def bunches_mt_figure():
+        fig_bunches_mt = px.line(
+            efficiency_series,
+            x='Date',
+            y='Bunches_per_MT',
+            title='<b>Bunches Required per Metric Ton</b>',
+            labels={'Bunches_per_MT': 'Bunches/MT'},
+            markers=True,
             line_shape='spline',
-            color_discrete_sequence=['#ff7f0e']
+            color_discrete_sequence=['#2ca02c']
         ).update_layout(
             hovermode="x unified",
             plot_bgcolor='rgba(0,0,0,0)',
-            height=450,
-            xaxis_title="Month",
-            yaxis_title="Number of Bunches"
+            height=400,
+            yaxis_title="Bunches per MT"
         )
         
-        avg_bunches = monthly_bunches['Bunches'].mean()
-        fig_bunches.add_hline(
-            y=avg_bunches,
+        shown_bunches_mt = efficiency_series['Bunches_per_MT'].mean()
+        fig_bunches_mt.add_hline(
+            y=shown_bunches_mt,
             line_dash="dot",
-            annotation_text=f'Average: {avg_bunches:,.0f}',
+            annotation_text=f'Average change: {shown_bunches_mt:+,.1f}%' if percent_window else f'Average: {shown_bunches_mt:,.1f}',
             annotation_position="bottom right",
-            line_color="green"
+            line_color="orange"
         )
-        
-        st.plotly_chart(fig_bunches, use_container_width=True)
-    
-    # Performance Summary Section
-    st.subheader("📊 Performance Summary Statistics")
-    
-    # Calculate key metrics
-    max_mt = monthly_total['MT'].max()
-    min_mt = monthly_total['MT'].min()
-    avg_mt = monthly_total['MT'].mean()
-    growth = (monthly_total['MT'].iloc[-1] - monthly_total['MT'].iloc[0]) / monthly_total['MT'].iloc[0] * 100 \
-            if monthly_total['MT'].iloc[0] != 0 else 0
-
-    max_bunches = monthly_bunches['Bunches'].max()
-    min_bunches = monthly_bunches['Bunches'].min()
-    avg_bunches = monthly_bunches['Bunches'].mean()
-    growth_bunches = (monthly_bunches['Bunches'].iloc[-1] - monthly_bunches['Bunches'].iloc[0]) / monthly_bunches['Bunches'].iloc[0] * 100 \
-            if monthly_bunches['Bunches'].iloc[0] != 0 else 0
-
-    # Metrics Cards
-    st.markdown("##### 🏆 Yield (MT) Performance")
-    col_mt1, col_mt2, col_mt3, col_mt4 = st.columns(4)
-    with col_mt1:
-        st.metric("Peak Yield", f"{max_mt:,.1f} MT", 
-                 help="Highest monthly yield achieved")
-    with col_mt2:
-        st.metric("Lowest Yield", f"{min_mt:,.1f} MT", 
-                 help="Lowest monthly yield recorded")
-    with col_mt3:
-        st.metric("Average Yield", f"{avg_mt:,.1f} MT", 
-                 help="Mean monthly production")
-    with col_mt4:
-        st.metric("Growth Trend", f"{growth:.1f}%", 
-                 delta_color="inverse" if growth < 0 else "normal",
-                 help="Percentage change from first to last month")
+        return window_title(fig_bunches_mt)
 
-    st.markdown("##### 🍌 Bunches Performance")
-    col_bun1, col_bun2, col_bun3, col_bun4 = st.columns(4)
-    with col_bun1:
-        st.metric("Peak Bunches", f"{max_bunches:,.0f}", 
-                 help="Highest monthly count")
-    with col_bun2:
-        st.metric("Lowest Bunches", f"{min_bunches:,.0f}", 
-                 help="Lowest monthly count")
-    with col_bun3:
-        st.metric("Average Bunches", f"{avg_bunches:,.0f}", 
-                 help="Mean monthly count")
-    with col_bun4:
-        st.metric("Growth Trend", f"{growth_bunches:.1f}%",
-                 delta_color="inverse" if growth_bunches < 0 else "normal",
-                 help="Percentage change in bunches")
+    def field_efficiency_figure(column, title, label):
+        # Field comparison for KG/Bunch
+        field_kg_bunch = efficiency_df.groupby('Field')[column].mean().reset_index().sort_values(column)
+        fig_field_kg = px.bar(
+            field_kg_bunch,
+            x='Field',
+            y=column,
+            title=title,
+            labels={column: label},
+            color=column,
+            color_continuous_scale='Reds'
+        )
+        fig_field_kg.update_layout(height=400)
+        return fig_field_kg
 
-    # Field Comparison Section
-    st.subheader("🌿 Field Performance Comparison")
-    field_tab1, field_tab2 = st.tabs(["Yield by Field", "Bunches by Field"])
-    
-    with field_tab1:
-        fig_fields_mt = px.line(
-            filtered_df,
+    def field_trend_figure():
+        return window_title(px.line(
+            efficiency_by_field,
             x='Date',
-            y='MT',
+            y='Bunches_per_MT',
             color='Field',
-            title='<b>Monthly Yield (MT) by Field</b>',
-            labels={'MT': 'Yield (MT)'},
+            title='<b>Bunches/MT Efficiency by Field Over Time</b>',
             markers=True,
             line_shape='spline'
         ).update_layout(
-            height=500, 
+            height=500,
             hovermode="x unified",
             plot_bgcolor='rgba(0,0,0,0)',
+            yaxis_title="Bunches per MT",
             legend_title="Field Code"
+        ))
+
+    def kg_bunch_figure():
+        fig_kg_bunch = px.line(
+            efficiency_series,
+            x='Date',
+            y='KG_per_Bunch',
+            title='<b>Average Bunch Weight (kg)</b>',
+            labels={'KG_per_Bunch': 'Weight (kg)'},
+            markers=True,
+            line_shape='spline',
+            color_discrete_sequence=['#d62728']
+        ).update_layout(
+            hovermode="x unified",
+            plot_bgcolor='rgba(0,0,0,0)',
+            height=400,
+            yaxis_title="Kilograms per Bunch"
         )
-        st.plotly_chart(fig_fields_mt, use_container_width=True)
-    
-    with field_tab2:
-        fig_fields_bunches = px.line(
-            filtered_df,
+        
+        shown_kg_bunch = efficiency_series['KG_per_Bunch'].mean()
+        fig_kg_bunch.add_hline(
+            y=shown_kg_bunch,
+            line_dash="dot",
+            annotation_text=f'Average change: {shown_kg_bunch:+,.1f}%' if percent_window else f'Average: {shown_kg_bunch:,.1f} kg',
+            annotation_position="bottom right",
+            line_color="green"
+        )
+        return window_title(fig_kg_bunch)
+
+    def weight_trend_figure():
+        return window_title(px.line(
+            efficiency_by_field,
             x='Date',
-            y='Bunches',
+            y='KG_per_Bunch',
             color='Field',
-            title='<b>Monthly Bunches Count by Field</b>',
-            labels={'Bunches': 'Bunches Count'},
+            title='<b>Bunch Weight by Field Over Time</b>',
             markers=True,
             line_shape='spline'
         ).update_layout(
-            height=500, 
+            height=500,
             hovermode="x unified",
             plot_bgcolor='rgba(0,0,0,0)',
+            yaxis_title="Kilograms per Bunch",
             legend_title="Field Code"
-        )
-        st.plotly_chart(fig_fields_bunches, use_container_width=True)
-        
-    # Efficiency Analysis Section
-    st.subheader("⚡ Production Efficiency Metrics")
+        ))
+
+    # With the shared aggregates ready, every figure of the tab is built on
+    # the figure pool at once; each is rendered below in page order as soon
+    # as it is done, while the later ones are still being built
+    figures = build_figures({
+        'yield': lambda: window_title(monthly_yield_figure(yield_series, percent_window)),
+        'bunches': lambda: window_title(monthly_bunches_figure(bunches_series, percent_window)),
+        'fields_mt': fields_mt_figure,
+        'fields_bunches': fields_bunches_figure,
+        'bunches_mt': bunches_mt_figure,
+        'field_bunches_mt': lambda: field_efficiency_figure('Bunches_per_MT', '<b>Average Bunches_per_MT by Field</b>', 'Weight (Bunches_per_MT)'),
+        'field_trend': field_trend_figure,
+        'kg_bunch': kg_bunch_figure,
+        'field_kg_bunch': lambda: field_efficiency_figure('KG_per_Bunch', '<b>Average KG/Bunch by Field</b>', 'Weight (kg/bunch)'),
+        'weight_trend': weight_trend_figure,
+    })
+
+    # Overview Tabs
+    overview_tab1, overview_tab2 = st.tabs(["📈 Monthly Yield (MT)", "🍌 Monthly Bunches Count"])
     
-    # Calculate efficiency metrics
-    efficiency_df = filtered_df.copy()
-    efficiency_df['Bunches_per_MT'] = efficiency_df['Bunches'] / efficiency_df['MT']
-    efficiency_df['KG_per_Bunch'] = (efficiency_df['MT'] * 1000) / efficiency_df['Bunches']
+    if approx_mode:
+        st.caption(f"⚡ Estimated from a {sample_fraction:.0%} stratified sample with 95% bounds; exact values fill in once the page has rendered.")
+
+    with overview_tab1:
+        # Yield (MT) chart
+        yield_chart_slot = st.empty()
+        show_chart(figures['yield'].result(), yield_chart_slot)
+
+    with overview_tab2:
+        # Bunches chart
+        bunches_chart_slot = st.empty()
+        show_chart(figures['bunches'].result(), bunches_chart_slot)
     
-    monthly_efficiency = efficiency_df.groupby(pd.Grouper(key='Date', freq='MS')).agg({
-        'Bunches_per_MT': 'mean',
-        'KG_per_Bunch': 'mean'
-    }).reset_index()
+    # Performance Summary Section
+    st.subheader("📊 Performance Summary Statistics")
+    
+    summary_slot = st.empty()
+    with summary_slot.container():
+        show_yield_summary(monthly_total, monthly_bunches)
+
+    if approx_mode:
+        def refine_yield_overview():
+            exact_total = monthly_sum('MT')
+            exact_bunches = monthly_sum('Bunches')
+            # Windowed charts are drawn from the exact matrices already
+            if not window_on:
+                show_chart(monthly_yield_figure(exact_total), yield_chart_slot)
+                show_chart(monthly_bunches_figure(exact_bunches), bunches_chart_slot)
+            with summary_slot.container():
+                show_yield_summary(exact_total, exact_bunches)
+        pending_refinements.append(refine_yield_overview)
+
+    # Field Comparison Section
+    st.subheader("🌿 Field Performance Comparison")
+    field_tab1, field_tab2 = st.tabs(["Yield by Field", "Bunches by Field"])
+    
+    with field_tab1:
+        show_chart(figures['fields_mt'].result())
+    
+    with field_tab2:
+        show_chart(figures['fields_bunches'].result())
+        
+    # Efficiency Analysis Section
+    st.subheader("⚡ Production Efficiency Metrics")
 
     # Efficiency Tabs
     eff_tab1, eff_tab2 = st.tabs(["Bunches per MT Analysis", "KG per Bunch Analysis"])
@@ -408,131 +1021,27 @@ with tab1:
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_bunches_mt = px.line(
-                monthly_efficiency,
-                x='Date',
-                y='Bunches_per_MT',
-                title='<b>Bunches Required per Metric Ton</b>',
-                labels={'Bunches_per_MT': 'Bunches/MT'},
-                markers=True,
-                line_shape='spline',
-                color_discrete_sequence=['#2ca02c']
-            ).update_layout(
-                hovermode="x unified",
-                plot_bgcolor='rgba(0,0,0,0)',
-                height=400,
-                yaxis_title="Bunches per MT"
-            )
-            
-            avg_bunches_mt = monthly_efficiency['Bunches_per_MT'].mean()
-            fig_bunches_mt.add_hline(
-                y=avg_bunches_mt,
-                line_dash="dot",
-                annotation_text=f'Average: {avg_bunches_mt:,.1f}',
-                annotation_position="bottom right",
-                line_color="orange"
-            )
-            st.plotly_chart(fig_bunches_mt, use_container_width=True)
+            show_chart(figures['bunches_mt'].result())
         
         with col2:
-        # Field comparison for KG/Bunch
-            field_kg_bunch = efficiency_df.groupby('Field')['Bunches_per_MT'].mean().reset_index().sort_values('Bunches_per_MT')
-            fig_field_kg = px.bar(
-                field_kg_bunch,
-                x='Field',
-                y='Bunches_per_MT',
-             title='<b>Average Bunches_per_MT by Field</b>',
-                labels={'Bunches_per_MT': 'Weight (Bunches_per_MT)'},
-                color='Bunches_per_MT',
-                color_continuous_scale='Reds'
-            )
-        
-            fig_field_kg.update_layout(height=400)
-            st.plotly_chart(fig_field_kg, use_container_width=True)
+            show_chart(figures['field_bunches_mt'].result())
             
         # Field trend analysis
         st.markdown("##### 📅 Field Efficiency Trends Over Time")
-        fig_field_trend = px.line(
-            efficiency_df,
-            x='Date',
-            y='Bunches_per_MT',
-            color='Field',
-            title='<b>Bunches/MT Efficiency by Field Over Time</b>',
-            markers=True,
-            line_shape='spline'
-        ).update_layout(
-            height=500,
-            hovermode="x unified",
-            plot_bgcolor='rgba(0,0,0,0)',
-            yaxis_title="Bunches per MT",
-            legend_title="Field Code"
-        )
-        st.plotly_chart(fig_field_trend, use_container_width=True)
+        show_chart(figures['field_trend'].result())
 
     with eff_tab2:
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_kg_bunch = px.line(
-                monthly_efficiency,
-                x='Date',
-                y='KG_per_Bunch',
-                title='<b>Average Bunch Weight (kg)</b>',
-                labels={'KG_per_Bunch': 'Weight (kg)'},
-                markers=True,
-                line_shape='spline',
-                color_discrete_sequence=['#d62728']
-            ).update_layout(
-                hovermode="x unified",
-                plot_bgcolor='rgba(0,0,0,0)',
-                height=400,
-                yaxis_title="Kilograms per Bunch"
-            )
-            
-            avg_kg_bunch = monthly_efficiency['KG_per_Bunch'].mean()
-            fig_kg_bunch.add_hline(
-                y=avg_kg_bunch,
-                line_dash="dot",
-                annotation_text=f'Average: {avg_kg_bunch:,.1f} kg',
-                annotation_position="bottom right",
-                line_color="green"
-            )
-            st.plotly_chart(fig_kg_bunch, use_container_width=True)
+            show_chart(figures['kg_bunch'].result())
         
         with col2:
-        # Field comparison for KG/Bunch
-            field_kg_bunch = efficiency_df.groupby('Field')['KG_per_Bunch'].mean().reset_index().sort_values('KG_per_Bunch')
-            fig_field_kg = px.bar(
-                field_kg_bunch,
-                x='Field',
-                y='KG_per_Bunch',
-             title='<b>Average KG/Bunch by Field</b>',
-                labels={'KG_per_Bunch': 'Weight (kg/bunch)'},
-                color='KG_per_Bunch',
-                color_continuous_scale='Reds'
-            )
-        
-            fig_field_kg.update_layout(height=400)
-            st.plotly_chart(fig_field_kg, use_container_width=True)
+            show_chart(figures['field_kg_bunch'].result())
             
         # Field trend analysis
         st.markdown("##### 📅 Bunch Weight Trends Over Time")
-        fig_weight_trend = px.line(
-            efficiency_df,
-            x='Date',
-            y='KG_per_Bunch',
-            color='Field',
-            title='<b>Bunch Weight by Field Over Time</b>',
-            markers=True,
-            line_shape='spline'
-        ).update_layout(
-            height=500,
-            hovermode="x unified",
-            plot_bgcolor='rgba(0,0,0,0)',
-            yaxis_title="Kilograms per Bunch",
-            legend_title="Field Code"
-        )
-        st.plotly_chart(fig_weight_trend, use_container_width=True)
+        show_chart(figures['weight_trend'].result())
 
     # Efficiency Metrics Cards
     st.subheader("🏆 Efficiency Performance Indicators")
@@ -579,7 +1088,7 @@ with tab1:
             delta_color="off"
         )
 
-with tab2:
+with tab2, timed_section("Fertilizer Impact"):
     # ---- Header with description ----
     st.header("🌱 Fertilizer Impact Analysis")
     st.markdown("""
@@ -631,7 +1140,7 @@ with tab2:
         showlegend=False  # Disabled legend
     )
     
-    st.plotly_chart(fig4, use_container_width=True)
+    show_chart(fig4)
     
     # ---- Usage Metrics ----
     st.subheader("Usage Patterns")
@@ -648,7 +1157,7 @@ with tab2:
             color_discrete_sequence=px.colors.qualitative.Pastel
         )
         fig5.update_traces(textposition='inside', textinfo='percent+label', showlegend=False)
-        st.plotly_chart(fig5, use_container_width=True)
+        show_chart(fig5)
     
     with col2:
         fig6 = px.bar(
@@ -665,10 +1174,10 @@ with tab2:
             yaxis_title='<b>Number of Rounds</b>',
             showlegend=False  # Disabled legend
         )
-        st.plotly_chart(fig6, use_container_width=True)
+        show_chart(fig6)
     
     # ---- Tabs for Detailed Analysis ----
-    tab2_1, tab2_2, tab2_3 = st.tabs(["📍 Area Coverage", "👷 Labor Analysis", "🌴 Palm Coverage"])
+    tab2_1, tab2_2, tab2_3, tab2_4 = st.tabs(["📍 Area Coverage", "👷 Labor Analysis", "🌴 Palm Coverage", "🧪 What-if Planner"])
     
     with tab2_1:
         st.subheader("Area Coverage Metrics")
@@ -685,7 +1194,7 @@ with tab2:
                 color_discrete_sequence=px.colors.qualitative.Pastel
             )
             fig7.update_layout(showlegend=False)  # Disabled legend
-            st.plotly_chart(fig7, use_container_width=True)
+            show_chart(fig7)
         
         with col2:
             fig8 = px.bar(
@@ -698,7 +1207,7 @@ with tab2:
                 color_discrete_sequence=px.colors.qualitative.Pastel
             )
             fig8.update_layout(showlegend=False)  # Disabled legend
-            st.plotly_chart(fig8, use_container_width=True)
+            show_chart(fig8)
     
     with tab2_2:
         st.subheader("Labor Utilization for Fertilizer")
@@ -768,18 +1277,11 @@ with tab2:
             hovermode='x unified'
         )
     
-        st.plotly_chart(fig7, use_container_width=True)
+        show_chart(fig7)
     
         # Display the data table
         st.markdown("**Detailed Labor Statistics by Weed Control Type**")
-        st.dataframe(
-            labor_stats.style
-                .format({'Avg Workers': '{:.1f}', 'Avg Mandays': '{:.1f}'})
-                .set_properties(**{'text-align': 'center'})
-                .highlight_max(color='lightgreen', subset=['Total Workers', 'Total Mandays'])
-                .highlight_min(color='#ffcccb', subset=['Total Workers', 'Total Mandays']),
-            use_container_width=True
-        )
+        show_labor_table(labor_stats)
     
     with tab2_3:
         st.subheader("Palm Coverage Analysis")
@@ -796,7 +1298,7 @@ with tab2:
                 color_discrete_sequence=px.colors.qualitative.Pastel
             )
             fig11.update_layout(showlegend=False)  # Disabled legend
-            st.plotly_chart(fig11, use_container_width=True)
+            show_chart(fig11)
         
         with col2:
             fig12 = px.bar(
@@ -809,9 +1311,113 @@ with tab2:
                 color_discrete_sequence=px.colors.qualitative.Pastel
             )
             fig12.update_layout(showlegend=False)  # Disabled legend
-            st.plotly_chart(fig12, use_container_width=True)
+            show_chart(fig12)
+
+    with tab2_4:
+        from whatif import FERTILIZER, LABOR, score_plans, search_plans
+
+        st.subheader("Fertilizer Allocation What-if")
+        st.markdown("Reallocate the period's fertilizer bags across fields and see the projected yield and labor.")
+
+        # Response of every field, learned once per data version from the whole history
+        fert_model = load_fertilizer_model(version)
+        plan_base = filtered_df.groupby('Field').agg(
+            Bags=(FERTILIZER, 'sum'),
+            MT=('MT', 'sum'),
+            Mandays=(LABOR, 'sum'),
+            Months=('Date', 'nunique')
+        )
+        if plan_base.empty:
+            show_no_data_message()
+        else:
+            rows = [fert_model['fields'].index(f) for f in plan_base.index]
+            mt_per_bag = fert_model['mt_per_bag'][rows]
+            mandays_per_bag = fert_model['mandays_per_bag'][rows]
+            # Bags above the field's busiest month, repeated every month, are beyond anything observed
+            plan_caps = fert_model['peak_bags'][rows] * plan_base['Months'].to_numpy()
+            baseline_bags = plan_base['Bags'].to_numpy()
+
+            plan_table = st.data_editor(
+                pd.DataFrame({
+                    'Field': plan_base.index,
+                    'Current bags': baseline_bags,
+                    'Planned bags': baseline_bags,
+                    'MT per bag': mt_per_bag,
+                    'Mandays per bag': mandays_per_bag,
+                    'Response lag (months)': fert_model['lag'][rows],
+                }),
+                column_config={
+                    'Current bags': st.column_config.NumberColumn(format="%.0f"),
+                    'Planned bags': st.column_config.NumberColumn(format="%.0f", min_value=0.0, step=1.0),
+                    'MT per bag': st.column_config.NumberColumn(format="%.3f"),
+                    'Mandays per bag': st.column_config.NumberColumn(format="%.3f"),
+                    'Response lag (months)': st.column_config.NumberColumn(format="%.0f"),
+                },
+                disabled=['Field', 'Current bags', 'MT per bag', 'Mandays per bag', 'Response lag (months)'],
+                hide_index=True,
+                use_container_width=True,
+                key='fertilizer_plan'
+            )
+            planned_bags = plan_table['Planned bags'].fillna(0).to_numpy(dtype=float)
+            plan_gain, plan_mandays = (v[0] for v in score_plans(planned_bags, baseline_bags, mt_per_bag, mandays_per_bag, plan_caps))
+            base_mandays = baseline_bags @ mandays_per_bag
+
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Projected Yield", f"{plan_base['MT'].sum() + plan_gain:,.1f} MT", f"{plan_gain:+,.1f} MT")
+            col2.metric("Fertilizer", f"{planned_bags.sum():,.0f} bags", f"{planned_bags.sum() - baseline_bags.sum():+,.0f} bags", delta_color="off")
+            col3.metric("Fertilizer Labor", f"{plan_mandays:,.1f} mandays", f"{plan_mandays - base_mandays:+,.1f} mandays", delta_color="inverse")
+
+            # Batch mode: score many random splits of the planned total and keep the best
+            st.markdown("**Suggest an allocation**")
+            col1, col2, col3 = st.columns([2, 2, 1])
+            with col1:
+                n_plans = st.select_slider("Random plans to score", options=[1000, 5000, 20000, 50000], value=5000)
+            with col2:
+                hold_labor = st.checkbox("Keep labor within the plan's mandays", value=True)
+            with col3:
+                suggest = st.button("🔍 Suggest", use_container_width=True)
+            if suggest:
+                started = time.perf_counter()
+                best_plan, best_gain, best_mandays = search_plans(
+                    planned_bags.sum(), baseline_bags, mt_per_bag, mandays_per_bag, plan_caps,
+                    n_plans=n_plans, max_mandays=plan_mandays if hold_labor else None
+                )
+                searched = time.perf_counter() - started
+                if not np.isfinite(best_gain):
+                    st.warning(f"None of the {n_plans:,} plans stays within {plan_mandays:,.1f} mandays; untick the labor limit or score more plans.")
+                else:
+                    suggestion = pd.DataFrame({
+                        'Field': plan_base.index,
+                        'Current bags': baseline_bags,
+                        'Suggested bags': best_plan,
+                        'Extra MT': (np.minimum(best_plan, plan_caps) - np.minimum(baseline_bags, plan_caps)) * mt_per_bag,
+                    })
+                    fig_plan = px.bar(
+                        suggestion.melt(id_vars='Field', value_vars=['Current bags', 'Suggested bags'], var_name='Plan', value_name='Bags'),
+                        x='Field',
+                        y='Bags',
+                        color='Plan',
+                        barmode='group',
+                        title='<b>Current vs Suggested Fertilizer Bags</b>',
+                        color_discrete_sequence=['#9ecae1', '#2e8b57']
+                    )
+                    fig_plan.update_layout(xaxis_type='category', plot_bgcolor='rgba(0,0,0,0)')
+                    show_chart(fig_plan)
+                    st.dataframe(
+                        suggestion,
+                        column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ['Current bags', 'Suggested bags', 'Extra MT']},
+                        hide_index=True,
+                        use_container_width=True
+                    )
+                    st.caption(f"Best of {n_plans:,} plans scored in {searched:.2f}s: {best_gain:+,.1f} MT against the current allocation, {best_mandays:,.1f} mandays.")
 
-with tab3:
+            st.caption(
+                "Yield response is each field's MT per extra bag at its best lag (3-12 months, deseasonalized) over its whole history; "
+                "negative responses count as none, and bags beyond the field's busiest month every month earn nothing extra. "
+                "Projections are indicative: extra yield arrives after the response lag."
+            )
+
+with tab3, timed_section("WeedControl Analysis"):
     st.header("WeedControl Analysis")
     st.markdown("""
     <style>
@@ -862,7 +1468,7 @@ with tab3:
         showlegend=False  # Disabled legend
     )
     
-    st.plotly_chart(fig4, use_container_width=True)
+    show_chart(fig4)
         # ---- Weed Control Type Distribution ----
     st.subheader("Weed Control Type Distribution")
     
@@ -882,7 +1488,7 @@ with tab3:
             hole=0.4
         )
         fig5.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig5, use_container_width=True)
+        show_chart(fig5)
     
     with col2:
         # Max number of rounds for each weed control type
@@ -903,7 +1509,7 @@ with tab3:
             xaxis=dict(title='<b>Weed Control Type</b>'),
             showlegend=False
         )
-        st.plotly_chart(fig6, use_container_width=True)
+        show_chart(fig6)
 
         # ---- Labor Analysis ----
     st.subheader("Labor Utilization for Weed Control")
@@ -973,20 +1579,13 @@ with tab3:
         hovermode='x unified'
     )
     
-    st.plotly_chart(fig7, use_container_width=True)
+    show_chart(fig7)
     
     # Display the data table
     st.markdown("**Detailed Labor Statistics by Weed Control Type**")
-    st.dataframe(
-        labor_stats.style
-            .format({'Avg Workers': '{:.1f}', 'Avg Mandays': '{:.1f}'})
-            .set_properties(**{'text-align': 'center'})
-            .highlight_max(color='lightgreen', subset=['Total Workers', 'Total Mandays'])
-            .highlight_min(color='#ffcccb', subset=['Total Workers', 'Total Mandays']),
-        use_container_width=True
-    )
+    show_labor_table(labor_stats)
     
-with tab4:
+with tab4, timed_section("Pest&Disease"):
     st.header("Pest&Disease Analysis")
     st.markdown("""
     <style>
@@ -1037,7 +1636,7 @@ with tab4:
         showlegend=False
     )
     
-    st.plotly_chart(fig4, use_container_width=True)
+    show_chart(fig4)
     
     # ---- Pest&Disease Type Distribution ----
     st.subheader("Pest&Disease Type Distribution")
@@ -1058,7 +1657,7 @@ with tab4:
             hole=0.4
         )
         fig5.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig5, use_container_width=True)
+        show_chart(fig5)
     
     with col2:
         # Max number of rounds for each pest type
@@ -1079,7 +1678,7 @@ with tab4:
             xaxis=dict(title='<b>Pest&Disease Type</b>'),
             showlegend=False
         )
-        st.plotly_chart(fig6, use_container_width=True)
+        show_chart(fig6)
 
     # ---- Labor Analysis ----
     st.subheader("Labor Utilization for Pest&Disease Control")
@@ -1149,21 +1748,14 @@ with tab4:
         hovermode='x unified'
     )
     
-    st.plotly_chart(fig7, use_container_width=True)
+    show_chart(fig7)
     
     # Display the data table
     st.markdown("**Detailed Labor Statistics by Pest&Disease Type**")
-    st.dataframe(
-        labor_stats.style
-            .format({'Avg Workers': '{:.1f}', 'Avg Mandays': '{:.1f}'})
-            .set_properties(**{'text-align': 'center'})
-            .highlight_max(color='lightgreen', subset=['Total Workers', 'Total Mandays'])
-            .highlight_min(color='#ffcccb', subset=['Total Workers', 'Total Mandays']),
-        use_container_width=True
-    )
+    show_labor_table(labor_stats)
 
 
-with tab5:
+with tab5, timed_section("Raw Data"):
     st.header("Raw Data View")
     st.dataframe(filtered_df, use_container_width=True)
     
@@ -1176,7 +1768,119 @@ with tab5:
         mime='text/csv'
     )
 
-with tab6:
+    # Management report: KPIs, monthly yield, production and labor by
+    # treatment and a forecast, as one workbook or one per estate in a zip.
+    # Built in a background thread, so the dashboard stays usable meanwhile.
+    import hashlib
+    import json
+    import os
+    from report import REPORT_DIR, FORECAST_MONTHS, write_report, write_estate_pack, start_report
+
+    def show_report_job(job, label, file_name, mime):
+        # A finished report whose file has expired is built again on request
+        if job is None or (job['status'] == 'done' and not os.path.exists(job['path'])):
+            return
+        if job['status'] == 'running':
+            st.progress(job['done'] / job['total'], text=f"Building… {job['done']}/{job['total']}")
+            st.button("🔄 Check progress", key=f"check_{file_name}")
+        elif job['status'] == 'failed':
+            st.error(f"Report failed: {job['error']}")
+        else:
+            # The file is only read when the button is clicked, not on every rerun
+            def read_report(path=job['path']):
+                with open(path, 'rb') as f:
+                    return f.read()
+            st.download_button(label, data=read_report, file_name=file_name, mime=mime, key=f"download_{file_name}")
+            st.caption(f"Built in {job['seconds']:.1f}s")
+
+    st.subheader("📑 Management Report")
+    if filtered_df.empty:
+        show_no_data_message()
+    else:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        jobs = report_jobs()
+        report_id = hashlib.sha1(json.dumps([version, current_spec], default=str).encode()).hexdigest()[:12]
+        col_report1, col_report2 = st.columns(2)
+        with col_report1:
+            if st.button("📊 Build Excel report", help=f"KPIs, monthly yield, production and labor by treatment and a {FORECAST_MONTHS}-month forecast for the current filters"):
+                start_report(jobs, ('report', report_id), write_report,
+                             os.path.join(REPORT_DIR, f"report-{report_id}.xlsx"), filtered_df.copy())
+            show_report_job(jobs.get(('report', report_id)), "⬇️ Download report",
+                            'plantation_report.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        with col_report2:
+            if st.button("🗂️ Build estate pack", help="The same report for every estate in hierarchy.csv, all fields of the selected years, months and fertilizer types"):
+                from hierarchy import read_hierarchy
+                pack_rows = period_df[period_df['TypeOfFetilizer'].isin(selected_fertilizer)].copy()
+                start_report(jobs, ('pack', report_id), write_estate_pack,
+                             os.path.join(REPORT_DIR, f"estates-{report_id}.zip"), pack_rows, read_hierarchy(manifest['fields']))
+            show_report_job(jobs.get(('pack', report_id)), "⬇️ Download estate pack",
+                            'estate_reports.zip', 'application/zip')
+
+    # Workbook rows that failed validation when the data store was built
+    quarantine = pd.DataFrame(manifest.get('quarantine', []))
+    if quarantine.empty:
+        st.caption("✅ Every workbook row passed validation.")
+    else:
+        held_back = (quarantine['Action'] == 'quarantined').sum()
+        with st.expander(f"🧪 Data quality: {held_back} rows quarantined, {len(quarantine) - held_back} flagged"):
+            st.caption("Quarantined rows are left out of every chart and table; flagged rows are kept. Row numbers match the Excel sheet; rows added from the daily logs have none.")
+            quarantine['Row'] = quarantine['Row'].astype('Int64')
+            st.dataframe(quarantine, hide_index=True, use_container_width=True)
+
+    # Recorded versions and what changed between any two of them
+    if len({v['id'] for v in version_history}) > 1 and st.toggle("🕰️ Show version history", key='show_versions'):
+        history_table = pd.DataFrame([{
+            'Recorded': v['created'][:19],
+            'Version': v['id'],
+            'Stored as': v['kind'],
+            'Rows': v['rows'],
+            'Added': v['added'],
+            'Changed': v['changed'],
+            'Removed': len(v['removed']),
+        } for v in reversed(version_history)])
+        st.dataframe(history_table, hide_index=True, use_container_width=True)
+        version_ids = list(dict.fromkeys(v['id'] for v in reversed(version_history)))
+        col_diff1, col_diff2 = st.columns(2)
+        with col_diff1:
+            diff_from = st.selectbox("Compare version", version_ids, index=1, key='diff_from')
+        with col_diff2:
+            diff_to = st.selectbox("with", version_ids, index=0, key='diff_to')
+        version_diff = load_version_diff(diff_from, diff_to)
+        if version_diff.empty:
+            st.info("The two versions hold the same data.")
+        else:
+            st.caption(f"{len(version_diff):,} differences; changed rows list one line per changed value.")
+            st.dataframe(version_diff, hide_index=True, use_container_width=True)
+
+    # Daily weighbridge records behind the months the logs cover
+    if daily_state['files']:
+        from ingest import read_monthly, read_daily
+        with st.expander(f"📅 Daily harvest logs: {daily_state['rows']:,} rows from {len(daily_state['files'])} files"):
+            if daily_state['batch']:
+                st.caption(f"Last ingested {daily_state['updated']}; {daily_state['rejected']:,} unusable lines skipped. "
+                           "Months covered by the logs take their MT, bunches and input totals from them.")
+            for relpath, error in daily_state['errors'].items():
+                st.warning(f"{relpath}: {error}")
+
+            logged = read_monthly() if daily_state['batch'] else None
+            logged_months = [] if logged is None else sorted(
+                pd.DatetimeIndex(logged[logged.index.get_level_values('Field').isin(selected_fields)].index.get_level_values('Date')).unique(),
+                reverse=True,
+            )
+            if logged_months:
+                daily_month = st.selectbox("Month", logged_months, format_func=lambda d: d.strftime('%B %Y'), key='daily_month')
+                daily = read_daily(daily_month.year, daily_month.month, selected_fields)
+                if 'MT' in daily.columns:
+                    fig = px.bar(daily.groupby(['Date', 'Field'], as_index=False)['MT'].sum(), x='Date', y='MT', color='Field',
+                                 title=f"Daily Yield, {daily_month.strftime('%B %Y')}", labels={'MT': 'Yield (MT)'})
+                    show_chart(fig)
+                st.dataframe(daily, hide_index=True, use_container_width=True)
+            elif daily_state['batch']:
+                st.info("The logs have no months for the selected fields.")
+
+with tab6, timed_section("Yield Forecast"):
+    from montecarlo import seasonal_forecast, quantile_table
+
     st.header("Yield Forecasting")
     
     if len(filtered_df) < 3:
@@ -1197,45 +1901,8 @@ with tab6:
             help="Drag to select months (1-60) or click for precise entry"
         )
         
-        # Prepare data - aggregate by month and ensure complete series
-        forecast_df = filtered_df.groupby(pd.Grouper(key='Date', freq='MS'))['MT'].sum().reset_index()
-        forecast_df = forecast_df.set_index('Date').asfreq('MS').fillna(method='ffill').reset_index()
-        
-        # Create time features for trend calculation
-        forecast_df['month_num'] = forecast_df['Date'].dt.month
-        forecast_df['time_index'] = np.arange(len(forecast_df))
-        
-        # Calculate seasonal components (12-month pattern)
-        monthly_avg = forecast_df.groupby('month_num')['MT'].mean()
-        seasonal_component = monthly_avg / monthly_avg.mean()
-        
-        # Calculate trend component (linear regression)
-        X = forecast_df['time_index'].values.reshape(-1, 1)
-        y = forecast_df['MT'].values
-        trend_slope = np.polyfit(forecast_df['time_index'], forecast_df['MT'], 1)[0]
-        
-        # Generate future dates
-        last_date = forecast_df['Date'].iloc[-1]
-        future_dates = pd.date_range(
-            start=last_date + pd.DateOffset(months=1),
-            periods=forecast_period,
-            freq='MS'
-        )
-        
-        # Create future predictions with trend + seasonality
-        future_df = pd.DataFrame({
-            'Date': future_dates,
-            'month_num': future_dates.month,
-            'time_index': np.arange(len(forecast_df), len(forecast_df)+forecast_period)
-        })
-        
-        # Apply trend and seasonality
-        base_value = forecast_df['MT'].iloc[-1]
-        future_df['MT'] = base_value + (future_df['time_index'] - len(forecast_df)) * trend_slope
-        future_df['MT'] = future_df.apply(
-            lambda row: row['MT'] * seasonal_component[row['month_num']], 
-            axis=1
-        )
+        # Monthly history (gaps filled) and the trend x seasonality projection
+        forecast_df, future_df = seasonal_forecast(filtered_df, forecast_period)
         
         # Create plot
         fig = go.Figure()
@@ -1269,8 +1936,8 @@ with tab6:
             shapes=[
                 dict(
                     type='line',
-                    x0=last_date,
-                    x1=future_dates[0],
+                    x0=forecast_df['Date'].iloc[-1],
+                    x1=future_df['Date'].iloc[0],
                     y0=forecast_df['MT'].iloc[-1],
                     y1=future_df['MT'].iloc[0],
                     line=dict(color='#FFA500', width=3, dash='dot')
@@ -1278,7 +1945,7 @@ with tab6:
             ]
         )
         
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
         
         # Forecast summary
         st.subheader("Forecast Summary")
@@ -1313,6 +1980,642 @@ with tab6:
                 help="Most recent actual yield value"
             )
 
+        # Probabilistic ranges for harvest planning and mill bookings
+        st.subheader("🎲 Forecast Ranges")
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            show_ranges = st.toggle("Monte Carlo simulation", value=False,
+                                    help="Simulate many yield paths per field to get P10/P50/P90 ranges")
+        if show_ranges:
+            with col2:
+                mc_paths = st.select_slider("Simulated paths", options=[500, 1000, 2000, 5000, 10000], value=2000)
+            spec_key = tuple((key, tuple(current_spec[key])) for key in FILTER_KEYS)
+            mc = load_monte_carlo(version, spec_key, forecast_period, mc_paths, filtered_df)
+            total_bands = quantile_table(mc['total_paths'], mc['dates'])
+
+            fig_fan = go.Figure()
+            fig_fan.add_trace(go.Scatter(
+                x=forecast_df['Date'], y=forecast_df['MT'],
+                name='Historical Yield', line=dict(color='#2e8b57', width=3), mode='lines+markers'
+            ))
+            fig_fan.add_trace(go.Scatter(
+                x=total_bands.index, y=total_bands['P90'],
+                mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+            ))
+            fig_fan.add_trace(go.Scatter(
+                x=total_bands.index, y=total_bands['P10'],
+                mode='lines', line=dict(width=0), fill='tonexty',
+                fillcolor='rgba(255,165,0,0.25)', name='P10–P90 range'
+            ))
+            fig_fan.add_trace(go.Scatter(
+                x=total_bands.index, y=total_bands['P50'],
+                name='Median (P50)', line=dict(color='#FFA500', width=3, dash='dot'), mode='lines+markers'
+            ))
+            fig_fan.update_layout(
+                title=f'Yield Forecast Range - Next {forecast_period} Months',
+                xaxis_title='Date',
+                yaxis_title='Yield (MT)',
+                hovermode="x unified",
+                plot_bgcolor='rgba(0,0,0,0)',
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+            )
+            show_chart(fig_fan)
+
+            period_totals = quantile_table(mc['total_paths'].sum(axis=1, keepdims=True), ['Total'])
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total Yield P10", f"{period_totals.at['Total', 'P10']:,.1f} MT", help="9 in 10 simulated paths exceed this")
+            col2.metric("Total Yield P50", f"{period_totals.at['Total', 'P50']:,.1f} MT", help="Median of the simulated paths")
+            col3.metric("Total Yield P90", f"{period_totals.at['Total', 'P90']:,.1f} MT", help="Only 1 in 10 simulated paths exceed this")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Monthly ranges (MT)**")
+                month_table = total_bands.copy()
+                month_table.index = month_table.index.strftime('%b %Y')
+                st.dataframe(
+                    month_table.rename_axis('Month').reset_index(),
+                    column_config={q: st.column_config.NumberColumn(format="%.1f") for q in month_table.columns},
+                    hide_index=True,
+                    use_container_width=True
+                )
+            with col2:
+                st.markdown(f"**Field totals over {forecast_period} months (MT)**")
+                field_table = quantile_table(mc['field_totals'], pd.Index(mc['fields'], name='Field'))
+                st.dataframe(
+                    field_table.reset_index(),
+                    column_config={q: st.column_config.NumberColumn(format="%.1f") for q in field_table.columns},
+                    hide_index=True,
+                    use_container_width=True
+                )
+            st.caption(
+                f"{mc_paths:,} paths × {len(mc['fields'])} fields × {forecast_period} months simulated in "
+                f"{mc['seconds']:.2f}s ({mc['chunk']:,} paths per chunk). Each field follows its own trend × seasonal fit, "
+                "scaled by month ratios resampled from how far its actual yield strayed from that fit."
+            )
+
+with tab7, timed_section("Field Heatmap"):
+    from matrices import HEATMAP_METRICS, select, zscores, rank_fields, yoy_delta
+
+    st.header("🗺️ Field × Month Heatmap")
+    st.markdown("Every field on one chart: spot weak fields, outlier months and year-over-year shifts at a glance.")
+
+    metric_labels = {'MT': 'Yield (MT)', 'Bunches': 'Bunches Count', 'KG_per_Bunch': 'Bunch Weight (kg)'}
+    heat_views = {
+        "Values": (lambda m: m, 'Greens', None),
+        "Z-score vs field history": (lambda m: zscores(m, axis=1), 'RdBu', 0),
+        "Z-score vs all fields": (lambda m: zscores(m, axis=0), 'RdBu', 0),
+        "Rank among fields": (rank_fields, 'Greens_r', None),
+        "Year-over-year change (%)": (yoy_delta, 'RdBu', 0),
+    }
+
+    col1, col2, col3 = st.columns([2, 4, 2])
+    with col1:
+        heat_metric = st.selectbox("Metric", HEATMAP_METRICS, format_func=metric_labels.get)
+    with col2:
+        heat_view = st.radio("Show", list(heat_views), horizontal=True)
+    with col3:
+        heat_all_fields = st.checkbox("Include all fields", value=False, help="Ignore the sidebar field selection")
+
+    # Views are computed on the whole matrix, so ranks and YoY deltas still
+    # see fields and months outside the current selection
+    transform, colorscale, zmid = heat_views[heat_view]
+    heat_selection = dict(
+        fields=None if heat_all_fields else selected_fields,
+        years=selected_years,
+        month_names=selected_months
+    )
+    heat_values, heat_fields, heat_months = select(field_matrices, transform(field_matrices[heat_metric]), **heat_selection)
+    raw_values = select(field_matrices, field_matrices[heat_metric], **heat_selection)[0]
+
+    if heat_values.size == 0:
+        show_no_data_message()
+    else:
+        # Strongest fields (highest average of the metric) on top
+        recorded = ~np.isnan(raw_values)
+        field_avg = np.nansum(raw_values, axis=1) / np.maximum(recorded.sum(axis=1), 1)
+        order = np.argsort(-field_avg, kind='stable')
+
+        fig_heat = go.Figure(go.Heatmap(
+            z=heat_values[order],
+            x=heat_months,
+            y=[heat_fields[i] for i in order],
+            colorscale=colorscale,
+            zmid=zmid,
+            colorbar=dict(title=heat_view if heat_view != "Values" else metric_labels[heat_metric]),
+            hovertemplate='Field %{y}<br>%{x|%b %Y}<br>%{z:,.2f}<extra></extra>'
+        ))
+        fig_heat.update_layout(
+            title=f'<b>{metric_labels[heat_metric]} by Field and Month</b>',
+            height=max(400, 22 * len(heat_fields) + 150),
+            xaxis_title="Month",
+            yaxis=dict(title="Field Code", autorange='reversed', type='category'),
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        show_chart(fig_heat)
+        st.caption("Cells without a record for that field and month are blank. The fertilizer type filter does not apply to this view.")
+
+with tab8, timed_section("Anomaly Alerts"):
+    from anomalies import ANOMALY_RULES, DEFAULT_WINDOW, update_scores, flag_anomalies
+
+    st.header("🚨 Anomaly Alerts")
+    st.markdown("Field-months that break sharply from the field's own recent history: yield or bunch collapses, odd bunch weights and spikes in input usage or labor.")
+
+    col1, col2, col3 = st.columns([2, 2, 4])
+    with col1:
+        alert_window = st.slider("Look-back window (months)", min_value=3, max_value=12, value=DEFAULT_WINDOW,
+                                 help="Each month is compared with the median of the months before it",
+                                 key='alert_window')
+    with col2:
+        alert_threshold = st.slider("Alert threshold", min_value=2.0, max_value=8.0, value=3.5, step=0.5,
+                                    help="Robust z-score (distance from the median in MAD units)")
+    with col3:
+        alert_metrics = st.multiselect("Metrics", list(ANOMALY_RULES), default=list(ANOMALY_RULES))
+
+    state, lock = anomaly_state(version, alert_window)
+    with lock:
+        update_scores(state, field_matrices, alert_window)
+        flags = flag_anomalies(field_matrices, state, alert_threshold)
+
+    flags = flags[
+        flags['Field'].isin(selected_fields) &
+        flags['Date'].dt.year.isin(selected_years) &
+        flags['Date'].dt.month_name().isin(selected_months) &
+        flags['Metric'].isin(alert_metrics)
+    ]
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Alerts", f"{len(flags):,}", help="Flagged field-months in the selection")
+    with col2:
+        st.metric("Fields Affected", f"{flags['Field'].nunique():,}")
+    with col3:
+        st.metric("Drops", f"{(flags['Direction'] == 'Drop').sum():,}", help="Values far below the recent baseline")
+    with col4:
+        st.metric("Spikes", f"{(flags['Direction'] == 'Spike').sum():,}", help="Values far above the recent baseline")
+
+    if flags.empty:
+        st.success("✅ No anomalies in the selected fields and period.")
+    else:
+        alert_counts = flags.groupby([pd.Grouper(key='Date', freq='MS'), 'Metric']).size().reset_index(name='Alerts')
+        fig_alerts = px.bar(
+            alert_counts,
+            x='Date',
+            y='Alerts',
+            color='Metric',
+            title='<b>Alerts per Month</b>',
+            color_discrete_sequence=px.colors.qualitative.Pastel
+        ).update_layout(
+            height=400,
+            plot_bgcolor='rgba(0,0,0,0)',
+            xaxis_title="Month",
+            legend_title="Metric"
+        )
+        show_chart(fig_alerts)
+
+        st.markdown("**Flagged Field-Months**")
+        st.dataframe(
+            flags.assign(Date=flags['Date'].dt.strftime('%b %Y')),
+            column_config={
+                'Value': st.column_config.NumberColumn(format="%.2f"),
+                'Baseline': st.column_config.NumberColumn(format="%.2f", help="Median of the look-back window"),
+                'Score': st.column_config.NumberColumn(format="%.1f"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+with tab9, timed_section("Lagged Impact"):
+    from lag_analysis import LAG_INPUTS, DEFAULT_LAG_RANGE, MIN_PAIRS, best_lags
+
+    st.header("⏳ Lagged Impact of Inputs on Yield")
+    st.markdown("Does fertilizer, weed control or pest & disease work in month *t* show up in yield months later? Each field's input series is correlated with its own yield *lag* months ahead.")
+
+    col1, col2, col3 = st.columns([3, 3, 2])
+    with col1:
+        lag_input = st.selectbox("Input", LAG_INPUTS)
+    with col2:
+        lag_range = st.slider("Lag range (months)", min_value=0, max_value=24, value=DEFAULT_LAG_RANGE)
+    with col3:
+        lag_deseasonalize = st.checkbox("Remove seasonality", value=True,
+                                        help="Correlate against yield minus each field's calendar-month average")
+
+    lags = tuple(range(lag_range[0], lag_range[1] + 1))
+    lag_results = load_lag_analysis(version, lags, lag_deseasonalize)
+    lag_stats = lag_results[lag_input]
+    lag_rows = np.isin(lag_results['fields'], selected_fields)
+    lag_fields = [f for f, keep in zip(lag_results['fields'], lag_rows) if keep]
+    lag_corr = lag_stats['corr'][:, lag_rows]
+
+    if not lag_fields or np.isnan(lag_corr).all():
+        st.warning(f"⚠️ Not enough history for these lags: each field needs at least {MIN_PAIRS} months of paired data.")
+    else:
+        col1, col2 = st.columns(2)
+
+        with col1:
+            # Spread of the per-field correlations at each lag
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                q25, q50, q75 = np.nanpercentile(lag_corr, [25, 50, 75], axis=1)
+            fig_lag = go.Figure([
+                go.Scatter(x=lags, y=q75, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'),
+                go.Scatter(x=lags, y=q25, mode='lines', line=dict(width=0), fill='tonexty',
+                           fillcolor='rgba(46,139,87,0.2)', name='Middle 50% of fields', hoverinfo='skip'),
+                go.Scatter(x=lags, y=q50, mode='lines+markers', line=dict(color='#2e8b57', width=3),
+                           name='Median field')
+            ])
+            fig_lag.add_hline(y=0, line_dash="dot", line_color="grey")
+            fig_lag.update_layout(
+                title=f'<b>Correlation of {lag_input} with Later Yield</b>',
+                xaxis_title="Lag (months)",
+                yaxis_title="Correlation",
+                yaxis_range=[-1, 1],
+                height=450,
+                hovermode="x unified",
+                plot_bgcolor='rgba(0,0,0,0)',
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+            )
+            show_chart(fig_lag)
+
+        with col2:
+            fig_lag_fields = go.Figure(go.Heatmap(
+                z=lag_corr.T,
+                x=lags,
+                y=lag_fields,
+                colorscale='RdBu',
+                zmid=0,
+                zmin=-1,
+                zmax=1,
+                colorbar=dict(title='Correlation'),
+                hovertemplate='Field %{y}<br>Lag %{x} months<br>r = %{z:.2f}<extra></extra>'
+            ))
+            fig_lag_fields.update_layout(
+                title='<b>Correlation by Field and Lag</b>',
+                xaxis_title="Lag (months)",
+                yaxis=dict(title="Field Code", type='category', autorange='reversed'),
+                height=450
+            )
+            show_chart(fig_lag_fields)
+
+        st.markdown("**Strongest Lag per Field**")
+        best = best_lags({k: v[:, lag_rows] for k, v in lag_stats.items()}, lags)
+        st.dataframe(
+            pd.DataFrame({
+                'Field': lag_fields,
+                'Best Lag (months)': best['lag'],
+                'Correlation': best['corr'],
+                'MT per Unit Input': best['slope'],
+                'Month Pairs': best['pairs'],
+            }).sort_values('Correlation', key=np.abs, ascending=False),
+            column_config={
+                'Best Lag (months)': st.column_config.NumberColumn(format="%d"),
+                'Correlation': st.column_config.NumberColumn(format="%.2f"),
+                'MT per Unit Input': st.column_config.NumberColumn(format="%.4f", help="OLS slope at the best lag"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption("Uses each field's full history so every lag has data; the year and month filters do not apply here. Correlation is not causation: compare fields and lags before acting on a single value.")
+
+with tab10, timed_section("Age Cohorts"):
+    from cohorts import cohort_ratios
+
+    st.header("🌱 Palm Age Cohort Analysis")
+    st.markdown("Yield intensity by palm age band (years since planting), to separate age effects from field management.")
+
+    cohort_metrics = {
+        'MT_per_Acre': 'Yield per Acre (MT)',
+        'KG_per_Palm': 'Yield per Palm (kg)',
+        'KG_per_Bunch': 'Bunch Weight (kg)',
+    }
+    cohort_metric = st.radio("Metric", list(cohort_metrics), format_func=cohort_metrics.get, horizontal=True)
+
+    # Period selection is a lookup on the precomputed (age band, month) cube
+    cohort_cube = load_cohorts(version)
+    cohort_dates = cohort_cube.index.get_level_values('Date')
+    period_cube = cohort_cube[cohort_dates.year.isin(selected_years) & cohort_dates.month_name().isin(selected_months)]
+
+    if period_cube.empty:
+        show_no_data_message()
+    else:
+        col1, col2 = st.columns([3, 2])
+
+        with col1:
+            fig_cohort_trend = px.line(
+                period_cube.reset_index(),
+                x='Date',
+                y=cohort_metric,
+                color='AgeBand',
+                title=f'<b>Monthly {cohort_metrics[cohort_metric]} by Age Band</b>',
+                labels={cohort_metric: cohort_metrics[cohort_metric], 'AgeBand': 'Age Band'},
+                markers=True,
+                line_shape='spline'
+            ).update_layout(
+                height=450,
+                hovermode="x unified",
+                plot_bgcolor='rgba(0,0,0,0)'
+            )
+            show_chart(fig_cohort_trend)
+
+        # Period totals per band; per-acre and per-palm figures are monthly averages
+        band_totals = cohort_ratios(
+            period_cube[['MT', 'Bunches', 'Palms', 'Acres']].groupby(level='AgeBand', observed=True).sum()
+        )
+        band_totals['Fields'] = period_cube['Fields'].groupby(level='AgeBand', observed=True).max()
+        band_totals = band_totals.reset_index()
+
+        with col2:
+            fig_cohort_bar = px.bar(
+                band_totals,
+                x='AgeBand',
+                y=cohort_metric,
+                color='AgeBand',
+                title=f'<b>Average {cohort_metrics[cohort_metric]} per Month</b>',
+                labels={cohort_metric: cohort_metrics[cohort_metric], 'AgeBand': 'Age Band'},
+                text_auto='.2f',
+                color_discrete_sequence=px.colors.qualitative.Pastel
+            )
+            fig_cohort_bar.update_layout(height=450, showlegend=False)
+            show_chart(fig_cohort_bar)
+
+        st.markdown("**Cohort Summary for the Selected Period**")
+        st.dataframe(
+            band_totals[['AgeBand', 'Fields', 'MT', 'MT_per_Acre', 'KG_per_Palm', 'KG_per_Bunch']].rename(columns={
+                'AgeBand': 'Age Band',
+                'MT': 'Total Yield (MT)',
+                'MT_per_Acre': 'MT/Acre/Month',
+                'KG_per_Palm': 'kg/Palm/Month',
+                'KG_per_Bunch': 'kg/Bunch',
+            }),
+            column_config={
+                'Total Yield (MT)': st.column_config.NumberColumn(format="%.1f"),
+                'MT/Acre/Month': st.column_config.NumberColumn(format="%.3f"),
+                'kg/Palm/Month': st.column_config.NumberColumn(format="%.1f"),
+                'kg/Bunch': st.column_config.NumberColumn(format="%.1f"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption("Covers all fields so cohorts stay comparable; the field and fertilizer filters do not apply. Field area is the largest area fertilized in a single month unless the workbook has an Acres column.")
+
+with tab11, timed_section("Estate Roll-up"):
+    from hierarchy import LEVELS, child_totals, hierarchy_stamp
+
+    st.header("🏞️ Estate → Division → Field Roll-up")
+    st.markdown("Estate totals first; click a bar to drill down to its divisions, then to its fields.")
+
+    # Each level is a lookup in the precomputed roll-ups, keyed by the path from the top
+    rollups = load_rollups(version, hierarchy_stamp())
+    drill_path = tuple(st.session_state.get('drill_path', ()))
+    if drill_path not in rollups:
+        drill_path = ()
+    rollup_level = LEVELS[len(drill_path)]
+
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        st.markdown("**" + " › ".join(("All estates",) + drill_path) + "**")
+    with col2:
+        if drill_path and st.button("⬆️ Up a level", use_container_width=True):
+            st.session_state['drill_path'] = drill_path[:-1]
+            st.rerun()
+
+    rollup_node = rollups[drill_path]
+    rollup_dates = rollup_node.index.get_level_values('Date')
+    period_node = rollup_node[rollup_dates.year.isin(selected_years) & rollup_dates.month_name().isin(selected_months)]
+
+    if period_node.empty:
+        show_no_data_message()
+    else:
+        rollup_metrics = {
+            'MT': 'Yield (MT)',
+            'Bunches': 'Bunches Count',
+            'KG_per_Bunch': 'Bunch Weight (kg)',
+            'KG_per_Palm': 'Yield per Palm (kg)',
+            'Usage of fertilizer': 'Fertilizer (bags)',
+        }
+        rollup_metric = st.radio("Metric", list(rollup_metrics), format_func=rollup_metrics.get, horizontal=True, key='rollup_metric')
+        rollup_totals = child_totals(period_node).reset_index()
+
+        col1, col2 = st.columns([2, 3])
+        with col1:
+            fig_rollup = px.bar(
+                rollup_totals,
+                x=rollup_level,
+                y=rollup_metric,
+                title=f'<b>{rollup_metrics[rollup_metric]} by {rollup_level}</b>',
+                labels={rollup_metric: rollup_metrics[rollup_metric]},
+                color=rollup_metric,
+                color_continuous_scale='Greens',
+                text_auto=',.0f'
+            )
+            fig_rollup.update_layout(height=450, coloraxis_showscale=False, xaxis_type='category')
+            if len(drill_path) + 1 < len(LEVELS):
+                # A fresh key per level, so a selection never carries over to the next one
+                rollup_event = show_chart(fig_rollup, key=f"rollup_{'/'.join(drill_path)}", on_select="rerun", selection_mode="points")
+                if rollup_event and rollup_event.selection.points:
+                    st.session_state['drill_path'] = drill_path + (str(rollup_event.selection.points[0]['x']),)
+                    st.rerun()
+            else:
+                show_chart(fig_rollup)
+
+        with col2:
+            trend_metric = rollup_metric if rollup_metric in period_node else 'MT'
+            fig_rollup_trend = px.line(
+                period_node.reset_index(),
+                x='Date',
+                y=trend_metric,
+                color=rollup_level,
+                title=f'<b>Monthly {rollup_metrics[trend_metric]} by {rollup_level}</b>',
+                labels={trend_metric: rollup_metrics[trend_metric]},
+                markers=True
+            )
+            fig_rollup_trend.update_layout(height=450, hovermode="x unified", plot_bgcolor='rgba(0,0,0,0)')
+            show_chart(fig_rollup_trend)
+
+        st.dataframe(
+            rollup_totals.rename(columns={
+                'MT': 'Total Yield (MT)',
+                'Usage of fertilizer': 'Fertilizer (bags)',
+                'KG_per_Bunch': 'kg/Bunch',
+                'KG_per_Palm': 'kg/Palm',
+            }),
+            column_config={
+                'Total Yield (MT)': st.column_config.NumberColumn(format="%.1f"),
+                'Fertilizer (bags)': st.column_config.NumberColumn(format="%.0f"),
+                'kg/Bunch': st.column_config.NumberColumn(format="%.1f"),
+                'kg/Palm': st.column_config.NumberColumn(format="%.1f"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption("Levels come from hierarchy.csv (Field, Division, Estate); fields not listed there appear under 'Unassigned'. Covers all fields, so the field and fertilizer filters do not apply.")
+
+with tab12, timed_section("Labor Productivity"):
+    from labor import OPERATIONS, PRODUCTIVITY_METRICS, productivity
+
+    st.header("👷 Labor Productivity")
+    st.markdown("Yield and coverage per unit of labor across fertilizing, weed control and pest & disease work, with fields and crews ranked.")
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        labor_metric = st.radio("Metric", list(PRODUCTIVITY_METRICS), format_func=PRODUCTIVITY_METRICS.get, horizontal=True, key='labor_metric')
+    with col2:
+        labor_ops = st.multiselect("Operations", list(OPERATIONS), default=list(OPERATIONS), key='labor_ops')
+
+    # Period and field selection are lookups on the precomputed cube
+    labor_cube, labor_output = load_labor(version)
+    cube_dates = labor_cube.index.get_level_values('Date')
+    period_cube = labor_cube[
+        labor_cube.index.get_level_values('Field').isin(selected_fields) &
+        labor_cube.index.get_level_values('Operation').isin(labor_ops) &
+        cube_dates.year.isin(selected_years) &
+        cube_dates.month_name().isin(selected_months)
+    ]
+    output_dates = labor_output.index.get_level_values('Date')
+    period_output = labor_output[
+        labor_output.index.get_level_values('Field').isin(selected_fields) &
+        output_dates.year.isin(selected_years) &
+        output_dates.month_name().isin(selected_months)
+    ]
+
+    if period_cube.empty:
+        show_no_data_message()
+    else:
+        metric_label = PRODUCTIVITY_METRICS[labor_metric]
+        field_productivity = productivity(period_cube, period_output, ['Field']).reset_index()
+
+        col1, col2 = st.columns([2, 3])
+        with col1:
+            fig_labor_rank = px.bar(
+                field_productivity.sort_values(labor_metric),
+                x=labor_metric,
+                y='Field',
+                orientation='h',
+                title=f'<b>{metric_label} by Field</b>',
+                labels={labor_metric: metric_label},
+                color=labor_metric,
+                color_continuous_scale='Greens',
+                text_auto=',.2f'
+            )
+            fig_labor_rank.update_layout(height=450, coloraxis_showscale=False, yaxis_type='category')
+            show_chart(fig_labor_rank)
+
+        with col2:
+            monthly_productivity = productivity(period_cube, period_output, ['Field', 'Date']).reset_index()
+            fig_labor_trend = px.line(
+                monthly_productivity,
+                x='Date',
+                y=labor_metric,
+                color='Field',
+                title=f'<b>Monthly {metric_label}</b>',
+                labels={labor_metric: metric_label},
+                markers=True
+            )
+            fig_labor_trend.update_layout(height=450, hovermode="x unified", plot_bgcolor='rgba(0,0,0,0)')
+            show_chart(fig_labor_trend)
+
+        # Crews are the field teams of each operation
+        st.markdown("**Crew Ranking**")
+        crews = productivity(period_cube, period_output, ['Operation', 'Field']).reset_index()
+        crews = crews.sort_values(labor_metric, ascending=False, na_position='last')
+        crews.insert(0, 'Rank', np.arange(1, len(crews) + 1))
+        st.dataframe(
+            crews[['Rank', 'Operation', 'Field', 'Mandays', 'Workers', 'MT_per_Manday', 'Acres_per_Manday', 'Palms_per_Worker']],
+            column_config={
+                'Mandays': st.column_config.NumberColumn(format="%.1f"),
+                'Workers': st.column_config.NumberColumn("Worker-months", format="%.0f"),
+                'MT_per_Manday': st.column_config.NumberColumn("MT/Manday", format="%.2f"),
+                'Acres_per_Manday': st.column_config.NumberColumn("Acres/Manday", format="%.2f"),
+                'Palms_per_Worker': st.column_config.NumberColumn("Palms/Worker", format="%.0f"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(
+            "Yield per manday divides the field's whole yield by the selected operations' mandays (harvest labor isn't recorded). "
+            "Weed control and pest & disease rounds count as covering the whole field, sized by its largest fertilized area. "
+            "The fertilizer type filter does not apply to this view."
+        )
+
+with tab13, timed_section("Field Map"):
+    from geo import FIELDS_GEOJSON, DETAIL_LEVELS, MAP_POINT_BUDGET, geometry_stamp
+
+    st.header("🗺️ Field Map")
+
+    geo_key = geometry_stamp()
+    if geo_key is None:
+        st.info(f"No field boundaries yet. Save the field polygons as a GeoJSON FeatureCollection named `{FIELDS_GEOJSON}` "
+                "next to Home.py, with a `Field` property on each feature matching the workbook's field codes.")
+        st.code(
+            '{"type": "FeatureCollection", "features": [\n'
+            '  {"type": "Feature", "properties": {"Field": "01A"},\n'
+            '   "geometry": {"type": "Polygon", "coordinates": [[[101.201, 2.305], [101.206, 2.305], [101.206, 2.309], [101.201, 2.305]]]}}\n'
+            ']}',
+            language='json'
+        )
+    else:
+        map_tiles = load_map_tiles(geo_key)
+        map_metrics = {
+            'MT': 'Yield (MT)',
+            'KG_per_Bunch': 'Bunch Weight (kg)',
+            'Anomaly': 'Anomaly Score',
+        }
+        # Open at the finest detail that keeps the drawn points within budget
+        fitting = [level for level in DETAIL_LEVELS if map_tiles['level_points'][level] <= MAP_POINT_BUDGET]
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            map_metric = st.radio("Color fields by", list(map_metrics), format_func=map_metrics.get, horizontal=True, key='map_metric')
+        with col2:
+            map_detail = st.select_slider("Map detail", list(DETAIL_LEVELS), value=fitting[-1] if fitting else 'Estate', key='map_detail')
+
+        # Per-field values for the selection
+        field_totals = filtered_df.groupby('Field')[['MT', 'Bunches']].sum()
+        field_totals['KG_per_Bunch'] = field_totals['MT'] * 1000 / field_totals['Bunches'].where(field_totals['Bunches'] > 0)
+        if map_metric == 'Anomaly':
+            from anomalies import DEFAULT_WINDOW, update_scores, field_scores
+            # Largest score over the selected months, with the window chosen on the Anomaly Alerts tab
+            map_window = st.session_state.get('alert_window', DEFAULT_WINDOW)
+            state, lock = anomaly_state(version, map_window)
+            with lock:
+                update_scores(state, field_matrices, map_window)
+                month_mask = np.isin(field_matrices['months'].year, selected_years) & np.isin(field_matrices['months'].month_name(), selected_months)
+                scores = field_scores(state, month_mask)
+            field_values = pd.Series(scores if scores is not None else np.nan, index=field_matrices['fields'])
+        else:
+            field_values = field_totals[map_metric]
+        field_values = field_values[field_values.index.isin(selected_fields)].dropna()
+
+        with_boundary = set(map_tiles['fields'])
+        mapped = [f for f in field_values.index if f in with_boundary]
+        unmapped = [f for f in selected_fields if f not in with_boundary]
+        if not mapped:
+            show_no_data_message()
+        else:
+            # Only the selected fields' outlines are sent to the browser
+            features = map_features(geo_key, map_detail)
+            geojson = {'type': 'FeatureCollection', 'features': [features[f] for f in mapped]}
+            fig_map = go.Figure(go.Choropleth(
+                geojson=geojson,
+                featureidkey='properties.Field',
+                locations=mapped,
+                z=field_values[mapped].to_numpy(),
+                colorscale='Reds' if map_metric == 'Anomaly' else 'Greens',
+                marker_line_width=0.5,
+                marker_line_color='white',
+                colorbar_title=map_metrics[map_metric],
+                hovertemplate='<b>%{location}</b><br>' + map_metrics[map_metric] + ': %{z:,.2f}<extra></extra>'
+            ))
+            fig_map.update_geos(fitbounds='locations', visible=False)
+            fig_map.update_layout(
+                title=f'<b>{map_metrics[map_metric]} by Field</b>',
+                height=600,
+                margin=dict(l=0, r=0, t=50, b=0)
+            )
+            show_chart(fig_map)
+            st.caption(f"{map_tiles['level_points'][map_detail]:,} of {map_tiles['points']:,} boundary points at {map_detail} detail "
+                       f"(snapped to a {DETAIL_LEVELS[map_detail]}° grid).")
+        if unmapped:
+            st.caption(f"No boundary in {FIELDS_GEOJSON} for: {', '.join(unmapped)}")
+
 # Add some explanatory text
 st.sidebar.markdown("""
 ### Dashboard Guide
@@ -1320,4 +2623,53 @@ st.sidebar.markdown("""
 - Explore different tabs for various analyses
 - Hover over charts for detailed information
 - Download filtered data from the Raw Data tab
-""")
\ No newline at end of file
+""")
+
+# Report where the time went, keeping the first run of this process as the cold start
+run_timings = {
+    'Imports': imports_done - script_started,
+    'Data': data_ready - imports_done,
+    'Render': time.perf_counter() - data_ready,
+}
+cold_timings = startup_timings()
+if not cold_timings:
+    cold_timings.update(run_timings)
+with st.sidebar.expander("⏱️ Startup & render time"):
+    st.dataframe(
+        pd.DataFrame({'Cold start (s)': cold_timings, 'This run (s)': run_timings}).round(3),
+        use_container_width=True
+    )
+    st.caption("Run `python warmup.py` before starting the server to build the data store ahead of the first user.")
+
+    # Disk result cache activity in this process and what it holds
+    cached_results, cached_bytes = cache_usage()
+    if result_cache_stats:
+        st.dataframe(
+            pd.DataFrame(result_cache_stats).T.rename_axis('Result').reset_index().assign(
+                Result=lambda d: d['Result'].str.rsplit('.', n=1).str[-1]
+            ),
+            hide_index=True,
+            use_container_width=True
+        )
+    st.caption(f"Disk result cache: {cached_results} results, {cached_bytes / 2**20:,.1f} MB.")
+
+if chart_payloads:
+    with st.sidebar.expander("📦 Chart payload size"):
+        payloads = pd.DataFrame(chart_payloads)
+        payloads['Saved'] = 1 - payloads['After (KB)'] / payloads['Before (KB)']
+        st.dataframe(
+            payloads,
+            column_config={
+                'Before (KB)': st.column_config.NumberColumn(format="%.1f"),
+                'After (KB)': st.column_config.NumberColumn(format="%.1f"),
+                'Saved': st.column_config.NumberColumn(format="percent"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        before, after = payloads['Before (KB)'].sum(), payloads['After (KB)'].sum()
+        st.caption(f"{before:,.0f} KB → {after:,.0f} KB for {len(payloads)} charts ({1 - after / before:.0%} smaller)")
+
+# Fill in exact values for everything fast mode drew from the sample
+for refine in pending_refinements:
+    refine()
@@ -0,0 +1,137 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Which side of the baseline is alarming for each monitored metric
+ANOMALY_RULES = {
+    'MT': 'low',
+    'Bunches': 'low',
+    'KG_per_Bunch': 'both',
+    'Usage of fertilizer': 'high',
+    'Mandays for fertilizer': 'high',
+    'Mandays for weed control': 'high',
+    'Mandays for pest and disease': 'high',
+}
+
+# Smallest deviation scale per metric, so flat histories (e.g. months of zero
+# mandays) don't turn every small change into an infinite score
+MIN_SCALE = {
+    'MT': 1.0,
+    'Bunches': 50.0,
+    'KG_per_Bunch': 0.5,
+    'Usage of fertilizer': 100.0,
+    'Mandays for fertilizer': 1.0,
+    'Mandays for weed control': 1.0,
+    'Mandays for pest and disease': 0.5,
+}
+
+# Months of history needed before a month is scored
+MIN_PERIODS = 3
+
+# Look-back window the Anomaly Alerts tab opens with, in months
+DEFAULT_WINDOW = 6
+
+
+def rolling_robust_scores(values, window, min_scale):
+    # Robust z-score of every field-month against the median and MAD of the
+    # preceding `window` months, computed for all fields at once
+    n_fields, n_months = values.shape
+    padded = np.concatenate([np.full((n_fields, window), np.nan), values], axis=1)
+    history = sliding_window_view(padded[:, :-1], window, axis=1)  # (fields, months, window)
+
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(history, axis=2)
+        mad = np.nanmedian(np.abs(history - median[..., None]), axis=2)
+        scale = np.maximum(1.4826 * mad, min_scale)
+        scores = (values - median) / scale
+
+    enough = (~np.isnan(history)).sum(axis=2) >= MIN_PERIODS
+    return np.where(enough, scores, np.nan), np.where(enough, median, np.nan)
+
+
+def update_scores(state, matrices, window):
+    # Scores for every monitored metric, reusing `state` from earlier calls.
+    # When the new matrices only add months after the ones already scored,
+    # only the new months (plus their look-back window) are computed.
+    fields = matrices['fields']
+    months = matrices['months']
+    for metric in ANOMALY_RULES:
+        if metric not in matrices:
+            continue
+        values = matrices[metric]
+        previous = state.get(metric)
+        done = 0
+        if (
+            previous is not None
+            and previous['window'] == window
+            and previous['fields'] == fields
+            and len(previous['months']) <= len(months)
+            and previous['months'].equals(months[:len(previous['months'])])
+            and np.array_equal(previous['values'], values[:, :len(previous['months'])], equal_nan=True)
+        ):
+            done = len(previous['months'])
+
+        if previous is not None and done == len(months):
+            continue
+
+        start = max(done - window, 0)
+        scores, median = rolling_robust_scores(values[:, start:], window, MIN_SCALE[metric])
+        if done:
+            scores = np.concatenate([previous['scores'], scores[:, done - start:]], axis=1)
+            median = np.concatenate([previous['median'], median[:, done - start:]], axis=1)
+
+        state[metric] = {
+            'window': window,
+            'fields': fields,
+            'months': months,
+            'values': values,
+            'scores': scores,
+            'median': median,
+        }
+    return state
+
+
+def flag_anomalies(matrices, state, threshold):
+    # Field-months whose score crosses the threshold on the alarming side,
+    # gathered from all metrics without looping over fields
+    frames = []
+    for metric, side in ANOMALY_RULES.items():
+        if metric not in state:
+            continue
+        scores = state[metric]['scores']
+        with np.errstate(invalid='ignore'):
+            if side == 'low':
+                flagged = scores <= -threshold
+            elif side == 'high':
+                flagged = scores >= threshold
+            else:
+                flagged = np.abs(scores) >= threshold
+        rows, cols = np.nonzero(flagged)
+        frames.append(pd.DataFrame({
+            'Field': np.asarray(matrices['fields'], dtype=object)[rows],
+            'Date': matrices['months'][cols],
+            'Metric': metric,
+            'Value': matrices[metric][rows, cols],
+            'Baseline': state[metric]['median'][rows, cols],
+            'Score': scores[rows, cols],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=['Field', 'Date', 'Metric', 'Value', 'Baseline', 'Score', 'Direction'])
+
+    flags = pd.concat(frames, ignore_index=True)
+    flags['Direction'] = np.where(flags['Score'] < 0, 'Drop', 'Spike')
+    return flags.sort_values('Score', key=np.abs, ascending=False, ignore_index=True)
+
+
+def field_scores(state, month_mask):
+    # Each field's largest score (in either direction) over the masked months
+    # and every scored metric, e.g. to color fields on the map
+    stacked = [np.abs(entry['scores'][:, month_mask]) for entry in state.values()]
+    if not stacked or not month_mask.any():
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmax(np.concatenate(stacked, axis=1), axis=1)
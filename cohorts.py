@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# Palm age bands (years since planting) used for cohort comparisons
+AGE_BINS = [-np.inf, 3, 7, 12, 18, 25, np.inf]
+AGE_BANDS = ['Immature (0-3)', 'Young (4-7)', 'Prime (8-12)', 'Peak (13-18)', 'Mature (19-25)', 'Old (26+)']
+
+
+def planting_year(year_planted):
+    # YearPlanted comes in as text such as "2010-04-01 00:00:00" or "Mar,June-12";
+    # take the four-digit year, else the two-digit year after the last dash
+    text = year_planted.astype(str)
+    full = pd.to_numeric(text.str.extract(r'((?:19|20)\d{2})', expand=False), errors='coerce')
+    short = pd.to_numeric(text.str.extract(r'-(\d{2})\s*$', expand=False), errors='coerce')
+    return full.fillna(2000 + short)
+
+
+def field_acres(df):
+    # Planted area per field: an explicit Acres column when the workbook has
+    # one, otherwise the largest area fertilized in a single month
+    if 'Acres' in df:
+        return df.groupby('Field')['Acres'].max()
+    return df.groupby('Field')['Fertilized Acres'].max()
+
+
+def build_cohort_cube(df):
+    # Totals per (age band, month), so comparing cohorts for any period is a
+    # lookup on this small frame instead of a groupby over every row
+    age = df['Date'].dt.year - planting_year(df['YearPlanted'])
+    band = pd.cut(age, AGE_BINS, labels=AGE_BANDS)
+    acres = df['Field'].map(field_acres(df))
+
+    cube = pd.DataFrame({
+        'AgeBand': band,
+        'Date': df['Date'],
+        'MT': df['MT'],
+        'Bunches': df['Bunches'],
+        'Palms': df['TotalStandingPalm'],
+        'Acres': acres,
+        'Field': df['Field'],
+    }).groupby(['AgeBand', 'Date'], observed=True).agg(
+        MT=('MT', 'sum'),
+        Bunches=('Bunches', 'sum'),
+        Palms=('Palms', 'sum'),
+        Acres=('Acres', 'sum'),
+        Fields=('Field', 'nunique'),
+    )
+    return cube
+
+
+def cohort_ratios(cube):
+    # Yield intensities derived from the summed totals
+    out = cube.copy()
+    out['MT_per_Acre'] = out['MT'] / out['Acres'].where(out['Acres'] > 0)
+    out['KG_per_Palm'] = out['MT'] * 1000 / out['Palms'].where(out['Palms'] > 0)
+    out['KG_per_Bunch'] = out['MT'] * 1000 / out['Bunches'].where(out['Bunches'] > 0)
+    return out
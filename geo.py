@@ -0,0 +1,144 @@
+import json
+import os
+
+import numpy as np
+
+FIELDS_GEOJSON = "fields.geojson"
+
+# Feature properties that may hold the field code, in order of preference
+FIELD_PROPERTIES = ['Field', 'field', 'FIELD', 'name', 'Name']
+
+# Grid (in degrees) that boundary points are snapped to at each map detail
+# level; 0.0001 degrees is about 11 m on the ground
+DETAIL_LEVELS = {
+    'Estate': 0.002,
+    'Division': 0.0005,
+    'Field': 0.0001,
+}
+
+# Most boundary points drawn by default; the map opens at the finest level
+# that fits, e.g. Estate detail for a 5,000-field map
+MAP_POINT_BUDGET = 100_000
+
+
+def geometry_stamp(path=FIELDS_GEOJSON):
+    # Changes whenever the boundary file does, for use as a cache key
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_boundaries(path=FIELDS_GEOJSON):
+    # Polygons of every field in the GeoJSON as flat arrays: all ring points
+    # (points, 2) in lon/lat, ring start offsets, the polygon of each ring and
+    # the field of each polygon. A polygon's first ring is its outline, the
+    # rest are holes. Features without a field code or polygon are skipped.
+    with open(path) as f:
+        collection = json.load(f)
+
+    fields, polygon_field, ring_polygon, rings = [], [], [], []
+    field_index = {}
+    for feature in collection.get('features', []):
+        properties = feature.get('properties') or {}
+        field = next((str(properties[k]).strip() for k in FIELD_PROPERTIES if properties.get(k) is not None), None)
+        geometry = feature.get('geometry') or {}
+        if field is None or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+            continue
+        if field not in field_index:
+            field_index[field] = len(fields)
+            fields.append(field)
+        polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        for polygon in polygons:
+            for ring in polygon:
+                rings.append(np.asarray(ring, dtype=float)[:, :2])
+                ring_polygon.append(len(polygon_field))
+            polygon_field.append(field_index[field])
+
+    sizes = [len(r) for r in rings]
+    return {
+        'fields': fields,
+        'points': np.concatenate(rings) if rings else np.empty((0, 2)),
+        'ring_offsets': np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        'ring_polygon': np.asarray(ring_polygon, dtype=np.int32),
+        'polygon_field': np.asarray(polygon_field, dtype=np.int32),
+    }
+
+
+def simplify(boundaries, grid):
+    # Snap every point to the grid and drop points that land in the same cell
+    # as the one before, for all rings at once. Holes that collapse are
+    # dropped; an outline that collapses becomes a one-cell square, so small
+    # fields stay visible when zoomed out. Points come back as int32 grid
+    # cell numbers, multiplied by `grid` for drawing.
+    points, offsets = boundaries['points'], boundaries['ring_offsets']
+    cells = np.round(points / grid).astype(np.int64)
+    n_rings = len(offsets) - 1
+    keep = np.ones(len(cells), dtype=bool)
+    if len(cells):
+        keep[1:] = (cells[1:] != cells[:-1]).any(axis=1)
+        keep[offsets[:-1]] = True
+    ring_of_point = np.repeat(np.arange(n_rings), np.diff(offsets))
+    kept = np.bincount(ring_of_point[keep], minlength=n_rings)
+
+    ring_polygon = boundaries['ring_polygon']
+    outline = np.ones(n_rings, dtype=bool)
+    outline[1:] = ring_polygon[1:] != ring_polygon[:-1]
+    # A closed ring needs 4 points (3 corners and the closing one)
+    collapsed = kept < 4
+
+    out_cells, out_sizes, out_polygon = [], [], []
+    for ring in range(n_rings):
+        if collapsed[ring]:
+            if not outline[ring]:
+                continue
+            x, y = cells[offsets[ring]]
+            ring_cells = np.array([[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1], [x, y]])
+        else:
+            start, stop = offsets[ring], offsets[ring + 1]
+            ring_cells = cells[start:stop][keep[start:stop]]
+        out_cells.append(ring_cells)
+        out_sizes.append(len(ring_cells))
+        out_polygon.append(ring_polygon[ring])
+
+    return {
+        'fields': boundaries['fields'],
+        'grid': grid,
+        'cells': np.concatenate(out_cells).astype(np.int32) if out_cells else np.empty((0, 2), dtype=np.int32),
+        'ring_offsets': np.concatenate([[0], np.cumsum(out_sizes)]).astype(np.int64),
+        'ring_polygon': np.asarray(out_polygon, dtype=np.int32),
+        'polygon_field': boundaries['polygon_field'],
+    }
+
+
+def build_tiles(boundaries, levels=DETAIL_LEVELS):
+    # Simplified geometry for every detail level, computed once per file
+    tiles = {level: simplify(boundaries, grid) for level, grid in levels.items()}
+    return {
+        'fields': boundaries['fields'],
+        'points': len(boundaries['points']),
+        'levels': tiles,
+        'level_points': {level: len(tile['cells']) for level, tile in tiles.items()},
+    }
+
+
+def tile_geojson(tile):
+    # FeatureCollection with one MultiPolygon per field, coordinates rounded
+    # to the grid so the JSON carries no more digits than the detail level has
+    decimals = max(0, int(np.ceil(-np.log10(tile['grid']))))
+    coordinates = np.round(tile['cells'] * tile['grid'], decimals)
+    offsets, ring_polygon = tile['ring_offsets'], tile['ring_polygon']
+    polygons = {}
+    for ring in range(len(ring_polygon)):
+        polygons.setdefault(int(ring_polygon[ring]), []).append(coordinates[offsets[ring]:offsets[ring + 1]].tolist())
+
+    by_field = {}
+    for polygon, rings in polygons.items():
+        by_field.setdefault(tile['fields'][tile['polygon_field'][polygon]], []).append(rings)
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'properties': {'Field': field}, 'geometry': {'type': 'MultiPolygon', 'coordinates': rings}}
+            for field, rings in by_field.items()
+        ],
+    }
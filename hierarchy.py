@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+
+HIERARCHY_FILE = "hierarchy.csv"
+
+# Levels from the top down; Field is the level the workbook records
+LEVELS = ['Estate', 'Division', 'Field']
+
+# Totals kept for every node of the hierarchy
+ROLLUP_COLUMNS = ['MT', 'Bunches', 'Usage of fertilizer', 'TotalStandingPalm']
+
+UNASSIGNED = 'Unassigned'
+
+
+def hierarchy_stamp(path=HIERARCHY_FILE):
+    # Changes whenever the mapping file does, for use as a cache key
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_hierarchy(fields, path=HIERARCHY_FILE):
+    # Field -> Division -> Estate mapping for the given fields. Fields missing
+    # from the file (or the whole file) land under 'Unassigned'.
+    if os.path.exists(path):
+        mapping = pd.read_csv(path, dtype=str).apply(lambda c: c.str.strip())
+        mapping = mapping.drop_duplicates('Field').set_index('Field')[LEVELS[:-1]]
+    else:
+        mapping = pd.DataFrame(columns=LEVELS[:-1], dtype=str)
+    mapping = mapping.reindex(pd.Index(fields, name='Field')).fillna(UNASSIGNED)
+    return mapping.reset_index()[LEVELS]
+
+
+def build_rollups(df, mapping):
+    # Monthly totals of every node's children, keyed by the node's path from
+    # the top, e.g. () -> estates, ('Estate A',) -> its divisions,
+    # ('Estate A', 'Division 1') -> its fields. Each frame is indexed by
+    # (child, Date), so drilling down is a dict lookup on a small frame.
+    tagged = df[['Field', 'Date'] + ROLLUP_COLUMNS].merge(mapping, on='Field', how='left')
+    tagged[LEVELS] = tagged[LEVELS].fillna(UNASSIGNED)
+
+    rollups = {}
+    for depth, level in enumerate(LEVELS):
+        parents = LEVELS[:depth]
+        monthly = tagged.groupby(parents + [level, 'Date'])[ROLLUP_COLUMNS].sum()
+        if not parents:
+            rollups[()] = monthly
+            continue
+        for path, frame in monthly.groupby(level=parents):
+            path = path if isinstance(path, tuple) else (path,)
+            rollups[path] = frame.droplevel(parents)
+    return rollups
+
+
+def child_totals(frame):
+    # Period totals per child of a node, with bunch weight and yield per palm
+    totals = frame.groupby(level=0).sum()
+    months = frame.groupby(level=0).size()
+    totals['KG_per_Bunch'] = totals['MT'] * 1000 / totals['Bunches'].where(totals['Bunches'] > 0)
+    # Standing palms is a stock, so average it over the months instead of summing
+    palms = totals['TotalStandingPalm'] / months
+    totals['KG_per_Palm'] = totals['MT'] * 1000 / palms.where(palms > 0)
+    return totals.drop(columns='TotalStandingPalm')
@@ -0,0 +1,320 @@
+import argparse
+import glob
+import io
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+from storage import CACHE_DIR
+
+# Weighbridge CSV logs dropped by each estate, e.g. daily/<estate>/2025-01.csv.
+# Files are append-only: each ingest reads only the bytes added since the last.
+DAILY_DIR = "daily"
+DAILY_STORE = os.path.join(CACHE_DIR, "daily")
+STATE_FILE = "ingest_state.json"
+LOCK_FILE = ".lock"
+
+# Bytes parsed at a time, so a large backlog never has to fit in memory
+CHUNK_BYTES = 8 * 2**20
+
+# Columns a log must have, and the daily amounts that add up to the monthly
+# grain of the workbook. Logs may carry any subset of the amounts.
+REQUIRED_COLUMNS = ['Date', 'Field']
+DAILY_SUMS = [
+    'MT',
+    'Bunches',
+    'Usage of fertilizer',
+    'Fertilized Acres',
+    'Fertilized Lorong',
+    'Fertilized Standing Palms',
+    'Mandays for fertilizer',
+    'Mandays for pest and disease',
+    'Mandays for weed control',
+]
+
+# Workbook columns carried over from the field's latest row when the logs
+# create a field-month the workbook doesn't have
+STATIC_COLUMNS = ['YearPlanted', 'TotalStandingPalm']
+
+_lock = threading.Lock()
+
+
+def read_state(store=DAILY_STORE):
+    path = os.path.join(store, STATE_FILE)
+    if not os.path.exists(path):
+        return {'batch': 0, 'files': {}, 'monthly': None, 'rows': 0, 'rejected': 0, 'errors': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def daily_stamp(store=DAILY_STORE):
+    # Changes with every ingest that added rows, for use in the data version
+    batch = read_state(store)['batch']
+    return f"d{batch}" if batch else None
+
+
+def read_monthly(store=DAILY_STORE):
+    # Monthly totals compacted from every log ingested so far, indexed by
+    # (Field, Date) with Date the first of the month
+    state = read_state(store)
+    if not state['monthly']:
+        return None
+    return pd.read_parquet(os.path.join(store, state['monthly']))
+
+
+def log_files(root=DAILY_DIR):
+    # Paths of the CSV logs relative to root; the first directory is the estate
+    found = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.lower().endswith('.csv'):
+                found.append(os.path.relpath(os.path.join(directory, name), root))
+    return sorted(found)
+
+
+def read_new_blocks(path, offset, chunk_bytes=CHUNK_BYTES):
+    # Header line plus blocks of the complete lines after `offset`, each with
+    # the offset just past it. A line still being written (no newline yet) is
+    # left for the next ingest.
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if not header.endswith(b'\n'):
+            return
+        position = max(offset, len(header))
+        f.seek(position)
+        carry = b''
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            data = carry + block
+            cut = data.rfind(b'\n') + 1
+            if cut:
+                yield header, data[:cut], position + cut
+                position += cut
+            carry = data[cut:]
+
+
+def parse_block(header, block, estate, source):
+    # Daily records of one block, with rows that can't be used counted and
+    # dropped: unreadable dates, blank fields, non-numeric or negative amounts
+    records = pd.read_csv(io.BytesIO(header + block), dtype={'Field': str}, skipinitialspace=True)
+    records.columns = records.columns.str.strip()
+    missing = [c for c in REQUIRED_COLUMNS if c not in records.columns]
+    if missing:
+        raise ValueError(f"Log is missing columns: {', '.join(missing)}")
+
+    amounts = [c for c in DAILY_SUMS if c in records.columns]
+    daily = pd.DataFrame({
+        'Date': pd.to_datetime(records['Date'], errors='coerce').dt.normalize(),
+        'Field': records['Field'].str.strip(),
+    })
+    bad = daily['Date'].isna() | daily['Field'].isna() | (daily['Field'] == '')
+    for column in amounts:
+        daily[column] = pd.to_numeric(records[column], errors='coerce')
+        bad |= (daily[column] < 0) | (daily[column].isna() & records[column].notna())
+    daily = daily[~bad]
+    daily.insert(0, 'Estate', estate)
+    daily.insert(1, 'Source', source)
+    return daily, int(bad.sum())
+
+
+def compact(daily):
+    # Monthly totals of daily records, the grain the dashboard works at.
+    # Amounts a log never recorded stay missing rather than becoming 0.
+    amounts = [c for c in DAILY_SUMS if c in daily.columns]
+    month = daily['Date'].dt.to_period('M').dt.to_timestamp()
+    monthly = daily.groupby(['Field', month])[amounts].sum(min_count=1)
+    monthly['Records'] = daily.groupby(['Field', month]).size()
+    return monthly
+
+
+def _write_atomic(path, write):
+    scratch = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    write(scratch)
+    os.replace(scratch, path)
+
+
+def _ingest(root, store, chunk_bytes):
+    state = read_state(store)
+    batch = state['batch'] + 1
+    files = state['files']
+    # Detail parts left by an interrupted attempt at this batch would be
+    # committed along with this attempt's, so they go first
+    for leftover in glob.glob(os.path.join(store, "Year=*", "Month=*", f"part-{batch:06d}-*.parquet")):
+        os.remove(leftover)
+    errors = {}
+    pieces = []
+    rows = rejected = parts = 0
+    advanced = False
+
+    for relpath in log_files(root):
+        path = os.path.join(root, relpath)
+        seen = files.get(relpath, {'offset': 0, 'rows': 0, 'rejected': 0})
+        size = os.path.getsize(path)
+        if size < seen['offset']:
+            # Logs are append-only; a shorter file was rewritten, and re-reading
+            # it would count its days twice
+            errors[relpath] = f"file shrank from {seen['offset']:,} to {size:,} bytes; left as ingested"
+            continue
+        if size == seen['offset']:
+            continue
+
+        folders = relpath.split(os.sep)
+        estate = folders[0] if len(folders) > 1 else ''
+        try:
+            for header, block, end in read_new_blocks(path, seen['offset'], chunk_bytes):
+                daily, dropped = parse_block(header, block, estate, relpath)
+                # Daily detail goes to Year/Month partitions for drill-down
+                for (year, month), part in daily.groupby([daily['Date'].dt.year, daily['Date'].dt.month]):
+                    directory = os.path.join(store, f"Year={year}", f"Month={month:02d}")
+                    os.makedirs(directory, exist_ok=True)
+                    part.to_parquet(os.path.join(directory, f"part-{batch:06d}-{parts:05d}.parquet"), index=False)
+                    parts += 1
+                if not daily.empty:
+                    pieces.append(compact(daily))
+                seen = {'offset': end, 'rows': seen['rows'] + len(daily), 'rejected': seen['rejected'] + dropped}
+                rows += len(daily)
+                rejected += dropped
+                advanced = True
+        except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+            # Blocks before the bad one stay ingested; the rest waits for a fix
+            errors[relpath] = str(e)
+        files[relpath] = seen
+
+    state['errors'] = errors
+    if not advanced:
+        return state
+
+    # New totals are added onto the compacted months; earlier daily rows are
+    # never read again
+    monthly = read_monthly(store)
+    if pieces:
+        combined = pd.concat(([monthly] if monthly is not None else []) + pieces)
+        monthly = combined.groupby(level=['Field', 'Date']).sum(min_count=1)
+        name = f"monthly-{batch:06d}.parquet"
+        _write_atomic(os.path.join(store, name), monthly.to_parquet)
+        previous, state['monthly'] = state['monthly'], name
+    else:
+        previous = None
+
+    # Writing the state is the commit point: detail parts of an interrupted
+    # batch are never read, and the next attempt removes them
+    state.update({
+        'batch': batch,
+        'files': files,
+        'rows': state['rows'] + rows,
+        'rejected': state['rejected'] + rejected,
+        'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+
+    def write_state(path):
+        with open(path, 'w') as f:
+            json.dump(state, f, indent=1)
+    _write_atomic(os.path.join(store, STATE_FILE), write_state)
+    if previous:
+        try:
+            os.remove(os.path.join(store, previous))
+        except OSError:
+            pass
+    return state
+
+
+def ingest_logs(root=DAILY_DIR, store=DAILY_STORE, chunk_bytes=CHUNK_BYTES):
+    # Read whatever was appended to the logs since the last ingest, keep the
+    # daily rows in the partitioned store and add them to the monthly totals.
+    # Safe to call on every request: without new bytes it only stats the files.
+    if not os.path.isdir(root):
+        return read_state(store)
+    os.makedirs(store, exist_ok=True)
+    with _lock, open(os.path.join(store, LOCK_FILE), 'w') as lock:
+        # Only one process ingests at a time; the others wait and find nothing new
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        return _ingest(root, store, chunk_bytes)
+
+
+def committed_parts(directory, state):
+    # Detail files of batches the state has committed
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.startswith('part-') and n.endswith('.parquet'))
+    return [os.path.join(directory, n) for n in names if int(n.split('-')[1]) <= state['batch']]
+
+
+def read_daily(year, month, fields=None, store=DAILY_STORE):
+    # Daily records of one month, read from that month's partition only
+    state = read_state(store)
+    paths = committed_parts(os.path.join(store, f"Year={year}", f"Month={month:02d}"), state)
+    if not paths:
+        return pd.DataFrame(columns=['Estate', 'Source', 'Date', 'Field'])
+    daily = pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+    if fields is not None:
+        daily = daily[daily['Field'].isin(fields)]
+    return daily.sort_values(['Date', 'Field'], kind='stable').reset_index(drop=True)
+
+
+def merge_daily(df, monthly):
+    # Workbook rows with their amounts replaced by the daily log totals of the
+    # same field-month, plus rows for field-months only the logs have. Runs
+    # before validation, so merged rows face the same checks as the workbook.
+    if monthly is None or monthly.empty:
+        return df
+    amounts = [c for c in DAILY_SUMS if c in monthly.columns]
+    df = df.copy()
+    keys = pd.MultiIndex.from_arrays([df['Field'], pd.to_datetime(df['Date'], errors='coerce').astype('datetime64[ns]')])
+    monthly = monthly.set_axis(pd.MultiIndex.from_arrays([
+        monthly.index.get_level_values('Field'),
+        monthly.index.get_level_values('Date').astype('datetime64[ns]'),
+    ]))
+    aligned = monthly.reindex(keys)
+    for column in amounts:
+        logged = aligned[column].to_numpy()
+        df[column] = df[column].where(pd.isna(logged), logged)
+
+    new = monthly[~monthly.index.isin(keys)]
+    if new.empty:
+        return df
+    # New months of known fields start from the field's latest workbook row
+    # with every activity at nothing; unknown fields have no palm count and
+    # are quarantined by validation
+    template = df.drop_duplicates('Field', keep='last').set_index('Field')
+    added = template.reindex(new.index.get_level_values(0)).reset_index()
+    for column in added.columns:
+        if column in STATIC_COLUMNS or column == 'Field':
+            continue
+        if pd.api.types.is_numeric_dtype(df[column]):
+            added[column] = 0
+        else:
+            added[column] = 'No' if column == 'MechanicalGrassCutting' else 'NOTHING'
+    added['Date'] = new.index.get_level_values(1)
+    for column in amounts:
+        added[column] = new[column].fillna(0).to_numpy()
+    added.index = range(df.index.max() + 1, df.index.max() + 1 + len(added))
+    return pd.concat([df, added[df.columns]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest new lines of the daily harvest logs")
+    parser.add_argument("--root", default=DAILY_DIR, help="directory of estate CSV logs")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    state = ingest_logs(args.root)
+    print(f"Batch {state['batch']}: {state['rows']:,} daily rows from {len(state['files'])} logs, "
+          f"{state['rejected']:,} rejected ({time.perf_counter() - started:.2f}s)")
+    for relpath, error in state['errors'].items():
+        print(f"  {relpath}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Field operations with their (workers, mandays, rounds) columns
+OPERATIONS = {
+    'Fertilizer': ('Number of worker for fertilizer', 'Mandays for fertilizer', 'No.OfRound Fertilizer'),
+    'Weed Control': ('Number of workers for weed control', 'Mandays for weed control', 'No.OfRound WeedControl'),
+    'Pest & Disease': ('Number of workers for pest and disease', 'Mandays for pest and disease', 'No.OfRound P&D'),
+}
+
+PRODUCTIVITY_METRICS = {
+    'MT_per_Manday': 'Yield per Manday (MT)',
+    'Acres_per_Manday': 'Acres Covered per Manday',
+    'Palms_per_Worker': 'Palms Covered per Worker',
+}
+
+
+def build_labor_cube(matrices):
+    # Workers, mandays and area/palms covered for every operation x field x
+    # month, stacked from the field x month matrices in one pass. Fertilizer
+    # coverage is recorded directly; the other operations cover the whole
+    # field once per round. Returns the long cube indexed by (Operation,
+    # Field, Date) and the MT per (Field, Date) it is measured against.
+    fields, months = matrices['fields'], matrices['months']
+    with np.errstate(invalid='ignore'):
+        field_acres = np.nanmax(np.where(np.isnan(matrices['Fertilized Acres']), -np.inf, matrices['Fertilized Acres']), axis=1)
+    field_acres = np.where(np.isfinite(field_acres), field_acres, 0.0)[:, None]
+    palms = matrices['TotalStandingPalm']
+
+    workers = np.stack([matrices[w] for w, _, _ in OPERATIONS.values()])
+    mandays = np.stack([matrices[m] for _, m, _ in OPERATIONS.values()])
+    rounds = np.stack([matrices[r] for _, _, r in OPERATIONS.values()])
+    acres = rounds * field_acres
+    covered_palms = rounds * palms
+    fert = list(OPERATIONS).index('Fertilizer')
+    acres[fert] = matrices['Fertilized Acres']
+    covered_palms[fert] = matrices['Fertilized Standing Palms']
+
+    index = pd.MultiIndex.from_product([list(OPERATIONS), fields, months], names=['Operation', 'Field', 'Date'])
+    cube = pd.DataFrame({
+        'Workers': workers.ravel(),
+        'Mandays': mandays.ravel(),
+        'Acres': acres.ravel(),
+        'Palms': covered_palms.ravel(),
+    }, index=index)
+    # Field-months without a record are dropped rather than counted as idle
+    recorded = ~np.isnan(matrices['MT'])
+    cube = cube[np.tile(recorded.ravel(), len(OPERATIONS))]
+
+    output = pd.Series(matrices['MT'].ravel(), index=pd.MultiIndex.from_product([fields, months], names=['Field', 'Date']), name='MT')
+    return cube, output.dropna()
+
+
+def productivity(cube, output, by):
+    # Ratios of summed totals for each group in `by` (levels of the cube).
+    # Yield is per field-month, so an operation's MT per manday is the
+    # field's whole yield over that operation's mandays.
+    totals = cube.groupby(level=by).sum()
+    output_levels = [level for level in by if level != 'Operation']
+    if output_levels:
+        mt = output.groupby(level=output_levels).sum()
+        totals['MT'] = mt.reindex(totals.index.droplevel('Operation') if 'Operation' in by else totals.index).to_numpy()
+    else:
+        totals['MT'] = output.sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        totals['MT_per_Manday'] = totals['MT'] / totals['Mandays'].where(totals['Mandays'] > 0)
+        totals['Acres_per_Manday'] = totals['Acres'] / totals['Mandays'].where(totals['Mandays'] > 0)
+        totals['Palms_per_Worker'] = totals['Palms'] / totals['Workers'].where(totals['Workers'] > 0)
+    return totals
@@ -0,0 +1,92 @@
+import warnings
+
+import numpy as np
+
+# Treatment inputs whose delayed effect on yield is analysed
+LAG_INPUTS = ['Usage of fertilizer', 'No.OfRound WeedControl', 'No.OfRound P&D']
+
+# Lag range the Lagged Impact tab opens with, in months
+DEFAULT_LAG_RANGE = (3, 12)
+
+# Fewest (input, yield) month pairs for a field's correlation to be reported
+MIN_PAIRS = 6
+
+
+def remove_seasonality(values, months):
+    # Subtract each field's average for the calendar month, leaving the
+    # month-to-month variation the inputs might explain
+    adjusted = np.array(values, dtype=float)
+    month_of_year = np.asarray(months.month)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for m in np.unique(month_of_year):
+            cols = month_of_year == m
+            adjusted[:, cols] -= np.nanmean(values[:, cols], axis=1, keepdims=True)
+    return adjusted
+
+
+def lagged_stack(values, lags):
+    # (lags, fields, months) where slice i holds values shifted `lags[i]` months back,
+    # so index t lines up the response at t + lag with the input at t
+    n_fields, n_months = values.shape
+    stacked = np.full((len(lags), n_fields, n_months), np.nan)
+    for i, lag in enumerate(lags):
+        if lag < n_months:
+            stacked[i, :, :n_months - lag] = values[:, lag:]
+    return stacked
+
+
+def lag_statistics(inputs, response, lags):
+    # Per-field Pearson correlation, OLS slope and pair count between the input
+    # at month t and the response at t + lag, for every lag in one batch.
+    # Returns arrays shaped (lags, fields).
+    x = np.broadcast_to(inputs, (len(lags),) + inputs.shape)
+    y = lagged_stack(response, lags)
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    n = valid.sum(axis=2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        xv = np.where(valid, x, 0.0)
+        yv = np.where(valid, y, 0.0)
+        x_mean = xv.sum(axis=2) / n
+        y_mean = yv.sum(axis=2) / n
+        dx = np.where(valid, x - x_mean[..., None], 0.0)
+        dy = np.where(valid, y - y_mean[..., None], 0.0)
+        sxy = (dx * dy).sum(axis=2)
+        sxx = (dx * dx).sum(axis=2)
+        syy = (dy * dy).sum(axis=2)
+        corr = sxy / np.sqrt(sxx * syy)
+        slope = sxy / sxx
+
+    enough = (n >= MIN_PAIRS) & (sxx > 0) & (syy > 0)
+    return {
+        'corr': np.where(enough, corr, np.nan),
+        'slope': np.where(enough, slope, np.nan),
+        'pairs': n,
+    }
+
+
+def lag_analysis(matrices, lags, deseasonalize=True, response='MT'):
+    # Lag statistics of every input against the response for all fields
+    y = matrices[response]
+    if deseasonalize:
+        y = remove_seasonality(y, matrices['months'])
+    results = {'lags': list(lags), 'fields': matrices['fields']}
+    for name in LAG_INPUTS:
+        if name in matrices:
+            results[name] = lag_statistics(matrices[name], y, list(lags))
+    return results
+
+
+def best_lags(stats, lags):
+    # Lag with the strongest (absolute) correlation for each field
+    corr = stats['corr']
+    filled = np.where(np.isnan(corr), -1.0, np.abs(corr))
+    best = filled.argmax(axis=0)
+    fields = np.arange(corr.shape[1])
+    return {
+        'lag': np.where(np.isnan(corr).all(axis=0), np.nan, np.asarray(lags)[best]),
+        'corr': corr[best, fields],
+        'slope': stats['slope'][best, fields],
+        'pairs': stats['pairs'][best, fields],
+    }
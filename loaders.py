@@ -0,0 +1,89 @@
+import time
+
+from result_cache import disk_cache
+from storage import ensure_store, open_dataset, read_partitions, read_workbook
+
+# Aggregates of a whole data version, kept on disk in .cache/results. The
+# dashboard wraps each in st.cache_data; warmup.py calls them before the
+# server starts, so its first request finds them on disk. Each takes what
+# identifies its input (the data version, a file stamp) as arguments.
+
+
+def load_all_rows(version):
+    manifest = ensure_store(version, read_workbook)
+    return read_partitions(manifest, manifest['years'], manifest['months'], open_dataset(version))
+
+
+# Dense (field x month) matrices of the whole dataset
+@disk_cache
+def load_matrices(version):
+    from matrices import build_field_month_matrices
+    return build_field_month_matrices(load_all_rows(version))
+
+
+# Lagged input/yield statistics for all fields, per lag range
+@disk_cache
+def load_lag_analysis(version, lags, deseasonalize):
+    from lag_analysis import lag_analysis
+    return lag_analysis(load_matrices(version), lags, deseasonalize)
+
+
+# Palm age cohort x month totals
+@disk_cache
+def load_cohorts(version):
+    from cohorts import build_cohort_cube, cohort_ratios
+    return cohort_ratios(build_cohort_cube(load_all_rows(version)))
+
+
+# Estate/division/field monthly roll-ups, per hierarchy.csv
+@disk_cache
+def load_rollups(version, hierarchy_key):
+    from hierarchy import read_hierarchy, build_rollups
+    manifest = ensure_store(version, read_workbook)
+    return build_rollups(load_all_rows(version), read_hierarchy(manifest['fields']))
+
+
+# Per-field fertilizer response for the what-if planner
+@disk_cache
+def load_fertilizer_model(version):
+    from whatif import response_model
+    return response_model(load_matrices(version))
+
+
+# Labor per operation x field x month with the yield it is measured against
+@disk_cache
+def load_labor(version):
+    from labor import build_labor_cube
+    return build_labor_cube(load_matrices(version))
+
+
+# Field boundaries simplified for every map detail level, per GeoJSON file
+@disk_cache
+def load_map_tiles(geo_key):
+    from geo import read_boundaries, build_tiles
+    return build_tiles(read_boundaries())
+
+
+def warm_loaders(version):
+    # Fill the disk cache with everything the dashboard's default page loads,
+    # returning (loader, seconds) for each
+    from geo import geometry_stamp
+    from hierarchy import hierarchy_stamp
+    from lag_analysis import DEFAULT_LAG_RANGE
+
+    calls = [
+        (load_matrices, (version,)),
+        (load_lag_analysis, (version, tuple(range(DEFAULT_LAG_RANGE[0], DEFAULT_LAG_RANGE[1] + 1)), True)),
+        (load_cohorts, (version,)),
+        (load_rollups, (version, hierarchy_stamp())),
+        (load_fertilizer_model, (version,)),
+        (load_labor, (version,)),
+    ]
+    if geometry_stamp() is not None:
+        calls.append((load_map_tiles, (geometry_stamp(),)))
+    timings = []
+    for loader, args in calls:
+        started = time.perf_counter()
+        loader(*args)
+        timings.append((loader.__name__, time.perf_counter() - started))
+    return timings
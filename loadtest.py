@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Home.py")
+PERCENTILES = [50, 90, 95, 99]
+
+# Each AppTest compiles the script on its first run, and CPython's parser is
+# not safe to enter from several threads at once, so first runs take turns
+compile_lock = threading.Lock()
+
+
+def widget(at, kind, label):
+    # First widget of a kind with the given label, e.g. widget(at, 'multiselect', 'Select Years')
+    matches = [w for w in getattr(at, kind) if w.label == label]
+    if not matches:
+        raise LookupError(f"No {kind} labelled {label!r}")
+    return matches[0]
+
+
+# Steps a supervisor typically takes in one visit; each changes one widget and reruns
+def pick_fields(at, rng):
+    w = widget(at, 'multiselect', "Select Fields")
+    w.set_value(rng.sample(list(w.options), rng.randint(1, len(w.options))))
+
+
+def all_fields(at, rng):
+    w = widget(at, 'multiselect', "Select Fields")
+    w.set_value(list(w.options))
+
+
+def pick_year(at, rng):
+    w = widget(at, 'multiselect', "Select Years")
+    w.set_value([rng.choice(list(w.options))])
+
+
+def all_years(at, rng):
+    w = widget(at, 'multiselect', "Select Years")
+    w.set_value(list(w.options))
+
+
+def pick_months(at, rng):
+    w = widget(at, 'multiselect', "Select Months")
+    w.set_value(rng.sample(list(w.options), rng.randint(3, len(w.options))))
+
+
+def pick_fertilizer(at, rng):
+    w = widget(at, 'multiselect', "Type of Fertilizer")
+    w.set_value(rng.sample(list(w.options), rng.randint(1, len(w.options))))
+
+
+def forecast_horizon(at, rng):
+    widget(at, 'select_slider', "Select forecast duration:").set_value(rng.choice([3, 6, 12, 24, 36]))
+
+
+def heatmap_view(at, rng):
+    w = widget(at, 'radio', "Show")
+    w.set_value(rng.choice(list(w.options)))
+
+
+def alert_window(at, rng):
+    widget(at, 'slider', "Look-back window (months)").set_value(rng.randint(3, 12))
+
+
+def lag_input(at, rng):
+    w = widget(at, 'selectbox', "Input")
+    w.set_value(rng.choice(list(w.options)))
+
+
+SCENARIOS = {
+    'field review': [pick_fields, pick_year, pick_months, heatmap_view, alert_window],
+    'fertilizer review': [pick_fertilizer, all_fields, all_years, lag_input],
+    'planning': [all_fields, all_years, forecast_horizon, forecast_horizon, heatmap_view],
+}
+
+
+def rss_mb():
+    # Current resident memory of this process (Linux), else the peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_session(session_id, steps, seed, timeout):
+    # One simulated user: initial page load, then `steps` random scenario steps
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + session_id)
+    scenario = rng.choice(list(SCENARIOS))
+    samples, errors = [], []
+
+    def rerun(label, at):
+        started = time.perf_counter()
+        at.run(timeout=timeout)
+        samples.append((label, time.perf_counter() - started))
+        errors.extend(f"{label}: {e.value}" for e in at.exception)
+
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    with compile_lock:
+        rerun('initial load', at)
+    plan = SCENARIOS[scenario]
+    for i in range(steps):
+        action = plan[i % len(plan)]
+        try:
+            action(at, rng)
+        except LookupError as e:
+            errors.append(f"{action.__name__}: {e}")
+            continue
+        rerun(action.__name__, at)
+    return scenario, samples, errors
+
+
+def summarize(latencies):
+    values = np.asarray(latencies) * 1000
+    row = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    row.update(mean=float(values.mean()), max=float(values.max()), count=len(values))
+    return row
+
+
+def run_load_test(sessions, concurrency, steps, seed=0, timeout=120):
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    rss_before = rss_mb()
+    peak_rss = [rss_before]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.wait(0.2):
+            peak_rss.append(rss_mb())
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: run_session(i, steps, seed, timeout), range(sessions)))
+    wall = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    all_samples = [s for _, samples, _ in results for s in samples]
+    by_step = {}
+    for label, seconds in all_samples:
+        by_step.setdefault(label, []).append(seconds)
+
+    return {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'steps_per_session': steps,
+        'wall_seconds': wall,
+        'reruns': len(all_samples),
+        'reruns_per_second': len(all_samples) / wall,
+        'cpu_seconds': cpu,
+        'cpu_utilisation': cpu / wall,
+        'rss_start_mb': rss_before,
+        'rss_peak_mb': max(peak_rss),
+        'latency_ms': summarize([s for _, s in all_samples]),
+        'latency_ms_by_step': {label: summarize(v) for label, v in sorted(by_step.items())},
+        'errors': [e for _, _, errs in results for e in errs],
+    }
+
+
+def print_report(report):
+    print(f"{report['sessions']} sessions x {report['steps_per_session']} steps, "
+          f"{report['concurrency']} concurrent: {report['reruns']} reruns in {report['wall_seconds']:.1f}s "
+          f"({report['reruns_per_second']:.2f} reruns/s)")
+    print(f"CPU {report['cpu_seconds']:.1f}s ({report['cpu_utilisation']:.0%} of one core), "
+          f"RSS {report['rss_start_mb']:.0f} MB -> peak {report['rss_peak_mb']:.0f} MB")
+    header = f"{'step':<22}" + "".join(f"{c:>9}" for c in ['count', 'mean'] + [f'p{p}' for p in PERCENTILES] + ['max'])
+    print(header)
+    rows = dict(report['latency_ms_by_step'], **{'ALL': report['latency_ms']})
+    for label, row in rows.items():
+        print(f"{label:<22}{row['count']:>9}{row['mean']:>9.0f}"
+              + "".join(f"{row[f'p{p}']:>9.0f}" for p in PERCENTILES) + f"{row['max']:>9.0f}")
+    if report['errors']:
+        print(f"{len(report['errors'])} errors, first: {report['errors'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive Home.py headlessly with simulated sessions and report rerun latency")
+    parser.add_argument("--sessions", type=int, default=8, help="simulated users")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at the same time")
+    parser.add_argument("--steps", type=int, default=5, help="interactions per session after the first load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier --json report to compare p95 latency against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed p95 slowdown against --baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(APP_FILE))
+    report = run_load_test(args.sessions, args.concurrency, args.steps, args.seed, args.timeout)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    failed = bool(report['errors'])
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        before, after = baseline['latency_ms']['p95'], report['latency_ms']['p95']
+        change = after / before - 1
+        print(f"p95 {before:.0f} ms -> {after:.0f} ms ({change:+.0%})")
+        failed |= change > args.max_regression
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Columns held as dense (field x month) matrices, in addition to KG_per_Bunch
+MATRIX_COLUMNS = [
+    'MT', 'Bunches',
+    'Usage of fertilizer', 'Fertilized Acres', 'Fertilized Standing Palms',
+    'Number of worker for fertilizer', 'Mandays for fertilizer', 'No.OfRound Fertilizer',
+    'Number of workers for weed control', 'Mandays for weed control', 'No.OfRound WeedControl',
+    'Number of workers for pest and disease', 'Mandays for pest and disease', 'No.OfRound P&D',
+    'TotalStandingPalm',
+]
+
+HEATMAP_METRICS = ['MT', 'Bunches', 'KG_per_Bunch']
+
+
+def build_field_month_matrices(df, columns=MATRIX_COLUMNS):
+    # One row per field, one column per calendar month between the first and
+    # last month in the data. Cells without a record are NaN; several records
+    # in the same field-month are summed.
+    fields = pd.Index(df['Field'].unique())
+    period = (df['Date'].dt.year * 12 + df['Date'].dt.month - 1).to_numpy()
+    first = int(period.min()) if len(df) else 0
+    n_months = int(period.max()) - first + 1 if len(df) else 0
+    months = pd.date_range(f"{first // 12:04d}-{first % 12 + 1:02d}-01", periods=n_months, freq='MS')
+
+    flat = fields.get_indexer(df['Field']) * n_months + (period - first)
+    size = len(fields) * n_months
+    present = np.bincount(flat, minlength=size) > 0
+
+    matrices = {'fields': fields.tolist(), 'months': months}
+    for column in columns:
+        if column not in df:
+            continue
+        sums = np.bincount(flat, weights=df[column].to_numpy(dtype=float), minlength=size)
+        matrices[column] = np.where(present, sums, np.nan).reshape(len(fields), n_months)
+
+    if 'MT' in matrices and 'Bunches' in matrices:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kg = matrices['MT'] * 1000 / matrices['Bunches']
+        matrices['KG_per_Bunch'] = np.where(matrices['Bunches'] > 0, kg, np.nan)
+    return matrices
+
+
+def zscores(values, axis=1):
+    # axis=1 scores each month against the field's own history,
+    # axis=0 scores each field against all fields in the same month
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # All-NaN rows/columns just produce NaN scores
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=axis, keepdims=True)
+        std = np.nanstd(values, axis=axis, keepdims=True)
+        scores = np.where(std > 0, (values - mean) / std, 0.0)
+    return np.where(np.isnan(values), np.nan, scores)
+
+
+def rank_fields(values):
+    # Rank of each field within its month, 1 = highest; missing cells stay NaN
+    filled = np.where(np.isnan(values), -np.inf, values)
+    order = np.argsort(-filled, axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, len(values) + 1)[:, None], axis=0)
+    return np.where(np.isnan(values), np.nan, ranks)
+
+
+def yoy_delta(values, percent=True):
+    # Change against the same month of the previous year
+    previous = np.full_like(values, np.nan)
+    previous[:, 12:] = values[:, :-12]
+    delta = values - previous
+    if not percent:
+        return delta
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(previous != 0, delta / np.abs(previous) * 100, np.nan)
+
+
+def select(matrices, values, fields=None, years=None, month_names=None):
+    # Restrict a matrix to the chosen fields and months, keeping matrix order
+    row_mask = np.ones(len(matrices['fields']), dtype=bool)
+    if fields is not None:
+        row_mask = np.isin(matrices['fields'], list(fields))
+    col_mask = np.ones(len(matrices['months']), dtype=bool)
+    if years is not None:
+        col_mask &= np.isin(matrices['months'].year, list(years))
+    if month_names is not None:
+        col_mask &= np.isin(matrices['months'].month_name(), list(month_names))
+    row_labels = [f for f, keep in zip(matrices['fields'], row_mask) if keep]
+    return values[row_mask][:, col_mask], row_labels, matrices['months'][col_mask]
+
+
+# Time windows for monthly series: trailing averages, year to date and
+# change against the same month a year earlier
+WINDOWS = {
+    'Monthly': None,
+    '3-month average': 3,
+    '6-month average': 6,
+    '12-month average': 12,
+    'Year to date': 'ytd',
+    'Year over year (%)': 'yoy',
+}
+
+
+def _cumulative(values):
+    # Running sums of the values and of how many were recorded, with a
+    # leading zero column so any window is a difference of two columns
+    zeros = np.zeros((values.shape[0], 1))
+    sums = np.concatenate([zeros, np.cumsum(np.nan_to_num(values), axis=1)], axis=1)
+    counts = np.concatenate([zeros, np.cumsum(~np.isnan(values), axis=1)], axis=1)
+    return sums, counts
+
+
+def window_sums(values, window):
+    # Trailing sums over `window` months from cumulative sums, so the cost
+    # doesn't grow with the window. NaN until the window is fully recorded.
+    n_months = values.shape[1]
+    out = np.full(values.shape, np.nan)
+    if window > n_months:
+        return out
+    sums, counts = _cumulative(values)
+    total = sums[:, window:] - sums[:, :-window]
+    recorded = counts[:, window:] - counts[:, :-window]
+    out[:, window - 1:] = np.where(recorded == window, total, np.nan)
+    return out
+
+
+def year_to_date(values, months):
+    # Running total since January: the cumulative sum minus its value at the
+    # end of the previous year
+    sums, _ = _cumulative(values)
+    year_start = np.searchsorted(np.asarray(months.year), np.asarray(months.year), side='left')
+    ytd = sums[:, 1:] - sums[:, year_start]
+    return np.where(np.isnan(values), np.nan, ytd)
+
+
+def windowed(values, months, window):
+    # A (fields x months) matrix seen through one of WINDOWS
+    if window is None:
+        return values
+    if window == 'ytd':
+        return year_to_date(values, months)
+    if window == 'yoy':
+        return yoy_delta(values)
+    return window_sums(values, window) / window
+
+
+def windowed_ratio(numerator, denominator, months, window, scale=1.0):
+    # Ratio of two metrics through a window: rolling and year-to-date ratios
+    # divide the windowed sums; the year-over-year view compares monthly ratios
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if window is None or window == 'yoy':
+            ratio = numerator * scale / np.where(denominator > 0, denominator, np.nan)
+            return yoy_delta(ratio) if window == 'yoy' else ratio
+        top = year_to_date(numerator, months) if window == 'ytd' else window_sums(numerator, window)
+        bottom = year_to_date(denominator, months) if window == 'ytd' else window_sums(denominator, window)
+        return top * scale / np.where(bottom > 0, bottom, np.nan)
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Upper bound on the simulated (paths x fields x horizon) block held at once
+MAX_SIM_BYTES = 16 * 2**20
+
+QUANTILES = [10, 50, 90]
+
+
+def seasonal_forecast(df, periods):
+    # The Yield Forecast tab's projection of total monthly MT: the last month's
+    # value moved along the linear trend, times the calendar month's seasonal
+    # factor. Returns the gap-filled monthly history and the future months.
+    history = df.groupby(pd.Grouper(key='Date', freq='MS'))['MT'].sum().reset_index()
+    history = history.set_index('Date').asfreq('MS').ffill().reset_index()
+    history['month_num'] = history['Date'].dt.month
+    history['time_index'] = np.arange(len(history))
+
+    # Calendar months missing from the history get a neutral factor
+    monthly_avg = history.groupby('month_num')['MT'].mean()
+    seasonal_component = (monthly_avg / monthly_avg.mean()).reindex(range(1, 13), fill_value=1.0)
+    trend_slope = np.polyfit(history['time_index'], history['MT'], 1)[0]
+
+    future_dates = pd.date_range(start=history['Date'].iloc[-1] + pd.DateOffset(months=1), periods=periods, freq='MS')
+    future = pd.DataFrame({
+        'Date': future_dates,
+        'month_num': future_dates.month,
+        'time_index': np.arange(len(history), len(history) + periods),
+    })
+    base_value = history['MT'].iloc[-1]
+    trend = base_value + (future['time_index'] - len(history)) * trend_slope
+    future['MT'] = trend * seasonal_component.reindex(future['month_num']).to_numpy()
+    return history, future
+
+
+def fit_trend_seasonal(values, months):
+    # Per-field multiplicative fit: seasonal factor per calendar month times a
+    # linear trend on the deseasonalized series. values is (fields, months)
+    # without gaps. Returns the seasonal factors (fields, 12), trend
+    # intercept and slope (fields,) and the in-sample fit (fields, months).
+    n_fields, n_months = values.shape
+    month_idx = np.asarray(months.month) - 1
+
+    # Average of each calendar month over the field's mean; months without
+    # history get a neutral factor
+    counts = np.bincount(month_idx, minlength=12)
+    sums = np.zeros((n_fields, 12))
+    np.add.at(sums.T, month_idx, values.T)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        monthly_avg = sums / counts
+        seasonal = monthly_avg / values.mean(axis=1, keepdims=True)
+    seasonal = np.where(np.isfinite(seasonal) & (seasonal > 0), seasonal, 1.0)
+
+    # Least-squares line through every field's deseasonalized series at once
+    deseasonalized = values / seasonal[:, month_idx]
+    t = np.arange(n_months, dtype=float)
+    t_centered = t - t.mean()
+    slope = (deseasonalized - deseasonalized.mean(axis=1, keepdims=True)) @ t_centered / max((t_centered ** 2).sum(), 1e-12)
+    intercept = deseasonalized.mean(axis=1) - slope * t.mean()
+    fitted = (intercept[:, None] + slope[:, None] * t) * seasonal[:, month_idx]
+    return seasonal, intercept, slope, fitted
+
+
+def simulate(values, months, horizon, paths=2000, seed=0, max_bytes=MAX_SIM_BYTES):
+    # Yield paths from a residual bootstrap of the trend x seasonal fit: each
+    # future month is the fitted value times a ratio (actual / fitted) from a
+    # randomly drawn history month. All fields share the drawn month, so a bad
+    # month (weather, labor) hits them together as it did in the data and the
+    # spread of the total isn't understated. Paths are generated in chunks of at most
+    # max_bytes, keeping only what the quantiles need: the all-field total per
+    # path and month (paths, horizon) and each field's horizon total (paths, fields).
+    values = np.asarray(values, dtype=float)
+    n_fields, n_months = values.shape
+    seasonal, intercept, slope, fitted = fit_trend_seasonal(values, months)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios = values / fitted
+    ratios = np.where(np.isfinite(ratios), ratios, 1.0)
+
+    future_dates = pd.date_range(months[-1] + pd.DateOffset(months=1), periods=horizon, freq='MS')
+    t_future = np.arange(n_months, n_months + horizon, dtype=float)
+    point = (intercept[:, None] + slope[:, None] * t_future) * seasonal[:, future_dates.month - 1]
+    point = np.maximum(point, 0.0)
+
+    # Simulated in float32, (paths, horizon, fields) so each draw gathers a
+    # contiguous row of ratios; the spread is far wider than float32 precision
+    point_t = point.T.astype(np.float32)
+    ratios_t = ratios.T.astype(np.float32)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, min(paths, max_bytes // max(1, n_fields * horizon * 4)))
+    total_paths = np.empty((paths, horizon))
+    field_totals = np.empty((paths, n_fields))
+    for start in range(0, paths, chunk):
+        stop = min(paths, start + chunk)
+        draws = rng.integers(0, n_months, size=(stop - start, horizon))
+        sims = ratios_t[draws] * point_t
+        total_paths[start:stop] = sims.sum(axis=2)
+        field_totals[start:stop] = sims.sum(axis=1)
+
+    return {
+        'dates': future_dates,
+        'point': point,
+        'total_paths': total_paths,
+        'field_totals': field_totals,
+        'chunk': chunk,
+    }
+
+
+def quantile_table(samples, index, quantiles=QUANTILES):
+    # P10/P50/P90 (by default) over the paths axis, one row per index entry
+    table = np.percentile(samples, quantiles, axis=0).T
+    return pd.DataFrame(table, index=index, columns=[f'P{q}' for q in quantiles])
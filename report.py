@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from montecarlo import seasonal_forecast
+from storage import CACHE_DIR
+
+REPORT_DIR = os.path.join(CACHE_DIR, "reports")
+
+# Months projected on the Forecast sheet
+FORECAST_MONTHS = 12
+
+# Finished reports are kept this long for download, then removed
+REPORT_TTL = 3600
+
+# Treatment type columns with their (workers, mandays) columns, as on the
+# Fertilizer, WeedControl and Pest&Disease tabs
+TREATMENTS = {
+    'Fertilizer': ('TypeOfFetilizer', 'Number of worker for fertilizer', 'Mandays for fertilizer'),
+    'Weed Control': ('TypeOfWeedControl', 'Number of workers for weed control', 'Mandays for weed control'),
+    'Pest & Disease': ('Type of pest and disease', 'Number of workers for pest and disease', 'Mandays for pest and disease'),
+}
+
+
+def kpi_sheet(df):
+    monthly = df.groupby(pd.Grouper(key='Date', freq='MS'))['MT'].sum()
+    mt, bunches = df['MT'].sum(), df['Bunches'].sum()
+    return pd.DataFrame([
+        ('Period', f"{df['Date'].min():%b %Y} - {df['Date'].max():%b %Y}"),
+        ('Fields', df['Field'].nunique()),
+        ('Total Yield (MT)', mt),
+        ('Total Bunches', bunches),
+        ('Total Fertilizer (bags)', df['Usage of fertilizer'].sum()),
+        ('KG per Bunch', mt * 1000 / bunches if bunches else None),
+        ('Peak Month', f"{monthly.idxmax():%b %Y}"),
+        ('Peak Month Yield (MT)', monthly.max()),
+        ('Average Monthly Yield (MT)', monthly.mean()),
+    ], columns=['Metric', 'Value'])
+
+
+def monthly_sheet(df):
+    monthly = df.groupby(pd.Grouper(key='Date', freq='MS'))[['MT', 'Bunches']].sum().reset_index()
+    monthly['KG per Bunch'] = monthly['MT'] * 1000 / monthly['Bunches'].where(monthly['Bunches'] > 0)
+    return monthly
+
+
+def treatment_sheet(df):
+    # Production of the field-months under each treatment type
+    frames = []
+    for treatment, (column, _, _) in TREATMENTS.items():
+        stats = df.groupby(column).agg(**{
+            'Field-months': ('MT', 'size'),
+            'MT': ('MT', 'sum'),
+            'Bunches': ('Bunches', 'sum'),
+        }).reset_index().rename(columns={column: 'Type'})
+        stats['MT per Field-month'] = stats['MT'] / stats['Field-months']
+        stats.insert(0, 'Treatment', treatment)
+        frames.append(stats)
+    return pd.concat(frames, ignore_index=True)
+
+
+def labor_sheet(df):
+    # Same statistics as the labor tables of the treatment tabs
+    frames = []
+    for treatment, (column, workers, mandays) in TREATMENTS.items():
+        stats = df.groupby(column).agg({workers: ['sum', 'mean'], mandays: ['sum', 'mean']}).reset_index()
+        stats.columns = ['Type', 'Total Workers', 'Avg Workers', 'Total Mandays', 'Avg Mandays']
+        stats.insert(0, 'Treatment', treatment)
+        frames.append(stats)
+    return pd.concat(frames, ignore_index=True)
+
+
+def forecast_sheet(df, periods=FORECAST_MONTHS):
+    if df['Date'].nunique() < 3:
+        return pd.DataFrame(columns=['Date', 'Forecast MT'])
+    _, future = seasonal_forecast(df, periods)
+    return future[['Date', 'MT']].rename(columns={'MT': 'Forecast MT'})
+
+
+SHEETS = {
+    'KPIs': kpi_sheet,
+    'Monthly Yield': monthly_sheet,
+    'Production by Treatment': treatment_sheet,
+    'Labor': labor_sheet,
+    'Forecast': forecast_sheet,
+}
+
+
+def _cell(value):
+    # Plain Python values for openpyxl; missing numbers become empty cells
+    if isinstance(value, (float, np.floating)) and np.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def write_report(path, df, progress=None):
+    # One workbook with a sheet per SHEETS entry. The write-only workbook
+    # streams rows to disk as they are appended, so memory stays flat however
+    # long the sheets get. Written to a scratch file and renamed into place.
+    workbook = Workbook(write_only=True)
+    for done, (name, build) in enumerate(SHEETS.items()):
+        sheet = workbook.create_sheet(name)
+        frame = build(df)
+        sheet.append(list(frame.columns))
+        for row in frame.itertuples(index=False):
+            sheet.append([_cell(v) for v in row])
+        if progress:
+            progress(done + 1, len(SHEETS))
+    scratch = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    workbook.save(scratch)
+    os.replace(scratch, path)
+    return path
+
+
+def write_estate_pack(path, df, mapping, progress=None):
+    # Zip of one report per estate. Each workbook is written to disk and added
+    # to the archive before the next is built, so only one estate's report is
+    # ever in progress, whether the pack has 2 estates or 100.
+    estate_of = df['Field'].map(mapping.drop_duplicates('Field').set_index('Field')['Estate'])
+    estates = df.groupby(estate_of, sort=True)
+    scratch = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with zipfile.ZipFile(scratch, 'w', compression=zipfile.ZIP_DEFLATED) as pack:
+        for done, (estate, rows) in enumerate(estates):
+            workbook = write_report(f"{scratch}.xlsx", rows)
+            pack.write(workbook, f"{estate}.xlsx")
+            os.remove(workbook)
+            if progress:
+                progress(done + 1, estates.ngroups)
+    os.replace(scratch, path)
+    return path
+
+
+def prune_reports(jobs, root=REPORT_DIR, ttl=REPORT_TTL):
+    # Forget jobs that finished more than `ttl` seconds ago and delete report
+    # files (including scratch files of crashed builds) not written to for
+    # that long; a build in progress keeps writing its scratch file
+    now = time.time()
+    for key, job in list(jobs.items()):
+        if job['status'] != 'running' and now - job['started'] - job.get('seconds', 0) > ttl:
+            del jobs[key]
+    if not os.path.isdir(root):
+        return
+    for entry in os.scandir(root):
+        try:
+            if now - entry.stat().st_mtime > ttl:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def start_report(jobs, key, build, *args):
+    # Run build(*args, progress=...) in a background thread, tracked in `jobs`
+    # under `key`; a job still running, or finished with its file in place,
+    # is reused. Expired jobs and reports are cleared out first.
+    prune_reports(jobs)
+    job = jobs.get(key)
+    if job and (job['status'] == 'running' or (job['status'] == 'done' and os.path.exists(job['path']))):
+        return job
+    job = {'status': 'running', 'done': 0, 'total': 1, 'path': None, 'error': None, 'started': time.time()}
+    jobs[key] = job
+
+    def progress(done, total):
+        job['done'], job['total'] = done, total
+
+    def run():
+        # The status is set last, so a finished job always has its path and time
+        try:
+            job['path'] = build(*args, progress=progress)
+            status = 'done'
+        except Exception as e:
+            job['error'] = str(e)
+            status = 'failed'
+        job['seconds'] = time.time() - job['started']
+        job['status'] = status
+
+    threading.Thread(target=run, daemon=True).start()
+    return job
@@ -0,0 +1,111 @@
+import functools
+import hashlib
+import os
+import pickle
+import threading
+
+from storage import CACHE_DIR
+
+RESULT_DIR = os.path.join(CACHE_DIR, "results")
+
+# Results are evicted least recently used first once the directory grows past this
+MAX_BYTES = 256 * 2**20
+
+_lock = threading.Lock()
+stats = {}
+
+
+def _code_version():
+    # Content hash of the app's modules, so a deploy with changed code never
+    # serves results computed by the old code
+    digest = hashlib.sha1()
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(app_dir)):
+        if name.endswith('.py'):
+            with open(os.path.join(app_dir, name), 'rb') as f:
+                digest.update(name.encode() + f.read())
+    return digest.hexdigest()[:16]
+
+
+CODE_VERSION = _code_version()
+
+
+def _count(name, event):
+    with _lock:
+        counts = stats.setdefault(name, {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0})
+        counts[event] += 1
+
+
+def result_key(name, args, kwargs):
+    # Content address of one call: function, arguments and code version.
+    # Cached functions take whatever identifies their input, such as the data
+    # version, as an argument, so results of other versions stay valid.
+    payload = pickle.dumps((name, args, sorted(kwargs.items()), CODE_VERSION), protocol=4)
+    return hashlib.sha1(payload).hexdigest()
+
+
+def evict(root=RESULT_DIR, max_bytes=MAX_BYTES):
+    # Drop the least recently used results until the directory fits
+    entries = []
+    for entry in os.scandir(root):
+        if entry.name.endswith('.pkl'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        evicted += 1
+    return evicted
+
+
+def disk_cache(func=None, root=RESULT_DIR, max_bytes=MAX_BYTES):
+    # Keep a function's results as pickles on disk, so they survive restarts.
+    # Put it under @st.cache_data: memory answers first, disk on a miss.
+    if func is None:
+        return functools.partial(disk_cache, root=root, max_bytes=max_bytes)
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        path = os.path.join(root, result_key(name, args, kwargs) + '.pkl')
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            # Reads count as use for LRU eviction
+            os.utime(path)
+            _count(name, 'hits')
+            return result
+        except FileNotFoundError:
+            pass
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Unreadable or written by incompatible code: recompute over it
+            pass
+        _count(name, 'misses')
+
+        result = func(*args, **kwargs)
+        os.makedirs(root, exist_ok=True)
+        scratch = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(scratch, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(scratch, path)
+        _count(name, 'writes')
+        for _ in range(evict(root, max_bytes)):
+            _count(name, 'evictions')
+        return result
+
+    return wrapper
+
+
+def cache_usage(root=RESULT_DIR):
+    # Number of stored results and their total size in bytes
+    if not os.path.isdir(root):
+        return 0, 0
+    sizes = [e.stat().st_size for e in os.scandir(root) if e.name.endswith('.pkl')]
+    return len(sizes), sum(sizes)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# Fast mode only kicks in once the filtered data is at least this many rows
+SAMPLE_MIN_ROWS = 20000
+
+# Normal quantile used for the displayed 95% error bounds
+Z_95 = 1.96
+
+# Columns a sample keeps: the strata, the filters applied to it and the estimated amounts
+SAMPLE_COLUMNS = ['Date', 'Field', 'TypeOfFetilizer', 'MT', 'Bunches']
+
+
+def stratified_sample(df, fraction=0.1, seed=0, columns=None):
+    # One stratum per month; the fields inside each month are the units we draw.
+    # Every stratum keeps at least two rows so its variance can be estimated.
+    # Drawn by position per month, without a key or rank for every row.
+    strata = df['Date'].dt.to_period('M')
+    rng = np.random.default_rng(seed)
+    periods, sizes, drawn = [], [], []
+    for period, rows in sorted(strata.groupby(strata).indices.items()):
+        take = int(min(max(np.ceil(len(rows) * fraction), 2), len(rows)))
+        periods.append(period)
+        sizes.append(len(rows))
+        drawn.append(rng.choice(rows, take, replace=False))
+    positions = np.sort(np.concatenate(drawn)) if drawn else np.empty(0, dtype=np.int64)
+    sample = df.iloc[positions]
+    if columns is not None:
+        sample = sample[columns]
+    return sample, pd.Series(sizes, index=pd.PeriodIndex(periods, freq='M'), dtype=np.int64)
+
+
+def estimate_monthly_sums(sample, sizes, column, domain=None):
+    # Expand each month's sample mean to the stratum size, with the
+    # finite-population-corrected standard error of that total. Rows outside
+    # `domain` (a mask over the sample, e.g. the field and fertilizer filters)
+    # count as zero, the usual domain estimator, so one sample of a period
+    # serves every filter within it. Months without a sampled row in the
+    # domain are left out.
+    strata = sample['Date'].dt.to_period('M')
+    values = sample[column] if domain is None else sample[column].where(domain, 0)
+    stats = values.groupby(strata).agg(['mean', 'var', 'count'])
+    if domain is not None:
+        stats = stats[pd.Series(domain).groupby(strata).any().reindex(stats.index, fill_value=False)]
+    population = sizes.reindex(stats.index).astype(float)
+
+    total = population * stats['mean']
+    fpc = 1 - stats['count'] / population
+    se = population * np.sqrt(fpc * stats['var'].fillna(0) / stats['count'])
+
+    return pd.DataFrame({
+        'Date': stats.index.to_timestamp(),
+        column: total.values,
+        'se': se.values,
+        'lower': (total - Z_95 * se).values,
+        'upper': (total + Z_95 * se).values,
+    })
+
+
+def estimate_total(monthly_estimate, column):
+    # Strata are sampled independently, so their variances add up
+    total = monthly_estimate[column].sum()
+    margin = Z_95 * np.sqrt((monthly_estimate['se'] ** 2).sum())
+    return total, margin
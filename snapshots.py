@@ -0,0 +1,142 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Home.py")
+SNAPSHOT_DIR = os.path.join(os.path.dirname(APP_FILE), "snapshots")
+
+# Sidebar selections to snapshot; 'all' selects every option of that filter
+FILTER_SPECS = {
+    'default': {},
+    'all-fields': {'Select Fields': 'all'},
+    'single-year': {'Select Fields': 'all', 'Select Years': [2024]},
+    'part-year': {'Select Fields': ['01A', '02B'], 'Select Months': ['January', 'February', 'October', 'November', 'December']},
+    'two-fertilizers': {'Select Fields': 'all', 'Type of Fertilizer': ['NOTHING', 'UREA']},
+}
+
+# Seconds each section may take on a warm rerun
+SECTION_BUDGETS = {
+    'Yield Analysis': 3.0,
+    'Fertilizer Impact': 2.0,
+    'WeedControl Analysis': 1.5,
+    'Pest&Disease': 1.5,
+    'Raw Data': 0.5,
+    'Yield Forecast': 1.0,
+    'Field Heatmap': 0.5,
+    'Anomaly Alerts': 0.5,
+    'Lagged Impact': 0.5,
+    'Age Cohorts': 0.5,
+    'Estate Roll-up': 0.5,
+    'Labor Productivity': 0.5,
+    'Field Map': 0.5,
+}
+
+
+def digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def apply_spec(at, spec):
+    for label, value in spec.items():
+        widget = next(w for w in at.sidebar.multiselect if w.label == label)
+        widget.set_value(list(widget.options) if value == 'all' else value)
+
+
+def capture(at):
+    # Everything the main page shows: metric cards verbatim, and each chart and
+    # table as a digest of its exact serialized data
+    metrics = [[m.label, m.value, m.delta] for m in at.main.metric]
+
+    charts = []
+    for chart in at.main.get('plotly_chart'):
+        spec = json.loads(chart.proto.spec)
+        # The template is Plotly styling boilerplate, not data
+        spec['layout'].pop('template', None)
+        title = spec['layout'].get('title', {})
+        charts.append({
+            'title': title.get('text', '') if isinstance(title, dict) else str(title),
+            'sha256': digest(json.dumps(spec, sort_keys=True)),
+        })
+
+    tables = []
+    for table in at.main.dataframe:
+        frame = table.value
+        tables.append({
+            'columns': [str(c) for c in frame.columns],
+            'rows': len(frame),
+            'sha256': digest(frame.to_json(orient='split', date_format='iso', double_precision=15)),
+        })
+    return {'metrics': metrics, 'charts': charts, 'tables': tables}
+
+
+def run_spec(spec, timeout=120):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    at.run()
+    apply_spec(at, spec)
+    at.run()
+    # A second, warm rerun is what the budgets measure
+    at.run()
+    errors = [e.value for e in at.exception]
+    return capture(at), dict(at.session_state['section_timings']), errors
+
+
+def compare(expected, actual):
+    problems = []
+    for kind in ('metrics', 'charts', 'tables'):
+        if len(expected[kind]) != len(actual[kind]):
+            problems.append(f"{kind}: {len(expected[kind])} expected, {len(actual[kind])} rendered")
+            continue
+        for i, (want, got) in enumerate(zip(expected[kind], actual[kind])):
+            if want != got:
+                label = want[0] if kind == 'metrics' else want.get('title') or want.get('columns')
+                problems.append(f"{kind}[{i}] {label}: {want} != {got}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check every KPI, chart and table of Home.py against golden snapshots and time budgets")
+    parser.add_argument("--update", action="store_true", help="record new golden snapshots instead of checking")
+    parser.add_argument("--spec", action="append", choices=sorted(FILTER_SPECS), help="only these filter specs")
+    parser.add_argument("--no-budgets", action="store_true", help="skip the time budget checks")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(APP_FILE))
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    failed = False
+    for name in args.spec or FILTER_SPECS:
+        snapshot, timings, errors = run_spec(FILTER_SPECS[name])
+        path = os.path.join(SNAPSHOT_DIR, f"{name}.json")
+        problems = [f"script error: {e}" for e in errors]
+
+        if args.update:
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=1, ensure_ascii=False)
+                f.write("\n")
+        elif not os.path.exists(path):
+            problems.append(f"no golden snapshot at {path}; run with --update")
+        else:
+            with open(path) as f:
+                problems += compare(json.load(f), snapshot)
+
+        if not args.no_budgets:
+            for section, seconds in timings.items():
+                budget = SECTION_BUDGETS.get(section)
+                if budget is not None and seconds > budget:
+                    problems.append(f"{section} took {seconds:.2f}s (budget {budget:.2f}s)")
+
+        status = "recorded" if args.update and not problems else "ok" if not problems else "FAILED"
+        slowest = max(timings.items(), key=lambda kv: kv[1], default=('-', 0))
+        print(f"{name:<18}{status:<10}{len(snapshot['metrics'])} metrics, {len(snapshot['charts'])} charts, "
+              f"{len(snapshot['tables'])} tables; slowest section {slowest[0]} {slowest[1]:.2f}s")
+        for problem in problems:
+            print(f"    {problem}")
+        failed |= bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
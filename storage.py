@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from validation import validate
+
+DATA_FILE = "intern data.xlsx"
+CACHE_DIR = ".cache"
+PARTITION_DIR = os.path.join(CACHE_DIR, "partitions")
+MANIFEST_FILE = "manifest.json"
+SCHEMA_FILE = "_schema.parquet"
+ARROW_FILE = "dataset.arrow"
+# Bumped when the store layout changes, so stores built by older code are rebuilt
+STORE_FORMAT = 3
+
+_version_memo = {}
+
+
+def data_version(path=DATA_FILE):
+    # Content hash of the source workbook, memoised on its mtime and size so
+    # reruns don't re-read the file, plus the batch of daily logs merged in
+    from ingest import daily_stamp
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _version_memo:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _version_memo[key] = digest.hexdigest()[:16]
+    stamp = daily_stamp()
+    return _version_memo[key] if stamp is None else f"{_version_memo[key]}-{stamp}"
+
+
+def read_workbook(path=DATA_FILE):
+    # Read the Excel file
+    df = pd.read_excel(path, sheet_name="Sheet1")
+
+    # Clean column names (remove extra spaces)
+    df.columns = df.columns.str.strip()
+
+    # Months covered by the daily harvest logs take their totals from the logs
+    from ingest import read_monthly, merge_daily
+    sheet_rows = len(df)
+    df = merge_daily(df, read_monthly())
+
+    # Check types, ranges, duplicates and ratios, setting bad rows aside
+    df, quarantine = validate(df, sheet_rows)
+
+    # Convert date column to datetime
+    df['Date'] = pd.to_datetime(df['Date'])
+
+    # Extract year and month for easier filtering
+    df['Year'] = df['Date'].dt.year
+    df['Month'] = df['Date'].dt.month_name()
+
+    # Clean up YearPlanted column
+    df['YearPlanted'] = df['YearPlanted'].astype(str)
+
+    return df, quarantine
+
+
+def read_manifest(version, root=PARTITION_DIR):
+    path = os.path.join(root, version, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('format') == STORE_FORMAT else None
+
+
+def write_partitions(df, version, root=PARTITION_DIR, quarantine=None):
+    # One Parquet file per Year/Month partition plus a manifest listing them,
+    # and the same partitions as record batches of a single Arrow IPC file
+    # that every server process memory-maps. The store is built in a scratch
+    # directory and renamed into place, so concurrent builders never expose
+    # a half-written version. Stores of other versions are left alone: other
+    # processes, and sessions viewing a past version, may still be reading
+    # them (see remove_stores).
+    target = os.path.join(root, version)
+    scratch = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+
+    # The index is kept so pruned reads can restore the workbook row order
+    schema = pa.Schema.from_pandas(df, preserve_index=True)
+    partitions = []
+    month_num = df['Date'].dt.month
+    with pa.OSFile(os.path.join(scratch, ARROW_FILE), 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for (year, month), part in df.groupby([df['Year'], month_num], sort=True):
+            relpath = os.path.join(f"Year={year}", f"Month={month:02d}", "part-0.parquet")
+            os.makedirs(os.path.dirname(os.path.join(scratch, relpath)), exist_ok=True)
+            part.to_parquet(os.path.join(scratch, relpath))
+            writer.write_batch(pa.RecordBatch.from_pandas(part, schema=schema, preserve_index=True))
+            partitions.append({
+                'year': int(year),
+                'month': part['Month'].iloc[0],
+                'month_num': int(month),
+                'path': relpath,
+                'batch': len(partitions),
+                'rows': len(part),
+            })
+    df.head(0).to_parquet(os.path.join(scratch, SCHEMA_FILE))
+
+    manifest = {
+        'format': STORE_FORMAT,
+        'version': version,
+        'rows': len(df),
+        'partitions': partitions,
+        # Filter options in workbook order, so the sidebar needs no row scan
+        'fields': df['Field'].unique().tolist(),
+        'years': [int(y) for y in df['Year'].unique()],
+        'months': df['Month'].unique().tolist(),
+        'fertilizer_types': df['TypeOfFetilizer'].unique().tolist(),
+        # Workbook rows that failed validation, for the Raw Data tab
+        'quarantine': [] if quarantine is None else quarantine.to_dict(orient='records'),
+    }
+    with open(os.path.join(scratch, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+    # A store of this version in an older format is replaced
+    if os.path.isdir(target) and read_manifest(version, root) is None:
+        shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.rename(scratch, target)
+    except OSError:
+        # Another process published this version first
+        shutil.rmtree(scratch, ignore_errors=True)
+        return read_manifest(version, root)
+    return manifest
+
+
+def remove_stores(keep, root=PARTITION_DIR):
+    # Delete the stores of every version but `keep`, returning their names.
+    # Only safe while no server is running: a running one may still hold
+    # manifests of those stores. Past versions are rebuilt from the version
+    # history when viewed again.
+    removed = []
+    if not os.path.isdir(root):
+        return removed
+    for name in os.listdir(root):
+        if name != keep and '.tmp-' not in name:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+def ensure_store(version, load=read_workbook):
+    # Manifest of the store for this version, building the store if missing.
+    # Every version built is recorded in the version history, and a past
+    # version viewed "as of" a date is rebuilt from that history.
+    from versions import is_recorded, record_version, materialize
+    manifest = read_manifest(version)
+    if manifest is None:
+        if is_recorded(version) and version != data_version():
+            df, quarantine = materialize(version)
+            return write_partitions(df, version, quarantine=quarantine)
+        df, quarantine = load()
+        manifest = write_partitions(df, version, quarantine=quarantine)
+        record_version(version, df, quarantine)
+    elif not is_recorded(version):
+        # Store built before versions were kept
+        df = read_partitions(manifest, manifest['years'], manifest['months'])
+        record_version(version, df, manifest['quarantine'])
+    return manifest
+
+
+def prune_partitions(manifest, years, months):
+    # Partitions matching the Year/Month selection, decided from the manifest alone
+    years, months = set(years), set(months)
+    return [p for p in manifest['partitions'] if p['year'] in years and p['month'] in months]
+
+
+def open_dataset(version, root=PARTITION_DIR):
+    # Batches read through the memory map reference the shared page cache
+    # instead of a per-process copy of the whole dataset
+    path = os.path.join(root, version, ARROW_FILE)
+    if not os.path.exists(path):
+        return None
+    return pa.ipc.open_file(pa.memory_map(path, 'r'))
+
+
+def _to_pandas(table):
+    # Rows back in workbook order, put in order while still in Arrow and only
+    # when they aren't already, so the conversion makes the one pandas copy
+    # and nothing is copied again afterwards
+    index = table.schema.pandas_metadata['index_columns'][0]
+    rows = table.column(index).to_numpy()
+    order = np.argsort(rows, kind='stable')
+    if (order != np.arange(len(order))).any():
+        table = table.take(order)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_partitions(manifest, years, months, reader=None, root=PARTITION_DIR):
+    selected = prune_partitions(manifest, years, months)
+    if reader is not None:
+        if selected:
+            table = pa.Table.from_batches([reader.get_batch(p['batch']) for p in selected])
+        else:
+            table = reader.schema.empty_table()
+        return _to_pandas(table)
+
+    # Stores written without the Arrow file fall back to the Parquet partitions
+    base = os.path.join(root, manifest['version'])
+    if not selected:
+        return pd.read_parquet(os.path.join(base, SCHEMA_FILE))
+    return _to_pandas(pa.concat_tables([pq.read_table(os.path.join(base, p['path'])) for p in selected]))
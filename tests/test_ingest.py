@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ingest
+
+
+def write_log(root, estate, name, days):
+    directory = os.path.join(root, estate)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), 'w') as f:
+        f.write("Date,Field,MT\n")
+        for day in range(1, days + 1):
+            f.write(f"2025-01-{day:02d},F1,1\n")
+
+
+def test_interrupted_batch_is_not_committed_with_its_retry(tmp_path, monkeypatch):
+    root, store = str(tmp_path / "daily"), str(tmp_path / "store")
+    write_log(root, "E1", "2025-01.csv", 12)
+
+    # First attempt writes a part per small block, then dies before its state
+    write_atomic = ingest._write_atomic
+
+    def crash_on_state(path, write):
+        if path.endswith(ingest.STATE_FILE):
+            raise OSError("interrupted")
+        write_atomic(path, write)
+    monkeypatch.setattr(ingest, '_write_atomic', crash_on_state)
+    with pytest.raises(OSError):
+        ingest.ingest_logs(root, store, chunk_bytes=32)
+    monkeypatch.setattr(ingest, '_write_atomic', write_atomic)
+
+    # The log grows before the retry, which writes fewer, larger parts
+    write_log(root, "E1", "2025-01.csv", 20)
+    state = ingest.ingest_logs(root, store)
+    assert state['batch'] == 1
+
+    daily = ingest.read_daily(2025, 1, store=store)
+    monthly = ingest.read_monthly(store)
+    assert len(daily) == 20
+    assert daily['MT'].sum() == monthly['MT'].sum() == 20
+    assert not daily.duplicated(['Date', 'Field']).any()
+
+
+def test_new_lines_are_added_to_the_monthly_totals(tmp_path):
+    root, store = str(tmp_path / "daily"), str(tmp_path / "store")
+    write_log(root, "E1", "2025-01.csv", 10)
+    ingest.ingest_logs(root, store)
+    write_log(root, "E1", "2025-01.csv", 15)
+    state = ingest.ingest_logs(root, store)
+
+    assert state['batch'] == 2
+    assert state['rows'] == 15
+    monthly = ingest.read_monthly(store)
+    assert monthly.loc[('F1', pd.Timestamp('2025-01-01')), 'MT'] == 15
+    assert len(ingest.read_daily(2025, 1, store=store)) == 15
+
+
+def test_quarantined_log_rows_have_no_sheet_row_number(tmp_path):
+    from validation import SCHEMA, validate
+
+    root, store = str(tmp_path / "daily"), str(tmp_path / "store")
+    write_log(root, "E1", "2025-01.csv", 3)
+    ingest.ingest_logs(root, store)
+
+    # One good workbook row for F1 in December; the logs add January with
+    # harvest but no bunches, which validation quarantines
+    sheet = pd.DataFrame([{
+        column: 'F1' if column == 'Field' else pd.Timestamp('2024-12-01') if column == 'Date'
+        else 'X' if spec['kind'] == 'text' else 1
+        for column, spec in SCHEMA.items()
+    }])
+    sheet['MT'], sheet['Bunches'] = 1.0, 100
+    merged = ingest.merge_daily(sheet, ingest.read_monthly(store))
+    clean, report = validate(merged, len(sheet))
+
+    assert len(clean) == 1
+    assert report['Row'].tolist() == [None]
+    assert report['Source'].tolist() == ['daily logs']
+    assert report['Action'].tolist() == ['quarantined']
@@ -0,0 +1,30 @@
+import os
+import time
+
+from report import prune_reports, start_report
+
+
+def wait(job):
+    while job['status'] == 'running':
+        time.sleep(0.01)
+
+
+def build(path, progress=None):
+    with open(path, 'w') as f:
+        f.write('report')
+    return path
+
+
+def test_expired_jobs_and_files_are_removed(tmp_path):
+    jobs = {}
+    old, new = str(tmp_path / "old.xlsx"), str(tmp_path / "new.xlsx")
+    wait(start_report(jobs, 'old', build, old))
+    wait(start_report(jobs, 'new', build, new))
+    # The first report finished two hours ago
+    jobs['old']['started'] -= 7200
+    os.utime(old, (time.time() - 7200,) * 2)
+
+    prune_reports(jobs, root=str(tmp_path), ttl=3600)
+    assert list(jobs) == ['new']
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
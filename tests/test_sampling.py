@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from sampling import SAMPLE_COLUMNS, estimate_monthly_sums, estimate_total, stratified_sample
+
+
+def synthetic(n=500_000, seed=1):
+    rng = np.random.default_rng(seed)
+    months = pd.date_range('2015-01-01', periods=60, freq='MS')
+    return pd.DataFrame({
+        'Date': months[rng.integers(0, len(months), n)],
+        'Field': rng.integers(0, 5000, n).astype(str),
+        'TypeOfFetilizer': rng.choice(['UREA', 'MOP', 'NOTHING'], n),
+        'MT': rng.gamma(2.0, 5.0, n),
+        'Bunches': rng.poisson(500, n).astype(float),
+    })
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def test_estimate_from_a_cached_sample_is_accurate_and_cheaper_than_the_exact_sums():
+    df = synthetic()
+    fields = [str(i) for i in range(0, 5000, 2)]
+    fertilizer = ['UREA', 'MOP']
+    # Drawn once per period selection; only the filters change between reruns
+    sample, sizes = stratified_sample(df, 0.1, columns=SAMPLE_COLUMNS)
+
+    def estimate():
+        domain = sample['Field'].isin(fields) & sample['TypeOfFetilizer'].isin(fertilizer)
+        return estimate_monthly_sums(sample, sizes, 'MT', domain), estimate_monthly_sums(sample, sizes, 'Bunches', domain)
+
+    def exact():
+        rows = df[df['Field'].isin(fields) & df['TypeOfFetilizer'].isin(fertilizer)]
+        return rows.groupby(pd.Grouper(key='Date', freq='MS'))[['MT', 'Bunches']].sum()
+
+    estimate_seconds, (mt, bunches) = best_of(estimate)
+    exact_seconds, sums = best_of(exact)
+    assert estimate_seconds < exact_seconds
+
+    total, margin = estimate_total(mt, 'MT')
+    assert abs(total - sums['MT'].sum()) < margin
+    assert abs(total - sums['MT'].sum()) / sums['MT'].sum() < 0.02
+    # Nearly every month's exact sum lies inside its 95% bounds
+    by_month = mt.set_index('Date')
+    inside = (sums['MT'] >= by_month['lower']) & (sums['MT'] <= by_month['upper'])
+    assert inside.mean() >= 0.85
+    assert len(bunches) == len(sums)
+
+
+def test_every_month_keeps_at_least_two_rows():
+    df = synthetic(n=200)
+    sample, sizes = stratified_sample(df, 0.01)
+    counts = sample['Date'].dt.to_period('M').value_counts()
+    assert (counts >= np.minimum(2, sizes.reindex(counts.index))).all()
+    assert sizes.sum() == len(df)
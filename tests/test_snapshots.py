@@ -0,0 +1,23 @@
+import json
+import os
+
+import pytest
+
+from snapshots import APP_FILE, FILTER_SPECS, SNAPSHOT_DIR, compare, run_spec
+
+
+# Every KPI, chart and table against the golden snapshots, as
+# `python snapshots.py --no-budgets` checks them. The time budgets stay with
+# the script: timings on a shared test runner are too noisy to fail on.
+@pytest.mark.parametrize('name', sorted(FILTER_SPECS))
+def test_dashboard_matches_its_snapshot(name, monkeypatch):
+    path = os.path.join(SNAPSHOT_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        pytest.skip(f"no golden snapshot at {path}; run snapshots.py --update")
+    monkeypatch.chdir(os.path.dirname(APP_FILE))
+
+    snapshot, _, errors = run_spec(FILTER_SPECS[name])
+
+    assert errors == []
+    with open(path) as f:
+        assert compare(json.load(f), snapshot) == []
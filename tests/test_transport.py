@@ -0,0 +1,27 @@
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from transport import compact_figure, payload_size
+
+
+def figure(n=5000):
+    rng = np.random.default_rng(0)
+    return go.Figure(go.Scatter(x=np.arange(n), y=rng.normal(100, 20, n)))
+
+
+def test_compact_figure_sends_typed_arrays():
+    fig = compact_figure(figure())
+    trace = json.loads(pio.to_json(fig, validate=False))['data'][0]
+    # plotly >= 6 sends numpy arrays base64-encoded with their dtype
+    assert trace['x']['dtype'] == 'i2'
+    assert trace['y']['dtype'] == 'f4'
+    assert 'bdata' in trace['y']
+
+
+def test_compact_figure_shrinks_the_payload():
+    full = payload_size(figure())
+    compact = payload_size(compact_figure(figure()))
+    assert compact < full * 0.6
@@ -0,0 +1,55 @@
+import pandas as pd
+
+import versions
+
+
+def workbook(fields, mt):
+    return pd.DataFrame({
+        'Field': fields,
+        'Date': pd.to_datetime(['2025-01-01'] * len(fields)),
+        'MT': mt,
+    }, index=range(2, 2 + len(fields)))
+
+
+def test_materialize_returns_the_recorded_frame_after_an_insertion(tmp_path):
+    root = str(tmp_path)
+    v1 = workbook(['A', 'B', 'C', 'D'], [1.0, 2.0, 3.0, 4.0])
+    # A row inserted mid-workbook moves every row below it
+    v2 = workbook(['A', 'X', 'B', 'C', 'D'], [1.0, 9.0, 2.0, 3.0, 4.0])
+    # ...and one edited and another removed on top of that
+    v3 = workbook(['A', 'X', 'B', 'D'], [1.0, 9.0, 2.5, 4.0])
+    for version_id, df in [('v1', v1), ('v2', v2), ('v3', v3)]:
+        versions.record_version(version_id, df, root=root)
+
+    for version_id, df in [('v1', v1), ('v2', v2), ('v3', v3)]:
+        pd.testing.assert_frame_equal(versions.materialize(version_id, root)[0], df, check_index_type=False)
+    assert [v['kind'] for v in versions.list_versions(root)] == ['full', 'delta', 'delta']
+
+
+def test_data_current_again_goes_back_on_the_timeline(tmp_path):
+    root = str(tmp_path)
+    v1 = workbook(['A', 'B'], [1.0, 2.0])
+    v2 = workbook(['A', 'B'], [1.0, 3.0])
+    versions.record_version('v1', v1, root=root)
+    versions.record_version('v2', v2, root=root)
+    # The edit is undone: v1's data is already stored and becomes current again
+    versions.record_version('v1', v1, root=root)
+    versions.mark_current('v1', root)
+
+    history = versions.list_versions(root)
+    assert [v['id'] for v in history] == ['v1', 'v2', 'v1']
+    assert versions.version_as_of(history, pd.Timestamp.now())['id'] == 'v1'
+    assert history[0]['created'] < history[2]['created']
+
+
+def test_a_column_added_to_the_workbook_is_kept_and_diffed(tmp_path):
+    root = str(tmp_path)
+    v1 = workbook(['A', 'B'], [1.0, 2.0])
+    v2 = v1.assign(Bunches=[10, 20])
+    versions.record_version('v1', v1, root=root)
+    versions.record_version('v2', v2, root=root)
+
+    pd.testing.assert_frame_equal(versions.materialize('v2', root)[0], v2, check_index_type=False)
+    diff = versions.diff_versions('v1', 'v2', root)
+    assert sorted(diff['Column']) == ['Bunches', 'Bunches']
+    assert sorted(diff['After']) == ['10', '20']
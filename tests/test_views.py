@@ -0,0 +1,42 @@
+import os
+import threading
+
+from views import read_views, refresh_view, save_view
+
+
+def test_concurrent_saves_keep_every_view(tmp_path):
+    path = str(tmp_path / "views.json")
+
+    def save(i):
+        save_view(f"view {i}", {'fields': [str(i)]}, 'v1', {}, path)
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(read_views(path)) == sorted(f"view {i}" for i in range(20))
+    assert [n for n in os.listdir(tmp_path) if '.tmp-' in n] == []
+
+
+def test_a_damaged_file_is_set_aside_not_overwritten(tmp_path):
+    path = str(tmp_path / "views.json")
+    with open(path, 'w') as f:
+        f.write('{"mine": {"spec"')
+    save_view('new', {}, 'v1', {}, path)
+
+    assert list(read_views(path)) == ['new']
+    damaged = [n for n in os.listdir(tmp_path) if n.startswith('views.json.damaged-')]
+    with open(tmp_path / damaged[0]) as f:
+        assert f.read() == '{"mine": {"spec"'
+
+
+def test_refresh_only_updates_stale_views(tmp_path):
+    path = str(tmp_path / "views.json")
+    save_view('a', {}, 'v2', {'MT': 2.0}, path)
+    refresh_view('a', 'v2', {'MT': 99.0}, path)
+    assert read_views(path)['a']['results'] == {'MT': 2.0}
+    refresh_view('a', 'v3', {'MT': 3.0}, path)
+    assert read_views(path)['a'] == {'spec': {}, 'version': 'v3', 'results': {'MT': 3.0}}
+    refresh_view('gone', 'v3', {}, path)
+    assert list(read_views(path)) == ['a']
@@ -0,0 +1,30 @@
+import numpy as np
+
+from whatif import search_plans
+
+
+def test_suggested_plan_spends_the_planned_total():
+    # The current allocation (300 bags) must not win a search for 60 bags
+    baseline = np.array([100.0, 100.0, 100.0])
+    plan, gain, mandays = search_plans(
+        60, baseline, np.array([0.1, 0.2, 0.3]), np.array([0.1, 0.1, 0.1]), np.full(3, 500.0), n_plans=500
+    )
+    assert np.isclose(plan.sum(), 60)
+    assert np.isfinite(gain)
+
+
+def test_suggested_plan_stays_within_mandays():
+    baseline = np.array([100.0, 100.0, 100.0])
+    mandays_per_bag = np.array([0.1, 0.1, 0.1])
+    plan, gain, mandays = search_plans(
+        300, baseline, np.array([0.1, 0.2, 0.3]), mandays_per_bag, np.full(3, 500.0), n_plans=500, max_mandays=20
+    )
+    # Every 300-bag plan needs 30 mandays, so none is feasible
+    assert gain == -np.inf
+
+    plan, gain, mandays = search_plans(
+        300, baseline, np.array([0.1, 0.2, 0.3]), np.array([0.01, 0.1, 0.2]), np.full(3, 500.0), n_plans=500, max_mandays=20
+    )
+    assert np.isfinite(gain)
+    assert mandays <= 20
+    assert np.isclose(plan @ np.array([0.01, 0.1, 0.2]), mandays)
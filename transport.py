@@ -0,0 +1,65 @@
+import numpy as np
+import plotly.io as pio
+
+# Per-point trace attributes sent as typed arrays
+ARRAY_ATTRS = ('x', 'y', 'z', 'customdata', 'base')
+
+# Decimal places kept for chart data; every chart displays at most two
+DISPLAY_DECIMALS = 3
+
+INT_TYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+
+def payload_size(fig):
+    # Bytes of the JSON spec Streamlit sends to the browser for this figure
+    return len(pio.to_json(fig, validate=False))
+
+
+def compact_array(values, decimals=DISPLAY_DECIMALS):
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'f':
+        # Round to display precision, then drop to float32 when that keeps
+        # every value within half a unit of the last kept decimal
+        rounded = np.round(arr, decimals)
+        finite = np.isfinite(rounded)
+        if not finite.any() or np.abs(rounded[finite]).max() < np.finfo(np.float32).max:
+            single = rounded.astype(np.float32)
+            if np.allclose(single, rounded, rtol=0, atol=0.5 * 10 ** -decimals, equal_nan=True):
+                return single
+        return rounded
+    if arr.dtype.kind in 'iu' and arr.size:
+        # Smallest integer type plotly.js has a typed array for
+        lo, hi = arr.min(), arr.max()
+        for int_type in INT_TYPES:
+            info = np.iinfo(int_type)
+            if info.min <= lo and hi <= info.max:
+                return arr.astype(int_type)
+        return arr
+    if arr.dtype.kind == 'M' and arr.size:
+        # Month-start dates don't need a time of day in every string
+        days = arr.astype('datetime64[D]')
+        if (arr == days).all():
+            return np.datetime_as_string(days, unit='D').astype(object)
+    return values
+
+
+def compact_figure(fig, decimals=DISPLAY_DECIMALS):
+    # Shrink a figure's JSON payload in place: compact typed arrays for the
+    # per-point data, and template defaults only for trace types it draws
+    for trace in fig.data:
+        for attr in ARRAY_ATTRS:
+            values = getattr(trace, attr, None)
+            if values is None or isinstance(values, str):
+                continue
+            try:
+                setattr(trace, attr, compact_array(values, decimals))
+            except (TypeError, ValueError):
+                # Mixed or categorical data stays as plotly built it
+                continue
+
+    template = fig.layout.template
+    if template is not None and template.data is not None:
+        used = {trace.type for trace in fig.data}
+        kept = {t: getattr(template.data, t) for t in used if getattr(template.data, t, None)}
+        fig.layout.template.data = kept
+    return fig
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# Expected workbook columns: kind of value and, for numbers, the allowed range.
+# Every listed column must be present; numbers and Date/Field must be filled in.
+SCHEMA = {
+    'Date': {'kind': 'date'},
+    'Field': {'kind': 'text', 'required': True},
+    'YearPlanted': {'kind': 'text'},
+    'TotalStandingPalm': {'kind': 'int', 'min': 1},
+    'TypeOfFetilizer': {'kind': 'text'},
+    'Usage of fertilizer': {'kind': 'float', 'min': 0},
+    'Fertilized Acres': {'kind': 'float', 'min': 0},
+    'Fertilized Lorong': {'kind': 'float', 'min': 0},
+    'Mandays for fertilizer': {'kind': 'float', 'min': 0},
+    'Number of worker for fertilizer': {'kind': 'float', 'min': 0},
+    'Fertilized Standing Palms': {'kind': 'int', 'min': 0},
+    'No.OfRound Fertilizer': {'kind': 'int', 'min': 0, 'max': 31},
+    'Type of pest and disease': {'kind': 'text'},
+    'Number of workers for pest and disease': {'kind': 'int', 'min': 0},
+    'Mandays for pest and disease': {'kind': 'float', 'min': 0},
+    'No.OfRound P&D': {'kind': 'int', 'min': 0, 'max': 31},
+    'TypeOfWeedControl': {'kind': 'text'},
+    'Number of workers for weed control': {'kind': 'int', 'min': 0},
+    'Mandays for weed control': {'kind': 'float', 'min': 0},
+    'No.OfRound WeedControl': {'kind': 'int', 'min': 0, 'max': 31},
+    'MechanicalGrassCutting': {'kind': 'text'},
+    'Bunches': {'kind': 'int', 'min': 0},
+    'MT': {'kind': 'float', 'min': 0},
+}
+
+# Plausible average fresh fruit bunch weight (kg) for a field-month
+BUNCH_WEIGHT_RANGE = (2, 60)
+
+# Checks across columns: (issue, action, mask of offending rows). Quarantined
+# rows are left out of the store; flagged rows are kept and only reported.
+RATIO_RULES = [
+    ('harvest (MT) with no bunches', 'quarantine',
+     lambda df: (df['MT'] > 0) & (df['Bunches'] == 0)),
+    ('bunches with no harvest (MT)', 'quarantine',
+     lambda df: (df['Bunches'] > 0) & (df['MT'] == 0)),
+    (f'bunch weight outside {BUNCH_WEIGHT_RANGE[0]}-{BUNCH_WEIGHT_RANGE[1]} kg', 'quarantine',
+     lambda df: (df['Bunches'] > 0) & (df['MT'] > 0) & ~(df['MT'] * 1000 / df['Bunches']).between(*BUNCH_WEIGHT_RANGE)),
+    ('more palms fertilized than standing', 'flag',
+     lambda df: df['Fertilized Standing Palms'] > df['TotalStandingPalm']),
+]
+
+
+def validate(df, sheet_rows=None):
+    # Check every row against SCHEMA and RATIO_RULES in one vectorized pass.
+    # Returns the clean frame, numbers coerced to their schema kinds, and a
+    # report with one row per workbook row that has issues. Only the first
+    # sheet_rows rows (all, if None) are rows of the Excel sheet; the rest
+    # were added from the daily logs and are reported without a row number. Downstream code
+    # can rely on the clean frame having no missing or negative numbers, no
+    # duplicate (Field, Date) rows and no MT without Bunches (or vice versa),
+    # so ratios such as kg per bunch are never infinite.
+    missing = [c for c in SCHEMA if c not in df.columns]
+    if missing:
+        raise ValueError(f"Workbook is missing columns: {', '.join(missing)}")
+
+    df = df.copy()
+    checks = {}
+    for column, spec in SCHEMA.items():
+        kind = spec['kind']
+        raw = df[column]
+        if kind == 'text':
+            if spec.get('required'):
+                checks[f'{column} is blank'] = raw.isna() | (raw.astype(str).str.strip() == '')
+            continue
+        if kind == 'date':
+            values = pd.to_datetime(raw, errors='coerce')
+            checks[f'{column} is not a date'] = values.isna() & raw.notna()
+            checks[f'{column} is blank'] = raw.isna()
+        else:
+            values = raw if pd.api.types.is_numeric_dtype(raw) else pd.to_numeric(raw, errors='coerce')
+            checks[f'{column} is not a number'] = values.isna() & raw.notna()
+            checks[f'{column} is blank'] = raw.isna()
+            if kind == 'int':
+                checks[f'{column} is not a whole number'] = values.notna() & (values % 1 != 0)
+            if 'min' in spec:
+                checks[f"{column} below {spec['min']}"] = values < spec['min']
+            if 'max' in spec:
+                checks[f"{column} above {spec['max']}"] = values > spec['max']
+        df[column] = values
+
+    # Later rows for an already seen field-month are the duplicates
+    checks['duplicate Field and Date'] = df.duplicated(['Field', 'Date'], keep='first') & df['Date'].notna()
+
+    actions = dict.fromkeys(checks, 'quarantine')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for issue, action, rule in RATIO_RULES:
+            checks[issue] = rule(df).fillna(False).astype(bool)
+            actions[issue] = action
+
+    issues = pd.DataFrame(checks, index=df.index)
+    quarantine = issues[[i for i in issues if actions[i] == 'quarantine']].any(axis=1)
+    flagged = issues.any(axis=1)
+
+    clean = df[~quarantine].copy()
+    for column, spec in SCHEMA.items():
+        if spec['kind'] == 'int' and not pd.api.types.is_integer_dtype(clean[column]):
+            clean[column] = clean[column].astype('int64')
+
+    bad = issues[flagged]
+    names = np.array(bad.columns, dtype=object)
+    from_sheet = bad.index < (len(df) if sheet_rows is None else sheet_rows)
+    report = pd.DataFrame({
+        # Row numbers as seen in Excel, below the header row
+        'Row': np.where(from_sheet, bad.index + 2, None),
+        'Source': np.where(from_sheet, 'workbook', 'daily logs'),
+        'Field': df.loc[bad.index, 'Field'].astype(str),
+        'Date': df.loc[bad.index, 'Date'].dt.strftime('%Y-%m-%d').fillna(''),
+        'Action': np.where(quarantine[flagged], 'quarantined', 'flagged'),
+        'Issues': ['; '.join(names[row]) for row in bad.to_numpy()],
+    }).reset_index(drop=True)
+    return clean, report
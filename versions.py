@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+# Every data version the store has been built from, kept so the dashboard
+# can be viewed as of an earlier date. Unlike .cache, this is history: don't
+# delete it to clear caches.
+VERSION_DIR = "versions"
+
+# Rows are matched across versions on this key
+KEY = ['Field', 'Date']
+
+# A full copy is stored every this many versions, so rebuilding a version
+# never replays a long chain of deltas
+FULL_EVERY = 10
+
+# Workbook row order, kept alongside the data
+ROW_COLUMN = '_row'
+
+# When each version became the current one, one JSON line per change. The
+# same data can be current more than once (an edit undone), so this is kept
+# apart from the data files, which are stored once per version.
+TIMELINE_FILE = "timeline.jsonl"
+
+
+def _meta_path(version_id, root):
+    return os.path.join(root, f"{version_id}.json")
+
+
+def _order_path(version_id, root):
+    return os.path.join(root, f"{version_id}.order.parquet")
+
+
+def _write_atomic(path, write):
+    scratch = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    write(scratch)
+    os.replace(scratch, path)
+
+
+def _read_meta(version_id, root):
+    with open(_meta_path(version_id, root)) as f:
+        return json.load(f)
+
+
+def _read_timeline(root):
+    # (id, created) of every time a version became current, oldest first.
+    # Histories recorded before the timeline existed take it from the sidecars.
+    path = os.path.join(root, TIMELINE_FILE)
+    if not os.path.exists(path):
+        metas = [_read_meta(name[:-5], root) for name in os.listdir(root) if name.endswith('.json')]
+        return [{'id': m['id'], 'created': m['created']} for m in sorted(metas, key=lambda m: m['created'])]
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.endswith('\n')]
+    # Two processes noting the same change at once both append it
+    return [e for i, e in enumerate(entries) if i == 0 or e['id'] != entries[i - 1]['id']]
+
+
+def timeline_stamp(root=VERSION_DIR):
+    # Changes whenever a version becomes current, for use as a cache key
+    path = os.path.join(root, TIMELINE_FILE)
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def list_versions(root=VERSION_DIR):
+    # Versions in the order they became current, oldest first, with the time
+    # each did; a version current twice is listed twice. Each version is a
+    # data file plus a small JSON sidecar written last, so a half-recorded
+    # version is never listed.
+    if not os.path.isdir(root):
+        return []
+    metas = {}
+    versions = []
+    for entry in _read_timeline(root):
+        if entry['id'] not in metas:
+            metas[entry['id']] = _read_meta(entry['id'], root)
+        versions.append({**metas[entry['id']], 'created': entry['created']})
+    return versions
+
+
+def is_recorded(version_id, root=VERSION_DIR):
+    return os.path.exists(_meta_path(version_id, root))
+
+
+def mark_current(version_id, root=VERSION_DIR):
+    # Note that a recorded version is now the current one, unless it already
+    # was; cheap enough to call on every run
+    if not is_recorded(version_id, root):
+        return
+    timeline = _read_timeline(root)
+    if timeline and timeline[-1]['id'] == version_id:
+        return
+    path = os.path.join(root, TIMELINE_FILE)
+    lines = []
+    if not os.path.exists(path):
+        # Carry over a history recorded before the timeline existed
+        lines = [json.dumps(e) + '\n' for e in timeline]
+    entry = {'id': version_id, 'created': datetime.now().isoformat(sep=' ', timespec='microseconds')}
+    lines.append(json.dumps(entry) + '\n')
+    with open(path, 'a') as f:
+        f.write(''.join(lines))
+
+
+def version_as_of(versions, when):
+    # Latest version recorded on or before the end of the given day
+    cutoff = (pd.Timestamp(when) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    earlier = [v for v in versions if v['created'] < cutoff]
+    return earlier[-1] if earlier else None
+
+
+def _changes(old, new):
+    # Keys added, changed (any value differs) and removed from old to new,
+    # both indexed by KEY. Row order alone doesn't count as a change; a
+    # column only one side has counts as missing on the other.
+    columns = [c for c in old.columns.union(new.columns, sort=False) if c != ROW_COLUMN]
+    common = new.index.intersection(old.index)
+    before, after = old.reindex(columns=columns).loc[common], new.reindex(columns=columns).loc[common]
+    same = (before == after) | (before.isna() & after.isna())
+    changed = common[~same.all(axis=1).to_numpy()]
+    added = new.index.difference(old.index)
+    removed = old.index.difference(new.index)
+    return added, changed, removed
+
+
+def record_version(version_id, df, quarantine=None, root=VERSION_DIR):
+    # Store the cleaned data of a new version: in full every FULL_EVERY
+    # versions and whenever the columns change, otherwise as the rows added
+    # or changed since the previous version plus the keys removed, with the
+    # row order of every row. A version already stored is only noted as
+    # current again.
+    if is_recorded(version_id, root):
+        mark_current(version_id, root)
+        return
+    os.makedirs(root, exist_ok=True)
+    timeline = _read_timeline(root)
+    base = _read_meta(timeline[-1]['id'], root) if timeline else None
+    frame = df.rename_axis(ROW_COLUMN).reset_index()
+    meta = {
+        'id': version_id,
+        'created': datetime.now().isoformat(sep=' ', timespec='microseconds'),
+        'rows': len(df),
+        'columns': list(df.columns),
+        'quarantine': [] if quarantine is None else pd.DataFrame(quarantine).to_dict(orient='records'),
+    }
+
+    if base is None or base['depth'] + 1 >= FULL_EVERY or base['columns'] != list(df.columns):
+        meta.update({'kind': 'full', 'base': None, 'depth': 0, 'added': len(df), 'changed': 0, 'removed': []})
+        data = frame
+    else:
+        old = materialize(base['id'], root)[0].rename_axis(ROW_COLUMN).reset_index().set_index(KEY)
+        new = frame.set_index(KEY)
+        added, changed, removed = _changes(old, new)
+        meta.update({
+            'kind': 'delta',
+            'base': base['id'],
+            'depth': base['depth'] + 1,
+            'added': len(added),
+            'changed': len(changed),
+            'removed': [[field, date.strftime('%Y-%m-%d')] for field, date in removed],
+        })
+        data = new.loc[added.union(changed)].reset_index()
+        # Rows the delta leaves out may still have moved, e.g. after a row
+        # inserted above them, so the order of every row is kept
+        order = frame[KEY + [ROW_COLUMN]]
+        _write_atomic(_order_path(version_id, root), lambda p: order.to_parquet(p, index=False))
+    _write_atomic(os.path.join(root, f"{version_id}.parquet"), lambda p: data.to_parquet(p, index=False))
+
+    def write_meta(path):
+        with open(path, 'w') as f:
+            json.dump(meta, f, indent=1, default=str)
+    _write_atomic(_meta_path(version_id, root), write_meta)
+    mark_current(version_id, root)
+
+
+def materialize(version_id, root=VERSION_DIR):
+    # Cleaned data and quarantine report of a recorded version, rebuilt from
+    # the nearest full copy and the deltas after it
+    chain = []
+    current = version_id
+    while current is not None:
+        meta = _read_meta(current, root)
+        chain.append(meta)
+        current = meta['base']
+
+    frame = None
+    for meta in reversed(chain):
+        data = pd.read_parquet(os.path.join(root, f"{meta['id']}.parquet")).set_index(KEY)
+        if frame is None:
+            frame = data
+            continue
+        # Rows the delta replaces or removes give way to its rows
+        replaced = data.index
+        if meta['removed']:
+            removed = [(field, pd.Timestamp(date)) for field, date in meta['removed']]
+            replaced = replaced.append(pd.MultiIndex.from_tuples(removed, names=KEY))
+        frame = pd.concat([frame.drop(index=replaced, errors='ignore'), data])
+
+    # Columns of the requested version, in its workbook row order
+    if chain[0]['kind'] == 'delta' and os.path.exists(_order_path(version_id, root)):
+        order = pd.read_parquet(_order_path(version_id, root)).set_index(KEY)[ROW_COLUMN]
+        frame[ROW_COLUMN] = order.reindex(frame.index).to_numpy()
+    frame = frame.reset_index().sort_values(ROW_COLUMN, kind='stable').set_index(ROW_COLUMN)[chain[0]['columns']]
+    frame.index.name = None
+    return frame, pd.DataFrame(chain[0]['quarantine'])
+
+
+def diff_versions(old_id, new_id, root=VERSION_DIR):
+    # Cell-level differences between two versions: one row per changed value,
+    # plus one per row added or removed
+    old = materialize(old_id, root)[0].set_index(KEY)
+    new = materialize(new_id, root)[0].set_index(KEY)
+    added, changed, removed = _changes(old, new)
+    records = []
+    for key in added:
+        records.append({'Field': key[0], 'Date': key[1], 'Change': 'added', 'Column': '', 'Before': '', 'After': ''})
+    for key in removed:
+        records.append({'Field': key[0], 'Date': key[1], 'Change': 'removed', 'Column': '', 'Before': '', 'After': ''})
+    if len(changed):
+        columns = list(old.columns.union(new.columns, sort=False))
+        before, after = old.reindex(columns=columns).loc[changed], new.reindex(columns=columns).loc[changed]
+        differs = ~((before == after) | (before.isna() & after.isna()))
+        for key, row in differs.iterrows():
+            for column in row.index[row.to_numpy()]:
+                records.append({
+                    'Field': key[0], 'Date': key[1], 'Change': 'changed', 'Column': column,
+                    'Before': str(before.at[key, column]), 'After': str(after.at[key, column]),
+                })
+    diff = pd.DataFrame(records, columns=['Field', 'Date', 'Change', 'Column', 'Before', 'After'])
+    return diff.sort_values(['Date', 'Field'], kind='stable').reset_index(drop=True)
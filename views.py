@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+from storage import CACHE_DIR
+
+VIEWS_FILE = os.path.join(CACHE_DIR, "views.json")
+
+_lock = threading.Lock()
+
+# Filter spec keys, used as both session state suffixes and URL query params
+FILTER_KEYS = ['fields', 'years', 'months', 'fertilizer']
+
+
+def read_views(path=VIEWS_FILE):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # A damaged store shouldn't take the dashboard down with it
+        return {}
+
+
+def write_views(views, path=VIEWS_FILE):
+    # Write to a scratch file and rename, so readers never see half a file.
+    # Sessions are threads, so the scratch name carries the thread too.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    scratch = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(scratch, 'w') as f:
+        json.dump(views, f, indent=1, ensure_ascii=False)
+    os.replace(scratch, path)
+
+
+@contextmanager
+def updating_views(path=VIEWS_FILE):
+    # Saved views to change in place, written back on exit. Only one session
+    # or process updates the file at a time, so concurrent saves don't drop
+    # each other's views. A damaged file is set aside rather than replaced
+    # by the views of this one update.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock, open(f"{path}.lock", 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        views = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    views = json.load(f)
+            except ValueError:
+                os.replace(path, f"{path}.damaged-{time.strftime('%Y%m%d-%H%M%S')}")
+        before = json.dumps(views, sort_keys=True)
+        yield views
+        if json.dumps(views, sort_keys=True) != before:
+            write_views(views, path)
+
+
+def clean_spec(spec, options):
+    # Keep only values that are still filter options, in option order, so a
+    # view saved on older data or a hand-edited URL can't break a multiselect
+    return {key: [o for o in options[key] if str(o) in {str(v) for v in spec.get(key, [])}] for key in FILTER_KEYS}
+
+
+def spec_from_query(params, options):
+    # Filter spec from URL query params such as ?fields=01A&fields=02B&years=2024;
+    # repeated params carry lists because fertilizer names contain commas
+    if not any(key in params for key in FILTER_KEYS):
+        return None
+    spec = {key: params.get_all(key) for key in FILTER_KEYS if key in params}
+    cleaned = clean_spec(spec, options)
+    # Filters missing from the URL keep every option
+    for key in FILTER_KEYS:
+        if key not in params:
+            cleaned[key] = list(options[key])
+    return cleaned
+
+
+def spec_to_query(spec, options):
+    # URL query params for a filter spec; filters with every option selected
+    # are left out to keep links short, except fields, so a link is never empty
+    return {
+        key: [str(v) for v in spec[key]]
+        for key in FILTER_KEYS
+        if key == 'fields' or spec[key] != list(options[key])
+    }
+
+
+def compute_results(df):
+    # KPI totals and monthly aggregates behind the headline cards and charts
+    monthly = df.groupby(pd.Grouper(key='Date', freq='MS'))[['MT', 'Bunches']].sum()
+    return {
+        'field_count': int(df['Field'].nunique()),
+        'MT': float(df['MT'].sum()),
+        'Bunches': float(df['Bunches'].sum()),
+        'Usage of fertilizer': float(df['Usage of fertilizer'].sum()),
+        'monthly': {
+            'Date': monthly.index.strftime('%Y-%m-%d').tolist(),
+            'MT': monthly['MT'].tolist(),
+            'Bunches': monthly['Bunches'].tolist(),
+        },
+    }
+
+
+def save_view(name, spec, version, results, path=VIEWS_FILE):
+    with updating_views(path) as views:
+        views[name] = {'spec': spec, 'version': version, 'results': results}
+
+
+def refresh_view(name, version, results, path=VIEWS_FILE):
+    # Store results of newer data for a view, unless another session already has
+    with updating_views(path) as views:
+        view = views.get(name)
+        if view is not None and view.get('version') != version:
+            view.update({'version': version, 'results': results})
+
+
+def delete_view(name, path=VIEWS_FILE):
+    with updating_views(path) as views:
+        views.pop(name, None)
+
+
+def matching_view(views, spec):
+    # Name of a saved view with exactly this filter spec
+    for name, view in views.items():
+        if view['spec'] == spec:
+            return name
+    return None
+
+
+def monthly_results(results, column, dtype):
+    # A stored monthly aggregate as the frame Home.monthly_sum would build
+    monthly = results['monthly']
+    return pd.DataFrame({
+        'Date': pd.to_datetime(monthly['Date']),
+        column: pd.Series(monthly[column]).astype(dtype),
+    })
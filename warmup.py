@@ -0,0 +1,93 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+# Modules the dashboard imports on its first run, heaviest first. Importing
+# them here only measures their cost: the server started by --serve is a new
+# program and imports them again.
+PRELOAD_MODULES = ["pandas", "pyarrow", "plotly.express", "plotly.graph_objects", "streamlit"]
+
+# Written once the store and the cached aggregates of a data version are
+# ready; --check reports ready only for the current version
+READY_FILE = os.path.join(".cache", "ready.json")
+
+
+def timed(label, timings, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    timings.append((label, time.perf_counter() - started))
+    return result
+
+
+def warm_up():
+    # Take in new daily log lines, build the partitioned store and Arrow file
+    # for the current data and fill the disk cache with the aggregates the
+    # dashboard loads, so a fresh server only has to memory-map the store and
+    # read the results on its first request
+    timings = []
+    for name in PRELOAD_MODULES:
+        timed(f"import {name}", timings, importlib.import_module, name)
+
+    from ingest import ingest_logs
+    from storage import data_version, ensure_store, open_dataset, read_partitions
+    timed("ingest daily logs", timings, ingest_logs)
+    version = timed("hash workbook", timings, data_version)
+    manifest = timed("build data store", timings, ensure_store, version)
+    reader = timed("map dataset", timings, open_dataset, version)
+    timed("read all partitions", timings, read_partitions,
+          manifest, manifest['years'], manifest['months'], reader)
+
+    from loaders import warm_loaders
+    for name, seconds in warm_loaders(version):
+        timings.append((name, seconds))
+
+    scratch = f"{READY_FILE}.tmp-{os.getpid()}"
+    with open(scratch, 'w') as f:
+        json.dump({'version': version, 'at': time.strftime('%Y-%m-%d %H:%M:%S')}, f)
+    os.replace(scratch, READY_FILE)
+    return version, manifest, timings
+
+
+def check():
+    # Health check: succeeds once a warm-up has finished for the current data
+    from storage import data_version
+    if not os.path.exists(READY_FILE):
+        return False
+    with open(READY_FILE) as f:
+        return json.load(f)['version'] == data_version()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up the plantation dashboard before it takes traffic")
+    parser.add_argument("--check", action="store_true", help="exit non-zero unless the data store is ready")
+    parser.add_argument("--serve", action="store_true", help="start `streamlit run Home.py` once warm")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete data stores of other versions; only while no server is running")
+    args, streamlit_args = parser.parse_known_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if args.check:
+        ready = check()
+        print("ready" if ready else "not ready")
+        sys.exit(0 if ready else 1)
+
+    version, manifest, timings = warm_up()
+    print(f"Data version {version}: {manifest['rows']:,} rows in {len(manifest['partitions'])} partitions")
+    for label, seconds in timings:
+        print(f"  {label:<28}{seconds * 1000:>10.1f} ms")
+    print(f"  {'total':<28}{sum(s for _, s in timings) * 1000:>10.1f} ms")
+    if args.prune:
+        from storage import remove_stores
+        removed = remove_stores(version)
+        print(f"Removed {len(removed)} stores of other versions")
+
+    if args.serve:
+        sys.stdout.flush()
+        os.execvp("streamlit", ["streamlit", "run", "Home.py", *streamlit_args])
+
+
+if __name__ == "__main__":
+    main()
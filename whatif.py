@@ -0,0 +1,78 @@
+import numpy as np
+
+from lag_analysis import remove_seasonality, lag_statistics, best_lags
+
+FERTILIZER = 'Usage of fertilizer'
+LABOR = 'Mandays for fertilizer'
+
+# Months after application over which the yield response is looked for
+RESPONSE_LAGS = range(3, 13)
+
+# Random plans scored per block in batch mode
+PLAN_CHUNK = 10000
+
+
+def response_model(matrices, lags=RESPONSE_LAGS):
+    # Per-field response to fertilizer from the whole history: extra MT per
+    # bag at the field's best lag (deseasonalized, negative slopes treated as
+    # no response), labor mandays per bag, and the most bags the field has
+    # taken in a month, beyond which the data says nothing.
+    lags = list(lags)
+    usage = matrices[FERTILIZER]
+    stats = lag_statistics(usage, remove_seasonality(matrices['MT'], matrices['months']), lags)
+    best = best_lags(stats, lags)
+
+    bags = np.nansum(usage, axis=1)
+    mandays = np.nansum(matrices[LABOR], axis=1)
+    overall = mandays.sum() / bags.sum() if bags.sum() > 0 else 0.0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mandays_per_bag = np.where(bags > 0, mandays / bags, overall)
+
+    recorded = ~np.isnan(usage).all(axis=1)
+    peak = np.where(recorded, np.nanmax(np.where(np.isnan(usage), -np.inf, usage), axis=1), 0.0)
+    return {
+        'fields': list(matrices['fields']),
+        'mt_per_bag': np.nan_to_num(np.clip(best['slope'], 0, None)),
+        'mandays_per_bag': mandays_per_bag,
+        'lag': best['lag'],
+        'peak_bags': peak,
+    }
+
+
+def score_plans(plans, baseline, mt_per_bag, mandays_per_bag, caps):
+    # Extra MT and total mandays of every plan at once. plans is (plans,
+    # fields) bags over the period; bags beyond a field's cap earn nothing.
+    plans = np.atleast_2d(plans)
+    gain = (np.minimum(plans, caps) - np.minimum(baseline, caps)) @ mt_per_bag
+    mandays = plans @ mandays_per_bag
+    return gain, mandays
+
+
+def search_plans(total, baseline, mt_per_bag, mandays_per_bag, caps, n_plans=5000, max_mandays=None, seed=0):
+    # Score n_plans random allocations of `total` bags (uniform over all
+    # splits) in blocks, and return the best one with its extra MT and
+    # mandays. The current allocation, scaled to `total`, competes too, so
+    # the result is never worse than keeping today's split. Only plans within
+    # max_mandays compete; if none is, the gain comes back as -inf.
+    rng = np.random.default_rng(seed)
+    n_fields = len(baseline)
+    baseline = np.asarray(baseline, dtype=float)
+    if baseline.sum() > 0:
+        best_plan = baseline * (total / baseline.sum())
+    else:
+        best_plan = np.full(n_fields, total / n_fields)
+    best_gain, best_mandays = (v[0] for v in score_plans(best_plan, baseline, mt_per_bag, mandays_per_bag, caps))
+    if max_mandays is not None and best_mandays > max_mandays:
+        best_gain = -np.inf
+    scored = 0
+    while scored < n_plans:
+        size = min(PLAN_CHUNK, n_plans - scored)
+        plans = rng.dirichlet(np.ones(n_fields), size=size) * total
+        gain, mandays = score_plans(plans, baseline, mt_per_bag, mandays_per_bag, caps)
+        if max_mandays is not None:
+            gain = np.where(mandays <= max_mandays, gain, -np.inf)
+        i = int(np.argmax(gain))
+        if gain[i] > best_gain:
+            best_plan, best_gain, best_mandays = plans[i], gain[i], mandays[i]
+        scored += size
+    return best_plan, best_gain, best_mandays